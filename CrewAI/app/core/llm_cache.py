@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from crewai import LLM
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[2] / "llm_cache.db"
+
+
+class TieredCacheStore:
+    """
+    Two-tier key/value store for LLM responses: an in-memory LRU in front of a sqlite
+    file. Both tiers are size bounded, the disk tier evicts least recently used rows.
+      LLM_CACHE_MEMORY_ENTRIES  entries kept in memory (default 512)
+      LLM_CACHE_DISK_MB         size of the sqlite tier (default 64)
+      LLM_CACHE_PATH            sqlite file, empty string disables the disk tier
+    """
+
+    def __init__(self, path=None, memory_entries=None, disk_bytes=None):
+        path = os.getenv("LLM_CACHE_PATH", str(DEFAULT_CACHE_PATH)) if path is None else path
+        self.memory_entries = memory_entries or int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+        self.disk_bytes = disk_bytes or int(float(os.getenv("LLM_CACHE_DISK_MB", "64")) * 1024 * 1024)
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._stats = {}
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, call_site TEXT, value TEXT, size INTEGER, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
+            self._conn.commit()
+
+    def _count(self, call_site, field):
+        site = self._stats.setdefault(call_site, {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0})
+        site[field] += 1
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key, call_site):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._count(call_site, "memory_hits")
+                return value
+
+            if self._conn is not None:
+                row = self._conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._conn.commit()
+                    self._remember(key, row[0])
+                    self._count(call_site, "disk_hits")
+                    return row[0]
+
+            self._count(call_site, "misses")
+            return None
+
+    def put(self, key, value, call_site):
+        with self._lock:
+            self._remember(key, value)
+            self._count(call_site, "stores")
+            if self._conn is None:
+                return
+            size = len(value.encode("utf-8"))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                (key, call_site, value, size, time.time())
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            # Evict least recently used rows until the disk tier fits its budget again
+            while total > self.disk_bytes:
+                row = self._conn.execute(
+                    "SELECT key, size FROM llm_cache ORDER BY last_used LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    break
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (row[0],))
+                self._memory.pop(row[0], None)
+                total -= row[1]
+            self._conn.commit()
+
+    def clear(self, call_site=None):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                if call_site is None:
+                    self._conn.execute("DELETE FROM llm_cache")
+                else:
+                    self._conn.execute("DELETE FROM llm_cache WHERE call_site = ?", (call_site,))
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            per_site = {site: dict(counts) for site, counts in self._stats.items()}
+            memory_entries = len(self._memory)
+        for counts in per_site.values():
+            lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+            counts["hit_rate"] = round((counts["memory_hits"] + counts["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return {"memory_entries": memory_entries, "call_sites": per_site}
+
+
+class CachedLLM(LLM):
+    """
+    CrewAI LLM that answers repeated deterministic calls from the tiered cache. The key
+    covers the model, temperature, the rendered messages and the response format.
+    Calls with tools or sampling temperature always go to the provider.
+    """
+
+    def __init__(self, *args, call_site="crewai", store=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.call_site = call_site
+        self.cache_store = store or llm_cache_store
+
+    def _cache_key(self, messages):
+        payload = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "messages": messages,
+            "response_format": repr(getattr(self, "response_format", None)),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        cacheable = self.temperature == 0 and not tools and not available_functions
+        if not cacheable:
+            return super().call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs)
+
+        key = self._cache_key(messages)
+        cached = self.cache_store.get(key, self.call_site)
+        if cached is not None:
+            return json.loads(cached)
+
+        response = super().call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs)
+        if isinstance(response, str):
+            self.cache_store.put(key, json.dumps(response), self.call_site)
+        return response
+
+
+llm_cache_store = TieredCacheStore()
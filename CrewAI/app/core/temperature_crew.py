@@ -1,9 +1,11 @@
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-from crewai import Agent, Crew, Task, LLM
+from crewai import Agent, Crew, Task
 from langchain_community.utilities import OpenWeatherMapAPIWrapper
 
+from app.core.llm_cache import CachedLLM
+
 
 class TemperatureCrewBuilder:
 
@@ -18,7 +20,8 @@ class TemperatureCrewBuilder:
         os.environ["OPENWEATHERMAP_API_KEY"] = os.getenv("OPENWEATHERMAP_API_KEY")
 
     def _setup_llm(self):
-        return LLM(model="groq/llama-3.3-70b-versatile")
+        # Temperature 0 keeps repeats deterministic, so they are served from the response cache
+        return CachedLLM(model="groq/llama-3.3-70b-versatile", temperature=0, call_site="temperature_crew")
 
     def extract_city_name(self, state):
         try:
@@ -1,7 +1,9 @@
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-from crewai import Agent, Crew, Task, LLM
+from crewai import Agent, Crew, Task
+
+from app.core.llm_cache import CachedLLM
 
 class MarketCrewBuilder:
     def __init__(self, topic: str):
@@ -19,7 +21,8 @@ class MarketCrewBuilder:
         os.environ["GROQ_API_KEY"] = os.getenv("grok_api_key")
 
     def _setup_llm(self):
-        return LLM(model="groq/llama-3.3-70b-versatile")
+        # Temperature 0 keeps repeats deterministic, so they are served from the response cache
+        return CachedLLM(model="groq/llama-3.3-70b-versatile", temperature=0, call_site="market_crew")
 
     def _create_researcher(self):
         return Agent(
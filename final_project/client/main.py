@@ -1,3 +1,6 @@
+import json
+import time
+
 import requests
 import streamlit as st
 
@@ -8,7 +11,9 @@ st.title("🤖 Chatbot with Database & Knowledge Base Agents")
 # API Endpoints
 # -----------------------------
 CHATBOT_API_URL = "http://localhost:8000/chatbot"
+CHATBOT_STREAM_API_URL = "http://localhost:8000/chatbot/stream"
 INGESTION_API_URL = "http://localhost:8000/ingestion-pipeline"
+INGESTION_JOBS_API_URL = "http://localhost:8000/ingestion-jobs"
 
 # -----------------------------
 # Session State Initialization
@@ -16,11 +21,8 @@ INGESTION_API_URL = "http://localhost:8000/ingestion-pipeline"
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
-if "upload_progress" not in st.session_state:
-    st.session_state.upload_progress = 0
-
-if "uploading_files" not in st.session_state:
-    st.session_state.uploading_files = False
+if "ingestion_jobs" not in st.session_state:
+    st.session_state.ingestion_jobs = {}
 
 # -----------------------------
 # Sidebar: File Upload
@@ -32,32 +34,75 @@ with st.sidebar:
     )
 
     def ingest_files(files):
-        st.session_state.uploading_files = True
-        for i, f in enumerate(files, start=1):
+        for f in files:
             try:
                 files_data = {"file": (f.name, f.read(), f.type)}
                 response = requests.post(INGESTION_API_URL, files=files_data)
-                if response.status_code == 200:
-                    st.success(f"✅ {f.name} ingested successfully!")
+                if response.status_code in (200, 202):
+                    st.session_state.ingestion_jobs[response.json()["job_id"]] = f.name
                 else:
                     detail = response.json().get("detail", response.text)
                     st.error(f"❌ Failed to ingest {f.name}: {detail}")
             except Exception as e:
                 st.error(f"⚠️ Error ingesting {f.name}: {e}")
-            st.session_state.upload_progress = i / len(files)
+
+    def poll_ingestion_jobs():
+        """Poll the server until every queued job finishes, showing real chunk progress."""
+        bars = {job_id: st.empty() for job_id in st.session_state.ingestion_jobs}
+        pending = dict(st.session_state.ingestion_jobs)
+        while pending:
+            for job_id, filename in list(pending.items()):
+                try:
+                    job = requests.get(f"{INGESTION_JOBS_API_URL}/{job_id}").json()
+                except Exception as e:
+                    bars[job_id].error(f"⚠️ Lost track of {filename}: {e}")
+                    pending.pop(job_id)
+                    continue
+
+                stage = job.get("stage", "queued")
+                if stage == "completed":
+                    bars[job_id].success(f"✅ {filename} ingested successfully!")
+                    pending.pop(job_id)
+                elif stage == "failed":
+                    bars[job_id].error(f"❌ Failed to ingest {filename}: {job.get('error')}")
+                    pending.pop(job_id)
+                else:
+                    total = job.get("chunks_total") or 0
+                    done = job.get("chunks_embedded") or 0
+                    rate = job.get("chunks_per_second")
+                    text = f"{filename}: {stage}"
+                    if total:
+                        text += f" ({done}/{total} chunks"
+                        text += f", {rate} chunks/s)" if rate else ")"
+                    bars[job_id].progress(min(done / total, 1.0) if total else 0.0, text=text)
+            if pending:
+                time.sleep(1)
+        st.session_state.ingestion_jobs = {}
         st.balloons()
-        st.session_state.upload_progress = 0
-        st.session_state.uploading_files = False
 
-    if uploaded_files:
-        if not st.session_state.uploading_files:
-            st.button("Start Upload", on_click=ingest_files, args=(uploaded_files,))
-        if st.session_state.upload_progress > 0:
-            st.progress(st.session_state.upload_progress)
+    if uploaded_files and not st.session_state.ingestion_jobs:
+        st.button("Start Upload", on_click=ingest_files, args=(uploaded_files,))
+
+    if st.session_state.ingestion_jobs:
+        poll_ingestion_jobs()
 
 # -----------------------------
 # Chat Display
 # -----------------------------
+def rows_table(results):
+    """Markdown table from the columnar SQL result (column list + row lists)."""
+    headers = results.get("query_columns", [])
+    rows = results.get("query_rows", [])
+    if not rows:
+        return "No rows returned."
+    table = "| " + " | ".join(headers) + " |\n"
+    table += "| " + " | ".join("---" for _ in headers) + " |\n"
+    for row in rows:
+        table += "| " + " | ".join(str(value) for value in row) + " |\n"
+    if results.get("rows_truncated"):
+        table += f"\n_Showing the first {len(rows)} rows._"
+    return table
+
 st.subheader("💬 Chat with Knowledge Base")
 
 for idx, chat in enumerate(st.session_state.chat_history, start=1):
@@ -65,17 +110,8 @@ for idx, chat in enumerate(st.session_state.chat_history, start=1):
     answer = chat["answer"].get("results", {})
 
     # Database agent
-    if "sql_query" in answer:
-        rows = answer.get("query_rows", [])
-        if rows:
-            headers = rows[0].keys()
-            table = "| " + " | ".join(headers) + " |\n"
-            table += "| " + " | ".join("---" for _ in headers) + " |\n"
-            for row in rows:
-                table += "| " + " | ".join(str(row[h]) for h in headers) + " |\n"
-            st.chat_message("assistant").markdown(table)
-        else:
-            st.chat_message("assistant").markdown("No rows returned.")
+    if answer.get("sql_query"):
+        st.chat_message("assistant").markdown(rows_table(answer))
         with st.expander(f"🔎 SQL Query (Q{idx})"):
             st.code(answer["sql_query"], language="sql")
 
@@ -95,41 +131,89 @@ with st.form("chat_form", clear_on_submit=True):
     q = st.text_input("Ask a question", key="chat_input")
     submitted = st.form_submit_button("Send")
 
+def iter_sse(response):
+    """Yield (event, data) pairs from a Server-Sent Events response."""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
+def describe_node(payload):
+    node, update = payload["node"], payload.get("update", {})
+    if node == "fast_route":
+        return f"🧭 Routing: {update.get('route_source')} ({update.get('relevance') or 'undecided'})"
+    if node == "check_relevance":
+        return f"🧭 Routing decided by LLM: {update.get('relevance')}"
+    if node == "convert_to_sql":
+        cached = " (from cache)" if update.get("sql_cache_hit") else ""
+        return f"🧾 SQL generated{cached}: `{update.get('sql_query')}`"
+    if node == "validate_sql":
+        validation = update.get("sql_validation") or {}
+        repairs = f" ({', '.join(validation.get('repairs', []))})" if validation.get("repairs") else ""
+        if validation.get("status") == "ok":
+            return f"🛡️ SQL validated{repairs}"
+        return f"🛡️ SQL {validation.get('status')}: {validation.get('error')}"
+    if node == "execute_sql":
+        if update.get("sql_error"):
+            return "⚠️ SQL failed, rewriting the question..."
+        engine = f" from {update['sql_engine']}" if update.get("sql_engine") else ""
+        return f"📊 {update.get('rows', 0)} rows fetched{engine}"
+    return f"✔️ {node}"
+
+
 if submitted and q.strip():
-    with st.spinner("🤔 Thinking..."):
+    st.chat_message("user").markdown(q.strip())
+
+    answer = {"results": {}}
+    with st.chat_message("assistant"):
+        status = st.status("🤔 Thinking...", expanded=False)
+        answer_box = st.empty()
+        streamed = ""
         try:
-            response = requests.post(CHATBOT_API_URL, data={"query": q.strip()})
-            response.raise_for_status()
-            answer = response.json()
+            with requests.post(CHATBOT_STREAM_API_URL, data={"query": q.strip()}, stream=True) as response:
+                response.raise_for_status()
+                for event, payload in iter_sse(response):
+                    if event == "node":
+                        status.write(describe_node(payload))
+                    elif event == "token":
+                        streamed += payload["text"]
+                        answer_box.markdown(streamed + "▌")
+                    elif event == "final":
+                        answer = payload
+                    elif event == "error":
+                        answer = {"results": {"result": f"⚠️ Error: {payload['detail']}"}}
+            status.update(label="✅ Done", state="complete")
         except requests.exceptions.RequestException as e:
             answer = {"results": {"result": f"⚠️ Error: {e}"}}
+            status.update(label="⚠️ Failed", state="error")
+
+        results = answer.get("results") or {}
+        if results.get("sql_query"):
+            answer_box.markdown(results.get("query_result") or streamed)
+        elif "answer" in results and results["answer"] and "result" in results["answer"]:
+            answer_box.markdown(results["answer"]["result"])
+        elif "result" in results:
+            answer_box.markdown(results["result"])
+        else:
+            answer_box.markdown(streamed or "No response.")
 
-        # Append to chat history
-        st.session_state.chat_history.append({
-            "question": q.strip(),
-            "answer": answer
-        })
+    # Append to chat history
+    st.session_state.chat_history.append({
+        "question": q.strip(),
+        "answer": answer
+    })
 
-    # Display the latest message immediately
-    st.chat_message("user").markdown(q.strip())
-    answer = st.session_state.chat_history[-1]["answer"].get("results", {})
-
-    if "sql_query" in answer:
-        rows = answer.get("query_rows", [])
-        if rows:
-            headers = rows[0].keys()
-            table = "| " + " | ".join(headers) + " |\n"
-            table += "| " + " | ".join("---" for _ in headers) + " |\n"
-            for row in rows:
-                table += "| " + " | ".join(str(row[h]) for h in headers) + " |\n"
-            st.chat_message("assistant").markdown(table)
-        else:
-            st.chat_message("assistant").markdown("No rows returned.")
+    if results.get("sql_query"):
+        st.chat_message("assistant").markdown(rows_table(results))
         with st.expander(f"🔎 SQL Query"):
-            st.code(answer["sql_query"], language="sql")
-
-    elif "answer" in answer and "result" in answer["answer"]:
-        st.chat_message("assistant").markdown(answer["answer"]["result"])
+            st.code(results["sql_query"], language="sql")
 
 # -----------------------------
 # Clear Chat Button
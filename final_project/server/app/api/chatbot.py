@@ -1,20 +1,73 @@
+import asyncio
+import json
+import os
+
 from fastapi import Form, HTTPException, APIRouter
-from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 
-from app.core.kb_query import RAGQueryEngine
+from app.core.engine_registry import engine_registry
 from app.core.db_agent import DatabaseAgent
+from app.core.query_router import FastPathRouter
+from app.core.semantic_cache import SemanticSQLCache
+from app.core.llm_cache import llm_cache_store
+from app.core.embedding_cache import embedding_cache
+from app.core.index_advisor import IndexAdvisor
 from app.core.models import GraphState
+from app.core.tracing import observe_request, start_trace, traced
 
 router = APIRouter()
 db_agent = DatabaseAgent()
 
+# The router and the SQL cache reuse the knowledge-base engine's MiniLM model
+def shared_embeddings():
+    return engine_registry.get("knowledge_base").embedding_model
+
+query_router = FastPathRouter(db_agent, embeddings_provider=shared_embeddings)
+# Cached SQL is only reused for questions naming the same schema values (cities, makes...)
+db_agent.sql_cache = SemanticSQLCache(embeddings_provider=shared_embeddings, literals_provider=query_router.value_matches)
+
 # --- Knowledge Base Node ---
 def knowledge_base_agent(state: GraphState) -> dict:
-    engine = RAGQueryEngine()
+    engine = engine_registry.get("knowledge_base")
     result = engine.ask(state["query"])
     return {"answer": result}
 
+async def aknowledge_base_agent(state: GraphState) -> dict:
+    engine = await asyncio.to_thread(engine_registry.get, "knowledge_base")
+    result = await engine.aask(state["query"])
+    return {"answer": result}
+
+# --- Fast-path Router Node ---
+def fast_route(state: GraphState) -> dict:
+    """
+    Routes confident questions locally (schema keywords, embedding centroids),
+    anything ambiguous is left to the LLM relevance check.
+    """
+    try:
+        route, source, details = query_router.route(state["query"])
+    except Exception as e:
+        print(f"⚠️ Fast-path router failed, falling back to LLM: {e}")
+        route, source, details = None, "llm", {}
+    state["route_source"] = source
+    # Some schema terms but no confident route: the question may need both sources
+    state["ambiguous"] = route is None and bool(details.get("matches"))
+    if route is not None:
+        state["relevance"] = "relevant" if route == "convert_to_sql" else "not_relevant"
+        print(f"Fast-path routed to {route} via {source}.")
+    return state
+
+async def afast_route(state: GraphState) -> dict:
+    # Keyword lookups and the query embedding are CPU/DB bound, keep them off the event loop
+    return await asyncio.to_thread(fast_route, state)
+
+def fast_route_router(state: GraphState) -> str:
+    if state.get("route_source") == "llm":
+        return "check_relevance"
+    return db_agent.relevance_router(state)
+
 # --- Database Node ---
 def database_agent(state: GraphState) -> dict:
     # Placeholder database logic
@@ -43,76 +96,342 @@ def relevance_router(state: GraphState) -> str:
         return "knowledge_base"
     
 
+# --- Parallel fan-out nodes ---
+# Branches that run in the same step must write disjoint state keys, so these call the
+# agent on a copy of the state and return only what they produced
+def fan_relevance(state: GraphState) -> dict:
+    return {"relevance": db_agent.check_relevance(dict(state))["relevance"]}
+
+async def afan_relevance(state: GraphState) -> dict:
+    return {"relevance": (await db_agent.acheck_relevance(dict(state)))["relevance"]}
+
+def fan_sql_draft(state: GraphState) -> dict:
+    result = db_agent.convert_nl_to_sql(dict(state))
+    return {"sql_query": result["sql_query"], "sql_cache_hit": result.get("sql_cache_hit", False)}
+
+async def afan_sql_draft(state: GraphState) -> dict:
+    result = await db_agent.aconvert_nl_to_sql(dict(state))
+    return {"sql_query": result["sql_query"], "sql_cache_hit": result.get("sql_cache_hit", False)}
+
+def fan_knowledge_base(state: GraphState) -> dict:
+    return knowledge_base_agent(state)
+
+async def afan_knowledge_base(state: GraphState) -> dict:
+    return await aknowledge_base_agent(state)
+
+FAN_OUT_NODES = ["fan_relevance", "fan_sql_draft", "fan_knowledge_base"]
+
+def fan_out_router(state: GraphState):
+    route = fast_route_router(state)
+    return FAN_OUT_NODES if route == "check_relevance" else route
+
+def resolve_fan_out(state: GraphState) -> dict:
+    """
+    Join of the fan-out: the relevance verdict picks the winning draft and the other
+    one is dropped. Ambiguous questions keep the knowledge-base answer for merging.
+    """
+    if state["relevance"].lower() == "relevant":
+        print(f"Fan-out resolved to SQL{' (ambiguous, keeping both answers)' if state.get('ambiguous') else ''}.")
+        return {} if state.get("ambiguous") else {"answer": None}
+    print("Fan-out resolved to the knowledge base.")
+    return {"sql_query": None, "sql_cache_hit": False}
+
+def resolve_fan_out_router(state: GraphState) -> str:
+    return "validate_sql" if state.get("sql_query") else END
+
+def merge_answers(state: GraphState) -> dict:
+    knowledge = (state.get("answer") or {}).get("result")
+    if knowledge and not state.get("sql_error"):
+        state["query_result"] = f"{state['query_result']}\n\n**From the knowledge base:** {knowledge}"
+    return state
+
+def answer_router(state: GraphState) -> str:
+    return "merge_answers" if state.get("answer") else END
+
+
 # --- Build Graph ---
-graph = StateGraph(GraphState)
-
-# Add nodes
-graph.add_node("check_relevance", db_agent.check_relevance)
-graph.add_node("convert_to_sql", db_agent.convert_nl_to_sql)
-graph.add_node("execute_sql", db_agent.execute_sql)
-graph.add_node("generate_human_readable_answer", db_agent.generate_human_readable_answer)
-graph.add_node("regenerate_query", db_agent.regenerate_query)
-graph.add_node("generate_fallback_response", db_agent.generate_fallback_response)
-graph.add_node("end_max_iterations", db_agent.end_max_iterations)
-graph.add_node("knowledge_base", knowledge_base_agent) 
-
-# Add edges
-graph.add_conditional_edges(
-    "check_relevance",
-    lambda state: db_agent.relevance_router(state),
-    {
-        "knowledge_base": "knowledge_base",               
-        "convert_to_sql": "convert_to_sql",
-        "generate_fallback_response": "generate_fallback_response",
-    }
-)
-
-graph.add_edge("convert_to_sql", "execute_sql")
-
-graph.add_conditional_edges(
-    "execute_sql",
-    lambda state: db_agent.execute_sql_router(state),
-    {
-        "generate_human_readable_answer": "generate_human_readable_answer",
-        "regenerate_query": "regenerate_query",
-    }
-)
-
-graph.add_conditional_edges(
-    "regenerate_query",
-    lambda state: db_agent.check_attempts_router(state),
-    {
-        "convert_to_sql": "convert_to_sql",
-        "max_iterations": "end_max_iterations",
-    }
-)
-
-# Terminal paths
-graph.add_edge("generate_human_readable_answer", END)
-graph.add_edge("generate_fallback_response", END)
-graph.add_edge("end_max_iterations", END)
-graph.add_edge("knowledge_base", END)
-
-# Entry
-graph.set_entry_point("check_relevance")
-
-
-# Compile graph
-app_graph = graph.compile()
+# CHATBOT_GRAPH_MODE=serial (default) routes first and then runs one branch.
+# CHATBOT_GRAPH_MODE=parallel starts the relevance check, retrieval and SQL drafting
+# together when the fast path can't decide, so the critical path is the slowest call
+# instead of the sum of them.
+GRAPH_MODE = os.getenv("CHATBOT_GRAPH_MODE", "serial").lower()
+
+# Nodes have a sync and an async implementation so the graph supports both invoke
+# and ainvoke, both are traced (wall time, tokens, cache hits) under the node name
+def node(name, func, afunc=None):
+    return RunnableLambda(
+        traced(name, func),
+        afunc=traced(name, afunc) if afunc is not None else None,
+        name=name
+    )
+
+def build_graph(mode=GRAPH_MODE):
+    graph = StateGraph(GraphState)
+
+    # Add nodes
+    graph.add_node("fast_route", node("fast_route", fast_route, afast_route))
+    graph.add_node("check_relevance", node("check_relevance", db_agent.check_relevance, db_agent.acheck_relevance))
+    graph.add_node("convert_to_sql", node("convert_to_sql", db_agent.convert_nl_to_sql, db_agent.aconvert_nl_to_sql))
+    graph.add_node("validate_sql", node("validate_sql", db_agent.validate_sql, db_agent.avalidate_sql))
+    graph.add_node("reject_sql", node("reject_sql", db_agent.reject_sql))
+    graph.add_node("execute_sql", node("execute_sql", db_agent.execute_sql, db_agent.aexecute_sql))
+    graph.add_node("generate_human_readable_answer", node("generate_human_readable_answer", db_agent.generate_human_readable_answer, db_agent.agenerate_human_readable_answer))
+    graph.add_node("regenerate_query", node("regenerate_query", db_agent.regenerate_query, db_agent.aregenerate_query))
+    graph.add_node("generate_fallback_response", node("generate_fallback_response", db_agent.generate_fallback_response))
+    graph.add_node("end_max_iterations", node("end_max_iterations", db_agent.end_max_iterations))
+    graph.add_node("knowledge_base", node("knowledge_base", knowledge_base_agent, aknowledge_base_agent))
+
+    # Add edges
+    if mode == "parallel":
+        graph.add_node("fan_relevance", node("fan_relevance", fan_relevance, afan_relevance))
+        graph.add_node("fan_sql_draft", node("fan_sql_draft", fan_sql_draft, afan_sql_draft))
+        graph.add_node("fan_knowledge_base", node("fan_knowledge_base", fan_knowledge_base, afan_knowledge_base))
+        graph.add_node("resolve_fan_out", node("resolve_fan_out", resolve_fan_out))
+        graph.add_node("merge_answers", node("merge_answers", merge_answers))
+
+        graph.add_conditional_edges(
+            "fast_route",
+            fan_out_router,
+            {
+                "knowledge_base": "knowledge_base",
+                "convert_to_sql": "convert_to_sql",
+                **{name: name for name in FAN_OUT_NODES},
+            }
+        )
+        # Waits for all three branches
+        graph.add_edge(FAN_OUT_NODES, "resolve_fan_out")
+        graph.add_conditional_edges(
+            "resolve_fan_out",
+            resolve_fan_out_router,
+            {
+                "validate_sql": "validate_sql",
+                END: END,
+            }
+        )
+        graph.add_conditional_edges(
+            "generate_human_readable_answer",
+            answer_router,
+            {
+                "merge_answers": "merge_answers",
+                END: END,
+            }
+        )
+        graph.add_edge("merge_answers", END)
+    else:
+        graph.add_conditional_edges(
+            "fast_route",
+            fast_route_router,
+            {
+                "check_relevance": "check_relevance",
+                "knowledge_base": "knowledge_base",
+                "convert_to_sql": "convert_to_sql",
+            }
+        )
+        graph.add_edge("generate_human_readable_answer", END)
+
+    graph.add_conditional_edges(
+        "check_relevance",
+        lambda state: db_agent.relevance_router(state),
+        {
+            "knowledge_base": "knowledge_base",
+            "convert_to_sql": "convert_to_sql",
+            "generate_fallback_response": "generate_fallback_response",
+        }
+    )
+
+    graph.add_edge("convert_to_sql", "validate_sql")
+
+    graph.add_conditional_edges(
+        "validate_sql",
+        lambda state: db_agent.validate_sql_router(state),
+        {
+            "execute_sql": "execute_sql",
+            "regenerate_query": "regenerate_query",
+            "reject_sql": "reject_sql",
+        }
+    )
+
+    graph.add_conditional_edges(
+        "execute_sql",
+        lambda state: db_agent.execute_sql_router(state),
+        {
+            "generate_human_readable_answer": "generate_human_readable_answer",
+            "regenerate_query": "regenerate_query",
+        }
+    )
+
+    graph.add_conditional_edges(
+        "regenerate_query",
+        lambda state: db_agent.check_attempts_router(state),
+        {
+            "convert_to_sql": "convert_to_sql",
+            "end_max_iterations": "end_max_iterations",
+        }
+    )
+
+    # Terminal paths
+    graph.add_edge("generate_fallback_response", END)
+    graph.add_edge("end_max_iterations", END)
+    graph.add_edge("reject_sql", END)
+    graph.add_edge("knowledge_base", END)
+
+    # Entry
+    graph.set_entry_point("fast_route")
+
+    # Compile graph
+    return graph.compile()
+
+
+app_graph = build_graph()
 
 # --- POST endpoint ---
+# Per-request timing breakdown in responses, also available per request with timings=true
+INCLUDE_TIMINGS = os.getenv("CHATBOT_TIMINGS", "false").lower() == "true"
+
 @router.post("/chatbot")
-async def query_vectorstore(query: str = Form(...)):
+async def query_vectorstore(query: str = Form(...), timings: bool = Form(False)):
     if not query:
         raise HTTPException(status_code=400, detail="Missing 'query' in request body")
     
-    state: GraphState = {"query": query, "relevance": ""}
+    state: GraphState = {"query": query, "relevance": "", "attempts": 0}
     
     try:
-        answer = app_graph.invoke(state)
-        return JSONResponse({
+        trace = start_trace()
+        answer = await app_graph.ainvoke(state)
+        observe_request("chatbot", trace)
+        response = {
             "results": answer,
             "status_code": 200
-        })
+        }
+        if timings or INCLUDE_TIMINGS:
+            response["timings"] = trace.breakdown()
+        return JSONResponse(jsonable_encoder(response))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# --- Streaming endpoint (Server-Sent Events) ---
+# State keys worth reporting after each node, the rest stays server side
+NODE_EVENT_KEYS = {
+    "fast_route": ("route_source", "relevance"),
+    "check_relevance": ("relevance",),
+    "convert_to_sql": ("sql_query", "sql_cache_hit"),
+    "validate_sql": ("sql_query", "sql_validation"),
+    "execute_sql": ("sql_error", "sql_engine"),
+    "regenerate_query": ("query", "attempts"),
+    "fan_relevance": ("relevance",),
+    "fan_sql_draft": ("sql_query", "sql_cache_hit"),
+    "resolve_fan_out": ("relevance", "ambiguous"),
+}
+
+# Nodes whose LLM tokens make up the final answer. fan_knowledge_base is left out, its
+# answer may still lose the fan-out and only arrives with the final event.
+ANSWER_NODES = {"generate_human_readable_answer", "knowledge_base"}
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+def node_event(node, output):
+    update = {key: output.get(key) for key in NODE_EVENT_KEYS.get(node, ()) if key in output}
+    if node == "execute_sql":
+        update["rows"] = len(output.get("query_rows") or [])
+    return {"node": node, "update": update}
+
+
+@router.post("/chatbot/stream")
+async def stream_chatbot(query: str = Form(...), timings: bool = Form(False)):
+    if not query:
+        raise HTTPException(status_code=400, detail="Missing 'query' in request body")
+
+    state: GraphState = {"query": query, "relevance": "", "attempts": 0}
+
+    async def event_source():
+        try:
+            trace = start_trace()
+            async for event in app_graph.astream_events(state, version="v2"):
+                kind = event["event"]
+                node = event.get("metadata", {}).get("langgraph_node")
+
+                if kind == "on_chat_model_stream" and node in ANSWER_NODES:
+                    text = event["data"]["chunk"].content
+                    if text:
+                        yield sse_event("token", {"node": node, "text": text})
+
+                elif (
+                    kind == "on_chain_end"
+                    and node == event["name"]
+                    and len(event.get("parent_ids") or []) == 1
+                    and isinstance(event["data"].get("output"), dict)
+                ):
+                    # A graph node finished (routing decided, SQL generated, rows fetched...),
+                    # direct children of the graph run only, not runnables inside the node
+                    yield sse_event("node", node_event(node, event["data"]["output"]))
+
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    observe_request("chatbot_stream", trace)
+                    final = {"results": event["data"].get("output"), "status_code": 200}
+                    if timings or INCLUDE_TIMINGS:
+                        final["timings"] = trace.breakdown()
+                    yield sse_event("final", final)
+
+        except Exception as e:
+            print(f"❌ Error while streaming answer: {e}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/router-stats")
+def router_stats():
+    return JSONResponse(query_router.stats())
+
+
+@router.get("/sql-cache-stats")
+def sql_cache_stats():
+    return JSONResponse(db_agent.sql_cache.stats())
+
+
+@router.get("/llm-cache-stats")
+def llm_cache_stats():
+    return JSONResponse(llm_cache_store.stats())
+
+
+@router.get("/embedding-cache-stats")
+def embedding_cache_stats():
+    return JSONResponse(embedding_cache.stats())
+
+
+@router.get("/index-advisor")
+def index_advisor(limit: int = 50):
+    # Proposals only, indexes are created offline with `python -m app.core.index_advisor --apply`
+    workload = db_agent.workload_log.summary(limit=limit)
+    # EXPLAIN QUERY PLAN analysis is sqlite specific
+    proposals = IndexAdvisor(db_agent.db_path).analyze(workload) if db_agent.db_path else []
+    return JSONResponse({"workload": workload, "proposals": proposals})
+
+
+@router.get("/db-engine")
+def db_engine_status():
+    pool = db_agent.engine.pool
+    return JSONResponse({**db_agent.engine_profile.describe(), "pool": pool.status()})
+
+
+@router.get("/analytics-stats")
+def analytics_stats():
+    if db_agent.analytics is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **db_agent.analytics.stats()})
+
+
+@router.get("/rerank-stats")
+def rerank_stats():
+    reranker = engine_registry.get("knowledge_base").reranker
+    if reranker is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **reranker.stats()})
@@ -3,7 +3,7 @@ from fastapi.responses import JSONResponse
 import os
 
 # Importing classes
-from app.core.knowledge_base import BuildRag
+from app.core.ingestion_jobs import ingestion_jobs
 
 router = APIRouter()
 
@@ -16,7 +16,7 @@ def create_folder(folder_name):
             os.makedirs(folder_name)
     except Exception as e:
         print(f"Error while creating folder {e}")
-        raise e    
+        raise e
 
 
 @router.post("/ingestion-pipeline")
@@ -29,7 +29,7 @@ async def upload_file(file: UploadFile = File(...)):
         file_type = file.content_type
         if file_type != "application/pdf":
             raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
-        
+
         # Generating / checking folder
         create_folder(folder_name=upload_directory)
 
@@ -40,17 +40,25 @@ async def upload_file(file: UploadFile = File(...)):
         with open(file_path, "wb") as f:
             f.write(await file.read())
 
-        build_instance = BuildRag()
-        texts = build_instance.load_documents(upload_directory)
-        build_instance.embedding_vector_store(texts)    
+        # Parsing and embedding run on the ingestion worker pool, poll the job for progress
+        job_id = ingestion_jobs.submit(file_path, file.filename)
 
-        return JSONResponse(content={
-            "message": "✅ File uploaded and ingested in vector store successfully.",
+        return JSONResponse(status_code=202, content={
+            "message": "✅ File uploaded, ingestion job queued.",
             "filename": file.filename,
             "path": file_path,
-            "status_code": 200
-        })    
+            "job_id": job_id,
+            "status_code": 202
+        })
 
     except Exception as e:
         print(f"Error while ingestion {e}")
-        raise e     
\ No newline at end of file
+        raise e
+
+
+@router.get("/ingestion-jobs/{job_id}")
+async def ingestion_job_status(job_id: str):
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job: {job_id}")
+    return JSONResponse(content=job)
@@ -0,0 +1,279 @@
+import csv
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from app.core.result_summary import LIMIT_RE
+from app.core.sql_validator import AGGREGATE_RE, split_quoted
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+DEFAULT_MIRROR_PATH = Path(__file__).resolve().parents[1] / "db" / "used_cars.duckdb"
+NULL_MARKER = "\\N"
+# Bumped when the column mapping changes, mirrors written before are reloaded
+MIRROR_VERSION = 2
+LIKE_RE = re.compile(r"\blike\b", re.IGNORECASE)
+# sqlite's `/` truncates between integers, DuckDB's always returns a DOUBLE
+DIVISION_RE = re.compile(r"/")
+ORDER_BY_RE = re.compile(r"\border\s+by\b", re.IGNORECASE)
+GROUP_BY_RE = re.compile(r"\bgroup\s+by\b", re.IGNORECASE)
+# A top-level GROUP BY of plain keys at the end of the query, before HAVING / LIMIT
+GROUP_KEYS_RE = re.compile(
+    r"\bgroup\s+by\s+(?P<keys>[^()]+?)(?P<tail>(?:\s+having\b.*?)?(?:\s+limit\s+\d+(?:\s*(?:,|offset)\s*\d+)?)?)\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def duckdb_type(declared):
+    """DuckDB column type for a sqlite declared type, following sqlite's affinity rules."""
+    declared = (declared or "").upper()
+    # BOOLEAN has numeric affinity in sqlite and holds 0/1, kept as integers so results and
+    # AVG/SUM over flags match
+    if "INT" in declared or "BOOL" in declared:
+        return "BIGINT"
+    if any(name in declared for name in ("REAL", "FLOA", "DOUB", "NUMERIC", "DECIMAL")):
+        return "DOUBLE"
+    return "VARCHAR"
+
+
+class AnalyticalMirror:
+    """
+    Columnar DuckDB copy of the sqlite database for aggregate queries. GROUP BY and
+    aggregate SELECTs run on the mirror, everything else (point lookups, writes) and any
+    query DuckDB fails on stays on sqlite.
+
+    The mirror is synced in the background whenever the sqlite file changes. Appended
+    rows (rowid above the mirrored high-water mark) are copied incrementally, any other
+    change (deletes, updates, new schema) reloads that table.
+      ANALYTICS_ENGINE         auto (use DuckDB when installed, default) or off
+      ANALYTICS_DUCKDB_PATH    mirror file (default app/db/used_cars.duckdb)
+      ANALYTICS_SYNC_INTERVAL  seconds between freshness checks (default 30)
+
+    Only queries that give the same rows on both engines are routed: LIKE becomes ILIKE
+    (sqlite's LIKE ignores ASCII case, DuckDB's doesn't), queries dividing outside a
+    string literal stay on sqlite (integer division), and NULLs sort first ascending and
+    last descending as in sqlite. Row order must be fixed too: sqlite returns groups
+    sorted by their keys, DuckDB in hash order, so a GROUP BY without ORDER BY gets its
+    keys as ORDER BY, or stays on sqlite when the clause is not a plain one at the end.
+    """
+
+    def __init__(self, sqlite_path, duckdb_path=None, sync_interval=None):
+        self.sqlite_path = str(sqlite_path)
+        self.duckdb_path = duckdb_path or os.getenv("ANALYTICS_DUCKDB_PATH", str(DEFAULT_MIRROR_PATH))
+        self.sync_interval = sync_interval or float(os.getenv("ANALYTICS_SYNC_INTERVAL", "30"))
+
+        self._conn = duckdb.connect(str(self.duckdb_path))
+        # A database-wide setting, the per-thread cursors see it too
+        self._conn.execute("SET default_null_order = 'nulls_first_on_asc_last_on_desc'")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS _mirror_state ("
+            " table_name VARCHAR PRIMARY KEY, schema_sql VARCHAR, row_count BIGINT, max_rowid BIGINT)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS _mirror_source (signature VARCHAR)")
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        row = self._conn.execute("SELECT signature FROM _mirror_source").fetchone()
+        self._signature = row[0] if row else None
+        self._last_check = 0.0
+        self._ready = False
+        self._stats = {"routed": 0, "fallbacks": 0, "syncs": 0, "last_sync": None}
+
+        threading.Thread(target=self.sync, daemon=True).start()
+
+    @classmethod
+    def from_env(cls, sqlite_path):
+        """Returns a mirror, or None when it is switched off or DuckDB is missing."""
+        if os.getenv("ANALYTICS_ENGINE", "auto").lower() == "off" or not sqlite_path:
+            return None
+        if duckdb is None:
+            print("⚠️ duckdb not installed, aggregate queries stay on sqlite.")
+            return None
+        try:
+            return cls(sqlite_path)
+        except Exception as e:
+            print(f"⚠️ Analytical mirror unavailable, aggregate queries stay on sqlite: {e}")
+            return None
+
+    # --- Sync ---
+    def _file_signature(self):
+        signature = [f"v{MIRROR_VERSION}"]
+        for suffix in ("", "-wal"):
+            path = self.sqlite_path + suffix
+            if os.path.exists(path):
+                stat = os.stat(path)
+                signature.append(f"{suffix}:{stat.st_mtime_ns}:{stat.st_size}")
+        return "|".join(signature)
+
+    def _mirrored_state(self):
+        rows = self._conn.execute("SELECT table_name, schema_sql, row_count, max_rowid FROM _mirror_state").fetchall()
+        return {name: {"schema_sql": schema_sql, "row_count": count, "max_rowid": max_rowid}
+                for name, schema_sql, count, max_rowid in rows}
+
+    def _copy_rows(self, source, table, where="", params=()):
+        # Bulk load through a CSV file, row-by-row inserts into DuckDB are very slow
+        cursor = source.execute(f'SELECT * FROM "{table}" {where}', params)
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            copied = 0
+            for row in cursor:
+                writer.writerow([NULL_MARKER if value is None else value for value in row])
+                copied += 1
+        try:
+            if copied:
+                self._conn.execute(
+                    f"""COPY "{table}" FROM '{f.name}' (FORMAT csv, HEADER false, NULLSTR '{NULL_MARKER}')"""
+                )
+        finally:
+            os.remove(f.name)
+        return copied
+
+    def _sync_table(self, source, table, schema_sql, mirrored):
+        count, max_rowid = source.execute(f'SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM "{table}"').fetchone()
+        previous = mirrored.get(table)
+
+        self._conn.execute("BEGIN TRANSACTION")
+        try:
+            appended = None
+            if previous and previous["schema_sql"] == schema_sql and max_rowid >= previous["max_rowid"]:
+                new_rows = source.execute(
+                    f'SELECT COUNT(*) FROM "{table}" WHERE rowid > ?', (previous["max_rowid"],)
+                ).fetchone()[0]
+                # Pure appends keep the old rows valid, copy only the new ones. With no new
+                # rows the file still changed, updates can't be ruled out cheaply.
+                if new_rows and previous["row_count"] + new_rows == count:
+                    appended = self._copy_rows(source, table, "WHERE rowid > ?", (previous["max_rowid"],))
+
+            if appended is None:
+                columns = source.execute(f'PRAGMA table_info("{table}")').fetchall()
+                definition = ", ".join(f'"{column[1]}" {duckdb_type(column[2])}' for column in columns)
+                self._conn.execute(f'CREATE OR REPLACE TABLE "{table}" ({definition})')
+                self._copy_rows(source, table)
+                mode = "reload"
+            else:
+                mode = "append"
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO _mirror_state VALUES (?, ?, ?, ?)",
+                (table, schema_sql, count, max_rowid)
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return {"mode": mode, "rows": count}
+
+    def sync(self):
+        if not self._sync_lock.acquire(blocking=False):
+            return  # a sync is already running
+        try:
+            signature = self._file_signature()
+            if signature == self._signature:
+                self._ready = True  # the persisted mirror is already current
+                return
+            started = time.perf_counter()
+            source = sqlite3.connect(f"file:{self.sqlite_path}?mode=ro", uri=True)
+            tables = {}
+            try:
+                mirrored = self._mirrored_state()
+                for table, schema_sql in source.execute(
+                    "SELECT name, sql FROM sqlite_master WHERE type = 'table'"
+                    " AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE '%WITHOUT ROWID%'"
+                ).fetchall():
+                    try:
+                        tables[table] = self._sync_table(source, table, f"v{MIRROR_VERSION} {schema_sql}", mirrored)
+                    except Exception as e:
+                        # Queries touching this table fail on DuckDB and fall back to sqlite
+                        tables[table] = {"mode": "failed", "error": str(e)}
+                        print(f"⚠️ Could not mirror table {table}: {e}")
+            finally:
+                source.close()
+
+            self._conn.execute("DELETE FROM _mirror_source")
+            self._conn.execute("INSERT INTO _mirror_source VALUES (?)", (signature,))
+            self._signature = signature
+            self._ready = True
+            self._stats["syncs"] += 1
+            self._stats["last_sync"] = {
+                "seconds": round(time.perf_counter() - started, 3),
+                "at": time.time(),
+                "tables": tables,
+            }
+            print(f"✅ Analytical mirror synced in {self._stats['last_sync']['seconds']}s: {tables}")
+        except Exception as e:
+            print(f"❌ Analytical mirror sync failed: {e}")
+        finally:
+            self._sync_lock.release()
+
+    def maybe_sync(self):
+        now = time.time()
+        if now - self._last_check < self.sync_interval:
+            return
+        self._last_check = now
+        if self._file_signature() != self._signature:
+            threading.Thread(target=self.sync, daemon=True).start()
+
+    # --- Queries ---
+    @staticmethod
+    def translate(sql_query):
+        """The query in DuckDB's dialect with sqlite's results, or None when there is no such rewrite."""
+        spans = split_quoted(sql_query.strip().rstrip(";"))
+        for i in range(0, len(spans), 2):
+            if DIVISION_RE.search(spans[i]):
+                return None
+            spans[i] = LIKE_RE.sub("ILIKE", spans[i])
+
+        code = " ".join(spans[::2])
+        if GROUP_BY_RE.search(code) and not ORDER_BY_RE.search(code):
+            # Only the last code span can hold a GROUP BY clause that ends the query
+            groups = GROUP_KEYS_RE.search(spans[-1])
+            if len(GROUP_BY_RE.findall(code)) > 1 or groups is None:
+                return None
+            tail = groups.group("tail")
+            limit = LIMIT_RE.search(tail)
+            having = (tail[:limit.start()] if limit else tail).rstrip()
+            spans[-1] = (
+                spans[-1][:groups.start("tail")] + having
+                + f" ORDER BY {groups.group('keys').strip()}" + (f" {limit.group(0)}" if limit else "")
+            )
+        return "".join(spans)
+
+    def accepts(self, sql_query):
+        lowered = sql_query.lstrip().lower()
+        return (
+            self._ready and lowered.startswith(("select", "with")) and bool(AGGREGATE_RE.search(lowered))
+            and self.translate(sql_query) is not None
+        )
+
+    def _cursor(self):
+        # DuckDB connections are not shared across threads, each thread gets its own cursor
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._conn.cursor()
+            self._local.cursor = cursor
+        return cursor
+
+    def try_query(self, sql_query):
+        """(columns, rows) from the mirror, or None when the query has to run on sqlite."""
+        if not self.accepts(sql_query):
+            return None
+        self.maybe_sync()
+        try:
+            cursor = self._cursor().execute(self.translate(sql_query))
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        except Exception as e:
+            self._stats["fallbacks"] += 1
+            print(f"⚠️ DuckDB could not run the query, falling back to sqlite: {e}")
+            return None
+        self._stats["routed"] += 1
+        return columns, rows
+
+    def stats(self):
+        return {"ready": self._ready, "path": str(self.duckdb_path), **self._stats}
@@ -1,16 +1,21 @@
 import os
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from app.core.llm import get_chat_model
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from sqlalchemy import text, inspect
 from langgraph.graph import StateGraph, END
-from sqlalchemy import create_engine
 from langchain_core.runnables.config import RunnableConfig
 from pathlib import Path
-import sqlite3, yaml
+import sqlite3, yaml, threading, time, asyncio
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from app.core.models import GraphState, CheckRelevance, ConvertToSQL, RewrittenQuestion
+from app.core.result_summary import bound_select, format_rows, summarize_rows
+from app.core.sql_validator import ROW_PREFIXES, SQLValidator, is_read_query
+from app.core.index_advisor import SQLWorkloadLog
+from app.core.db_engine import EngineProfile
+from app.core.analytics_mirror import AnalyticalMirror
 
 
 class DatabaseAgent:
@@ -20,42 +25,114 @@ class DatabaseAgent:
             env_path = Path(__file__).resolve().parents[2] / '.env'
             load_dotenv(dotenv_path=env_path)
 
-            os.environ["HUGGINGFACEHUB_API_TOKEN"] = os.getenv("HUGGINGFACEHUB_API_TOKEN")
-            os.environ["GROQ_API_KEY"] = os.getenv("grok_api_key")
+            # Keys are optional, offline benchmarks (LLM_BACKEND=fake) run without them
+            if os.getenv("HUGGINGFACEHUB_API_TOKEN"):
+                os.environ["HUGGINGFACEHUB_API_TOKEN"] = os.getenv("HUGGINGFACEHUB_API_TOKEN")
+            if os.getenv("grok_api_key"):
+                os.environ["GROQ_API_KEY"] = os.getenv("grok_api_key")
 
             prompt_path = Path(__file__).resolve().parent / "prompts.yaml"
             with open(prompt_path, "r", encoding="utf-8") as f:
                 self.prompts = yaml.safe_load(f)
 
-            self.groq_llm = ChatGroq(
-                model="llama-3.3-70b-versatile",  
-                temperature=0.0
-            )
+            # One model per call site so response-cache hits are reported per node
+            self.llms = {
+                call_site: get_chat_model(call_site)
+                for call_site in ("check_relevance", "convert_to_sql", "generate_human_readable_answer", "regenerate_query")
+            }
 
-            # DATABASE_URL = "sqlite:///:memory:"
+            # DATABASE_URL overrides the bundled sqlite file (Postgres, DuckDB)
             db_path = Path(__file__).resolve().parents[1] / "db" / "used_cars.db"
-            DATABASE_URL = f"sqlite:///{db_path}"
-            
 
-            # Create engine
-            self.engine = create_engine(
-                DATABASE_URL, connect_args={"check_same_thread": False}
-            )
+            # Read-only connections unless writes are explicitly enabled
+            self.allow_writes = os.getenv("SQL_ALLOW_WRITES", "false").lower() == "true"
+
+            # Pooled, tuned engines (mmap, page cache, statement cache, opt-in WAL)
+            self.engine_profile = EngineProfile(db_path, allow_writes=self.allow_writes)
+            self.engine, self.async_engine = self.engine_profile.create_engines()
+            self.db_path = self.engine_profile.sqlite_path
 
             # Create SessionLocal factory
             self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+            # Async sessions for the ainvoke path, None means a worker thread is used
+            self.AsyncSessionLocal = (
+                async_sessionmaker(self.async_engine, expire_on_commit=False)
+                if self.async_engine is not None else None
+            )
+
+            # Result bounds: rows kept per query, rows pulled per fetch, and the size
+            # above which the LLM gets aggregate stats plus a sample instead of every row
+            self.max_rows = int(os.getenv("SQL_MAX_ROWS", "200"))
+            self.fetch_chunk = int(os.getenv("SQL_FETCH_CHUNK", "50"))
+            self.summary_threshold = int(os.getenv("SQL_SUMMARY_THRESHOLD", "20"))
+
+            # Optional DuckDB mirror that answers aggregate SELECTs, sqlite only
+            self.analytics = AnalyticalMirror.from_env(self.db_path)
+
+            # Every executed statement with its latency, input for the index advisor
+            self.workload_log = SQLWorkloadLog()
+
+            # Optional SemanticSQLCache, attached by the API layer
+            self.sql_cache = None
+
+            # Introspected schema, reused until the fingerprint changes
+            self._schema_cache = None
+            self._schema_lock = threading.Lock()
+
+            # Local checks on generated SQL before it reaches execute_sql, sqlite only
+            self.sql_validator = (
+                SQLValidator(self.db_path, self.get_schema_tables, max_rows=self.max_rows, allow_writes=self.allow_writes)
+                if self.db_path else None
+            )
             
         except Exception as e:
             print(f"Error: {e}")
             return e    
 
 
+    def _schema_fingerprint(self):
+        """
+        Cheap value that changes whenever the schema may have changed. SQLite bumps
+        `schema_version` on every DDL statement, the inode catches a replaced DB file.
+        Other backends fall back to a five minute TTL.
+        """
+        if self.engine.dialect.name != "sqlite":
+            return ("ttl", int(time.time() // 300))
+        with self.engine.connect() as conn:
+            schema_version = conn.exec_driver_sql("PRAGMA schema_version").scalar()
+        inode = os.stat(self.db_path).st_ino if self.db_path and os.path.exists(self.db_path) else None
+        return (schema_version, inode)
+
+    def _cached_schema(self):
+        fingerprint = self._schema_fingerprint()
+        with self._schema_lock:
+            if self._schema_cache is not None and self._schema_cache[0] == fingerprint:
+                return self._schema_cache[1]
+            schema = self._introspect_schema()
+            self._schema_cache = (fingerprint, schema)
+            return schema
+
     def get_database_schema(self):
+        return self._cached_schema()["text"]
+
+    def get_schema_tables(self):
+        """{table: [column, ...]} from the same cached introspection."""
+        return self._cached_schema()["tables"]
+
+    def invalidate_schema(self):
+        with self._schema_lock:
+            self._schema_cache = None
+
+    def _introspect_schema(self):
         inspector = inspect(self.engine)
         schema = ""
+        tables = {}
         for table_name in inspector.get_table_names():
             schema += f"Table: {table_name}\n"
-            for column in inspector.get_columns(table_name):
+            columns = inspector.get_columns(table_name)
+            tables[table_name] = [column["name"] for column in columns]
+            for column in columns:
                 col_name = column["name"]
                 col_type = str(column["type"])
                 if column.get("primary_key"):
@@ -67,11 +144,11 @@ class DatabaseAgent:
             schema += "\n"
             
         print("Retrieved database schema.")
-        return schema
+        return {"text": schema, "tables": tables}
 
-    def check_relevance(self, state: GraphState):
+    # --- Relevance check ---
+    def _relevance_chain(self, state: GraphState, schema):
         question = state["query"] 
-        schema = self.get_database_schema()
         print(f"Checking relevance of the question: {question}")
         system = """You are an assistant that determines whether a given question is related to the following database schema.
 
@@ -87,19 +164,37 @@ class DatabaseAgent:
                 ("human", human),
             ]
         )
-        structured_llm = self.groq_llm.with_structured_output(CheckRelevance)
-        relevance_checker = check_prompt | structured_llm
-        relevance = relevance_checker.invoke({})
+        structured_llm = self.llms["check_relevance"].with_structured_output(CheckRelevance)
+        return check_prompt | structured_llm
+
+    def _apply_relevance(self, state: GraphState, relevance):
         state["relevance"] = relevance.relevance
         print(f"Relevance determined: {state['relevance']}")
         return state
-        # if relevance.relevance == "relevant":
-        #     return "convert_to_sql"
-        # else:
-        #     return "knowledge_base"   
 
-
-    def convert_nl_to_sql(self, state: GraphState):
+    def check_relevance(self, state: GraphState):
+        schema = self.get_database_schema()
+        relevance = self._relevance_chain(state, schema).invoke({})
+        return self._apply_relevance(state, relevance)
+
+    async def acheck_relevance(self, state: GraphState):
+        schema = await asyncio.to_thread(self.get_database_schema)
+        relevance = await self._relevance_chain(state, schema).ainvoke({})
+        return self._apply_relevance(state, relevance)
+
+    # --- NL to SQL ---
+    def _use_cached_sql(self, state: GraphState):
+        # Reuse SQL from a paraphrase asked before, it is still executed against the DB
+        state["sql_cache_hit"] = False
+        if self.sql_cache is not None and not state.get("attempts"):
+            cached = self.sql_cache.lookup(state["query"])
+            if cached is not None:
+                state["sql_query"] = cached["sql_query"]
+                state["sql_cache_hit"] = True
+                print(f"Semantic cache hit ({cached['similarity']}) for: {cached['cached_question']}")
+        return state["sql_cache_hit"]
+
+    def _sql_chain(self, state: GraphState):
         question = state["query"]
         system_prompt = self.prompts["convert_to_sql"]["system"]
         convert_prompt = ChatPromptTemplate.from_messages(
@@ -109,54 +204,205 @@ class DatabaseAgent:
             ]
         )
         
-        structured_llm = self.groq_llm.with_structured_output(ConvertToSQL)
-        sql_generator = convert_prompt | structured_llm
-        result = sql_generator.invoke({"question": question})
-        
+        structured_llm = self.llms["convert_to_sql"].with_structured_output(ConvertToSQL)
+        return convert_prompt | structured_llm
+
+    def _apply_sql(self, state: GraphState, result):
         state["sql_query"] = result.sql_query
         print(f"Generated SQL query: {state['sql_query']}")
         return state
 
+    def convert_nl_to_sql(self, state: GraphState):
+        if self._use_cached_sql(state):
+            return state
+        schema = self.get_database_schema()
+        result = self._sql_chain(state).invoke({"question": state["query"], "schema": schema})
+        return self._apply_sql(state, result)
+
+    async def aconvert_nl_to_sql(self, state: GraphState):
+        if await asyncio.to_thread(self._use_cached_sql, state):
+            return state
+        schema = await asyncio.to_thread(self.get_database_schema)
+        result = await self._sql_chain(state).ainvoke({"question": state["query"], "schema": schema})
+        return self._apply_sql(state, result)
+
+    # --- SQL validation ---
+    def validate_sql(self, state: GraphState):
+        if self.sql_validator is None:
+            state["sql_validation"] = {"status": "ok", "sql_query": state["sql_query"], "repairs": []}
+            return state
+        generated_sql = state["sql_query"]
+        report = self.sql_validator.validate(generated_sql)
+        state["sql_query"] = report["sql_query"]
+        state["sql_validation"] = report
+        if report["repairs"]:
+            print(f"SQL repaired locally: {', '.join(report['repairs'])}")
+        if report["status"] != "ok":
+            # Same shape as an execution error so regenerate_query and the answer node work unchanged
+            state["query_result"] = f"Error executing SQL query: {report['error']}"
+            state["sql_error"] = True
+            if self.sql_cache is not None and state.get("sql_cache_hit"):
+                self.sql_cache.invalidate(generated_sql)
+        print(f"SQL validation: {report['status']}")
+        return state
+
+    async def avalidate_sql(self, state: GraphState):
+        # EXPLAIN runs on a local read-only connection, keep it off the event loop
+        return await asyncio.to_thread(self.validate_sql, state)
+
+    def reject_sql(self, state: GraphState):
+        report = state.get("sql_validation") or {}
+        state["query_result"] = f"This request can't be run against the database: {report.get('error')}"
+        print("SQL rejected by validation, not executed.")
+        return state
+
+    # --- SQL execution ---
+    def _apply_rows(self, state: GraphState, columns, rows):
+        columns = list(columns)
+        truncated = len(rows) > self.max_rows
+        rows = rows[:self.max_rows]
+
+        # Columnar result: one column list plus plain row lists instead of a dict per row
+        state["query_columns"] = columns
+        state["query_rows"] = [list(row) for row in rows]
+        state["row_count"] = len(rows)
+        state["rows_truncated"] = truncated
+        print(f"SQL query returned {len(rows)} rows{' (truncated)' if truncated else ''}.")
+
+        if not rows:
+            formatted_result = "No results found."
+        elif len(rows) > self.summary_threshold:
+            # Large results reach the LLM as aggregate stats and a sample only
+            formatted_result = summarize_rows(columns, rows)
+        else:
+            formatted_result = format_rows(columns, rows)
+        if truncated:
+            formatted_result += f"\n(Result truncated to the first {self.max_rows} rows.)"
+        state["query_result"] = formatted_result
+        state["sql_error"] = False
+        print("SQL SELECT query executed successfully.")
+        return state
+
+    def _log_execution(self, state: GraphState, executed_sql, started, error=None):
+        # The index advisor only cares about statements that ran on the primary engine
+        if state.get("sql_engine") == "duckdb":
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.workload_log.record(
+            executed_sql, elapsed_ms,
+            row_count=None if error else state.get("row_count"),
+            error=str(error) if error else None
+        )
+
+    def _remember_sql(self, state: GraphState, sql_query):
+        if self.sql_cache is not None and not state.get("sql_cache_hit"):
+            # Keyed on what the user asked, later lookups see that and not the rewrite
+            self.sql_cache.store(state.get("original_query") or state["query"], sql_query)
+
+    def _apply_command(self, state: GraphState):
+        state["query_result"] = "The action has been successfully completed."
+        state["sql_error"] = False
+        print("SQL command executed successfully.")
+        return state
+
+    def _apply_sql_error(self, state: GraphState, sql_query, e):
+        state["query_result"] = f"Error executing SQL query: {str(e)}"
+        state["sql_error"] = True
+        print(f"Error executing SQL query: {str(e)}")
+        if self.sql_cache is not None and state.get("sql_cache_hit"):
+            self.sql_cache.invalidate(sql_query)
+        return state
+
+    def _bound_read(self, sql_query):
+        # EXPLAIN output takes no LIMIT, its rows are capped while fetching
+        if sql_query.lower().startswith(ROW_PREFIXES):
+            return bound_select(sql_query, self.max_rows)
+        return sql_query
 
     def execute_sql(self, state: GraphState):
         sql_query = state["sql_query"].strip()
+        executed_sql = sql_query
+        state["sql_engine"] = self.engine.dialect.name
         session = self.SessionLocal()
         print(f"Executing SQL query: {sql_query}")
+        started = time.perf_counter()
         try:
-            result = session.execute(text(sql_query))
-            if sql_query.lower().startswith("select"):
-                rows = result.fetchall()
-                columns = result.keys()
-                if rows:
-                    header = ", ".join(columns)
-                    state["query_rows"] = [dict(zip(columns, row)) for row in rows]
-                    print(f"Raw SQL Query Result: {state['query_rows']}")
-                    # Format the result for readability
-                    data = "; ".join([
-                        ", ".join([f"{key}: {value}" for key, value in row.items()])
-                        for row in state["query_rows"]
-                    ])
-                    formatted_result = f"{header}\n{data}"
+            if is_read_query(sql_query):
+                # The row cap is part of the SQL, rows are then pulled in chunks
+                executed_sql = self._bound_read(sql_query)
+                analytical = self.analytics.try_query(executed_sql) if self.analytics is not None else None
+                if analytical is not None:
+                    state["sql_engine"] = "duckdb"
+                    self._apply_rows(state, *analytical)
                 else:
-                    state["query_rows"] = []
-                    formatted_result = "No results found."
-                state["query_result"] = formatted_result
-                state["sql_error"] = False
-                print("SQL SELECT query executed successfully.")
+                    state["sql_engine"] = self.engine.dialect.name
+                    result = session.execute(
+                        text(executed_sql),
+                        execution_options={"stream_results": True}
+                    )
+                    rows = []
+                    for partition in result.partitions(self.fetch_chunk):
+                        rows.extend(partition)
+                        if len(rows) > self.max_rows:
+                            break
+                    self._apply_rows(state, result.keys(), rows)
+                    result.close()
+                self._remember_sql(state, sql_query)
             else:
+                session.execute(text(sql_query))
                 session.commit()
-                state["query_result"] = "The action has been successfully completed."
-                state["sql_error"] = False
-                print("SQL command executed successfully.")
+                self._apply_command(state)
+            self._log_execution(state, executed_sql, started)
         except Exception as e:
-            state["query_result"] = f"Error executing SQL query: {str(e)}"
-            state["sql_error"] = True
-            print(f"Error executing SQL query: {str(e)}")
+            self._log_execution(state, executed_sql, started, error=e)
+            self._apply_sql_error(state, sql_query, e)
         finally:
             session.close()
         return state
-    
-    def generate_human_readable_answer(self, state: GraphState):
+
+    async def aexecute_sql(self, state: GraphState):
+        if self.AsyncSessionLocal is None:
+            return await asyncio.to_thread(self.execute_sql, state)
+
+        sql_query = state["sql_query"].strip()
+        executed_sql = sql_query
+        state["sql_engine"] = self.engine.dialect.name
+        print(f"Executing SQL query: {sql_query}")
+        started = time.perf_counter()
+        async with self.AsyncSessionLocal() as session:
+            try:
+                if is_read_query(sql_query):
+                    executed_sql = self._bound_read(sql_query)
+                    analytical = (
+                        await asyncio.to_thread(self.analytics.try_query, executed_sql)
+                        if self.analytics is not None else None
+                    )
+                    if analytical is not None:
+                        state["sql_engine"] = "duckdb"
+                        self._apply_rows(state, *analytical)
+                    else:
+                        state["sql_engine"] = self.engine.dialect.name
+                        result = await session.stream(text(executed_sql))
+                        rows = []
+                        async for partition in result.partitions(self.fetch_chunk):
+                            rows.extend(partition)
+                            if len(rows) > self.max_rows:
+                                break
+                        self._apply_rows(state, result.keys(), rows)
+                        await result.close()
+                    await asyncio.to_thread(self._remember_sql, state, sql_query)
+                else:
+                    await session.execute(text(sql_query))
+                    await session.commit()
+                    self._apply_command(state)
+                self._log_execution(state, executed_sql, started)
+            except Exception as e:
+                self._log_execution(state, executed_sql, started, error=e)
+                await asyncio.to_thread(self._apply_sql_error, state, sql_query, e)
+        return state
+
+    # --- Human readable answer ---
+    def _answer_chain(self, state: GraphState):
         sql = state.get("sql_query", "")
         result = state.get("query_result", "")
         query_rows = state.get("query_rows", [])
@@ -174,7 +420,7 @@ class DatabaseAgent:
         {result}
 
         Formulate a single, clear, human-readable error message."""
-        elif sql.lower().startswith("select") and not query_rows:
+        elif is_read_query(sql) and not query_rows:
             human_text = f"""SQL Query:
         {sql}
 
@@ -198,15 +444,23 @@ class DatabaseAgent:
             ]
         )
 
-        human_response = generate_prompt | self.groq_llm | StrOutputParser()
-        answer = human_response.invoke({})
+        return generate_prompt | self.llms["generate_human_readable_answer"] | StrOutputParser()
 
+    def _apply_answer(self, state: GraphState, answer):
         state["query_result"] = answer.strip()
         print("Generated human-readable answer.")
         return state
 
+    def generate_human_readable_answer(self, state: GraphState):
+        answer = self._answer_chain(state).invoke({})
+        return self._apply_answer(state, answer)
 
-    def regenerate_query(self, state: GraphState):
+    async def agenerate_human_readable_answer(self, state: GraphState):
+        answer = await self._answer_chain(state).ainvoke({})
+        return self._apply_answer(state, answer)
+
+    # --- Question rewriting ---
+    def _rewrite_chain(self, state: GraphState):
         question = state["query"]
         print("Regenerating the SQL query by rewriting the question.")
         system = self.prompts["regenerate_query"]["system"]
@@ -220,14 +474,24 @@ class DatabaseAgent:
             ]
         )
     
-        structured_llm = self.groq_llm.with_structured_output(RewrittenQuestion)
-        rewriter = rewrite_prompt | structured_llm
-        rewritten = rewriter.invoke({})
+        structured_llm = self.llms["regenerate_query"].with_structured_output(RewrittenQuestion)
+        return rewrite_prompt | structured_llm
+
+    def _apply_rewrite(self, state: GraphState, rewritten):
+        state["original_query"] = state.get("original_query") or state["query"]
         state["query"] = rewritten.question
-        state["attempts"] += 1
-        print(f"Rewritten question: {state['question']}")
+        state["attempts"] = state.get("attempts", 0) + 1
+        print(f"Rewritten question: {state['query']}")
         return state
 
+    def regenerate_query(self, state: GraphState):
+        rewritten = self._rewrite_chain(state).invoke({})
+        return self._apply_rewrite(state, rewritten)
+
+    async def aregenerate_query(self, state: GraphState):
+        rewritten = await self._rewrite_chain(state).ainvoke({})
+        return self._apply_rewrite(state, rewritten)
+
     def generate_fallback_response(self, state: GraphState):
         print("LLM could not find an answer. Returning fallback response.")
         state["query_result"] = "Sorry, I don't know the answer to that."
@@ -246,11 +510,20 @@ class DatabaseAgent:
             return "knowledge_base"
         
     def check_attempts_router(self, state: GraphState):
-        if state["attempts"] < 3:
+        if state.get("attempts", 0) < 3:
             return "convert_to_sql"
         else:
             return "end_max_iterations"  
 
+    def validate_sql_router(self, state: GraphState):
+        status = (state.get("sql_validation") or {}).get("status", "ok")
+        if status == "ok":
+            return "execute_sql"
+        elif status == "invalid":
+            return "regenerate_query"
+        else:
+            return "reject_sql"
+
     def execute_sql_router(self, state: GraphState):
         if not state.get("sql_error", False):
             return "generate_human_readable_answer"
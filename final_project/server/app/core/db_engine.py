@@ -0,0 +1,155 @@
+import os
+import sqlite3
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+
+class EngineProfile:
+    """
+    Connection settings for DatabaseAgent, read from the environment:
+      DATABASE_URL          overrides the bundled sqlite file, e.g. postgresql://... or duckdb:///...
+      DB_POOL_SIZE          pooled connections kept open (default 8)
+      DB_MAX_OVERFLOW       extra connections under burst load (default 16)
+      DB_POOL_TIMEOUT       seconds to wait for a free connection (default 30)
+      DB_STATEMENT_CACHE    prepared statements cached per sqlite connection (default 256)
+      DB_QUERY_CACHE_SIZE   SQLAlchemy compiled statement cache (default 500)
+      SQLITE_JOURNAL_MODE   set once on the file, e.g. wal so readers run alongside a writer
+                            (default: unset, the file keeps its mode). Opt-in for deployments that
+                            own their copy of the database, switching rewrites the file header and
+                            the bundled used_cars.db is tracked in git
+      SQLITE_MMAP_SIZE      bytes of the file memory mapped per connection (default 256 MB)
+      SQLITE_CACHE_SIZE     page cache per connection, negative values are KiB (default -65536)
+
+    Read paths open sqlite with `mode=ro` and `PRAGMA query_only`, Postgres with
+    `default_transaction_read_only`, DuckDB with `read_only`.
+    """
+
+    def __init__(self, db_path, allow_writes=False, url=None, journal_mode=None):
+        self.db_path = db_path
+        self.allow_writes = allow_writes
+        self.url = url or os.getenv("DATABASE_URL") or f"sqlite:///{db_path}"
+        self.pool_size = int(os.getenv("DB_POOL_SIZE", "8"))
+        self.max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "16"))
+        self.pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        self.statement_cache = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+        self.query_cache_size = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+        self.journal_mode = os.getenv("SQLITE_JOURNAL_MODE", "") if journal_mode is None else journal_mode
+        self.mmap_size = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+        self.cache_size = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+
+    @property
+    def backend(self):
+        return make_url(self.url).get_backend_name()
+
+    @property
+    def sqlite_path(self):
+        return make_url(self.url).database if self.backend == "sqlite" else None
+
+    def _pool_args(self):
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_pre_ping": True,
+            "query_cache_size": self.query_cache_size,
+        }
+
+    # --- SQLite ---
+    def _sqlite_url(self, driver):
+        path = self.sqlite_path
+        if self.allow_writes:
+            return f"sqlite+{driver}:///{path}"
+        return f"sqlite+{driver}:///file:{path}?mode=ro&uri=true"
+
+    def _set_journal_mode(self):
+        # The journal mode is persistent in the file, so it is switched once with a
+        # short-lived writable connection instead of on every read-only connection
+        path = self.sqlite_path
+        if not self.journal_mode or not path or not os.path.exists(path):
+            return
+        try:
+            conn = sqlite3.connect(path)
+            current = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if current.lower() != self.journal_mode.lower():
+                conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+                print(f"✅ SQLite journal mode set to {self.journal_mode}.")
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not set SQLite journal mode to {self.journal_mode}: {e}")
+
+    def _tune_sqlite(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        cursor.execute(f"PRAGMA cache_size={self.cache_size}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if not self.allow_writes:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    def _sqlite_engines(self):
+        self._set_journal_mode()
+        connect_args = {"check_same_thread": False, "cached_statements": self.statement_cache}
+        engine = create_engine(self._sqlite_url("pysqlite"), connect_args=connect_args, **self._pool_args())
+        event.listen(engine, "connect", self._tune_sqlite)
+
+        async_engine = None
+        try:
+            async_engine = create_async_engine(
+                self._sqlite_url("aiosqlite"), connect_args=connect_args, **self._pool_args()
+            )
+            event.listen(async_engine.sync_engine, "connect", self._tune_sqlite)
+        except Exception as e:
+            print(f"⚠️ Async engine unavailable, async SQL runs on a worker thread: {e}")
+        return engine, async_engine
+
+    # --- Postgres ---
+    def _postgres_engines(self):
+        url = make_url(self.url)
+        connect_args = {} if self.allow_writes else {"options": "-c default_transaction_read_only=on"}
+        engine = create_engine(url.set(drivername="postgresql+psycopg2"), connect_args=connect_args, **self._pool_args())
+
+        async_engine = None
+        try:
+            server_settings = {} if self.allow_writes else {"default_transaction_read_only": "on"}
+            async_engine = create_async_engine(
+                url.set(drivername="postgresql+asyncpg"),
+                connect_args={"server_settings": server_settings},
+                **self._pool_args()
+            )
+        except Exception as e:
+            print(f"⚠️ Async engine unavailable, async SQL runs on a worker thread: {e}")
+        return engine, async_engine
+
+    # --- DuckDB ---
+    def _duckdb_engines(self):
+        # duckdb_engine has no async driver, the agent falls back to a worker thread
+        engine = create_engine(
+            self.url,
+            connect_args={"read_only": not self.allow_writes},
+            **self._pool_args()
+        )
+        return engine, None
+
+    def create_engines(self):
+        """Returns (engine, async_engine), async_engine is None when no async driver fits."""
+        if self.backend == "sqlite":
+            return self._sqlite_engines()
+        if self.backend == "postgresql":
+            return self._postgres_engines()
+        if self.backend == "duckdb":
+            return self._duckdb_engines()
+        return create_engine(self.url, **self._pool_args()), None
+
+    def describe(self):
+        return {
+            "backend": self.backend,
+            "read_only": not self.allow_writes,
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "statement_cache": self.statement_cache,
+            "journal_mode": self.journal_mode if self.backend == "sqlite" else None,
+            "mmap_size": self.mmap_size if self.backend == "sqlite" else None,
+            "cache_size": self.cache_size if self.backend == "sqlite" else None,
+        }
@@ -0,0 +1,185 @@
+import atexit
+import os
+import queue
+import threading
+import time
+
+from app.core.embedding_cache import embedding_cache
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# ONNX files shipped in the all-MiniLM-L6-v2 repository
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-quantized": "onnx/model_qint8_avx2.onnx",
+}
+
+_models = {}
+_pools = {}
+_models_lock = threading.Lock()
+
+_SENTINEL = object()
+
+
+def _load_model(backend):
+    """One SentenceTransformer per backend and process, shared by every ingestion job."""
+    from sentence_transformers import SentenceTransformer
+
+    with _models_lock:
+        if backend not in _models:
+            if backend == "torch":
+                _models[backend] = SentenceTransformer(MODEL_NAME, device="cpu")
+            elif backend in ONNX_FILES:
+                _models[backend] = SentenceTransformer(
+                    MODEL_NAME,
+                    device="cpu",
+                    backend="onnx",
+                    model_kwargs={"file_name": ONNX_FILES[backend]}
+                )
+            else:
+                raise ValueError(f"Unknown embedding backend: {backend}")
+            print(f"✅ Embedding model loaded ({backend} backend).")
+        return _models[backend]
+
+
+def _process_pool(model, backend, workers):
+    with _models_lock:
+        key = (backend, workers)
+        if key not in _pools:
+            _pools[key] = model.start_multi_process_pool(target_devices=["cpu"] * workers)
+            atexit.register(model.stop_multi_process_pool, _pools[key])
+        return _pools[key]
+
+
+class EmbeddingPipeline:
+    """
+    Three overlapping stages: a parser thread pulls chunks from the source (PDF parsing
+    happens lazily there), the calling thread embeds length-sorted batches, and a writer
+    thread hands finished batches to the vector store.
+
+    Configuration comes from the environment unless passed explicitly:
+      EMBEDDING_BATCH_SIZE  chunks per model call (default 64)
+      EMBEDDING_BACKEND     torch | onnx | onnx-quantized (default torch)
+      EMBEDDING_WORKERS     >1 encodes on a pool of that many CPU processes (default 1)
+    Vectors are looked up in the shared embedding cache by chunk hash first, see
+    EmbeddingCache.
+    """
+
+    def __init__(self, batch_size=None, backend=None, workers=None, window_batches=8):
+        self.batch_size = batch_size or int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+        self.backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+        self.workers = workers or int(os.getenv("EMBEDDING_WORKERS", "1"))
+        # Chunks are length-sorted inside a window of this many batches, so similar
+        # lengths share a batch and less padding is computed
+        self.window_size = self.batch_size * window_batches
+
+    @property
+    def namespace(self):
+        # ONNX exports don't reproduce the torch vectors bit for bit, cache them apart
+        return MODEL_NAME if self.backend == "torch" else f"{MODEL_NAME}:{self.backend}"
+
+    def _encode(self, texts):
+        model = _load_model(self.backend)
+        if self.workers > 1:
+            pool = _process_pool(model, self.backend, self.workers)
+            return model.encode_multi_process(texts, pool, batch_size=self.batch_size)
+        return model.encode(texts, batch_size=self.batch_size, show_progress_bar=False)
+
+    def embed(self, texts):
+        # Chunks embedded before, by any ingestion, come from the embedding cache
+        vectors = embedding_cache.embed_documents(self.namespace, texts, self._encode)
+        return [vector.tolist() for vector in vectors]
+
+    def _windows(self, chunk_source, out_queue, errors):
+        try:
+            window = []
+            for item in chunk_source:
+                window.append(item)
+                if len(window) >= self.window_size:
+                    self._emit_window(window, out_queue)
+                    window = []
+            if window:
+                self._emit_window(window, out_queue)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            out_queue.put(_SENTINEL)
+
+    def _emit_window(self, window, out_queue):
+        window.sort(key=lambda item: len(item[1].page_content))
+        for start in range(0, len(window), self.batch_size):
+            out_queue.put(window[start:start + self.batch_size])
+
+    def _writer(self, in_queue, write, stats, progress, errors):
+        while True:
+            batch = in_queue.get()
+            if batch is _SENTINEL:
+                return
+            if errors:
+                continue
+            try:
+                ids, docs, vectors = batch
+                started = time.perf_counter()
+                write(ids, docs, vectors)
+                stats["write_seconds"] += time.perf_counter() - started
+                stats["chunks"] += len(ids)
+                if progress:
+                    elapsed = time.perf_counter() - stats["_started"]
+                    progress(
+                        "embedding",
+                        chunks_embedded=stats["chunks"],
+                        chunks_per_second=round(stats["chunks"] / elapsed, 2) if elapsed > 0 else None
+                    )
+            except Exception as e:
+                errors.append(e)
+
+    def run(self, chunk_source, write, progress=None):
+        """
+        Embed every (id, Document) pair from `chunk_source` and pass each finished batch to
+        `write(ids, documents, vectors)`. Returns throughput stats for sizing workers.
+        """
+        stats = {"chunks": 0, "embed_seconds": 0.0, "write_seconds": 0.0, "_started": time.perf_counter()}
+        errors = []
+        # Bounded queues keep at most a couple of batches in flight between stages
+        batches = queue.Queue(maxsize=4)
+        embedded = queue.Queue(maxsize=4)
+
+        parser = threading.Thread(target=self._windows, args=(chunk_source, batches, errors), daemon=True)
+        writer = threading.Thread(target=self._writer, args=(embedded, write, stats, progress, errors), daemon=True)
+        parser.start()
+        writer.start()
+
+        try:
+            while True:
+                batch = batches.get()
+                if batch is _SENTINEL:
+                    break
+                if errors:
+                    continue
+                started = time.perf_counter()
+                vectors = self.embed([doc.page_content for _, doc in batch])
+                stats["embed_seconds"] += time.perf_counter() - started
+                embedded.put(([chunk_id for chunk_id, _ in batch], [doc for _, doc in batch], vectors))
+        except Exception as e:
+            errors.append(e)
+            # Drain the parser so it can reach its sentinel and exit
+            while batches.get() is not _SENTINEL:
+                pass
+        finally:
+            embedded.put(_SENTINEL)
+            parser.join()
+            writer.join()
+
+        if errors:
+            raise errors[0]
+
+        total_seconds = time.perf_counter() - stats.pop("_started")
+        stats["total_seconds"] = round(total_seconds, 3)
+        stats["embed_seconds"] = round(stats["embed_seconds"], 3)
+        stats["write_seconds"] = round(stats["write_seconds"], 3)
+        stats["chunks_per_second"] = round(stats["chunks"] / total_seconds, 2) if total_seconds > 0 else None
+        stats["batch_size"] = self.batch_size
+        stats["backend"] = self.backend
+        stats["workers"] = self.workers
+        print(f"✅ Embedded {stats['chunks']} chunks at {stats['chunks_per_second']} chunks/s.")
+        return stats
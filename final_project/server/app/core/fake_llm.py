@@ -0,0 +1,155 @@
+import asyncio
+import json
+import os
+import re
+import time
+import typing
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+QUESTION_RE = re.compile(r"(?:Original Question|Question):\s*(.+)", re.IGNORECASE)
+SQL_TERMS_RE = re.compile(
+    r"\b(cars?|price|prices|city|make|model|fuel|diesel|petrol|cng|kms|listings?|listed|sale|"
+    r"cheapest|average|hatchbacks?|sedans?|suvs?|viewed|owners|transmission|warranty)\b",
+    re.IGNORECASE
+)
+
+# Canned NL-to-SQL answers, first matching pattern wins
+CANNED_SQL = [
+    (re.compile(r"\b(average|avg|mean)\b", re.IGNORECASE),
+     "SELECT city, AVG(sale_price) AS avg_price FROM used_cars GROUP BY city"),
+    (re.compile(r"\b(how many|count|number of)\b", re.IGNORECASE),
+     "SELECT COUNT(*) AS listings FROM used_cars"),
+    (re.compile(r"\b(most viewed|top|popular)\b", re.IGNORECASE),
+     "SELECT car_name, times_viewed FROM used_cars ORDER BY times_viewed DESC LIMIT 5"),
+    (re.compile(r"\b(cheapest|lowest|under)\b", re.IGNORECASE),
+     "SELECT car_name, sale_price, city FROM used_cars ORDER BY sale_price ASC LIMIT 5"),
+]
+DEFAULT_SQL = "SELECT car_name, yr_mfr, sale_price, city FROM used_cars LIMIT 10"
+# Values of required fields of schemas without a canned answer, by (origin) type
+FIELD_DEFAULTS = {str: "", bool: False, int: 0, float: 0.0, list: [], dict: {}}
+
+
+def _question(messages):
+    for message in reversed(messages):
+        match = QUESTION_RE.search(str(message.content))
+        if match:
+            return match.group(1).strip()
+    return str(messages[-1].content).strip() if messages else ""
+
+
+def _default_output(schema):
+    # Optional fields keep their own defaults, required ones get an empty value of their type
+    values = {}
+    for name, field in schema.model_fields.items():
+        if not field.is_required():
+            continue
+        kind = typing.get_origin(field.annotation) or field.annotation
+        if kind not in FIELD_DEFAULTS:
+            raise ValueError(
+                f"No canned output for schema {schema.__name__}: field {name} ({field.annotation}) has no default"
+            )
+        values[name] = FIELD_DEFAULTS[kind]
+    return schema(**values).model_dump(mode="json")
+
+
+def canned_structured(schema, question):
+    """
+    Deterministic structured output for the schemas DatabaseAgent asks for, any other
+    pydantic schema gets an instance built from its field defaults.
+    """
+    schema_name = schema.__name__
+    if schema_name == "CheckRelevance":
+        return {"relevance": "relevant" if SQL_TERMS_RE.search(question) else "not_relevant"}
+    if schema_name == "ConvertToSQL":
+        sql = next((sql for pattern, sql in CANNED_SQL if pattern.search(question)), DEFAULT_SQL)
+        return {"sql_query": sql}
+    if schema_name == "RewrittenQuestion":
+        return {"question": question}
+    return _default_output(schema)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic local chat model for offline benchmarks, selected with LLM_BACKEND=fake.
+    No network, no keys. Latency is simulated:
+      LLM_FAKE_LATENCY_MS       delay before the first token (default 50)
+      LLM_FAKE_TOKEN_MS         delay per streamed token (default 0)
+      LLM_FAKE_ANSWER_WORDS     length of free-text answers (default 40)
+    Structured output returns canned CheckRelevance / ConvertToSQL / RewrittenQuestion,
+    other schemas an instance built from their field defaults.
+    """
+
+    latency_ms: float = 50.0
+    token_ms: float = 0.0
+    answer_words: int = 40
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(
+            latency_ms=float(os.getenv("LLM_FAKE_LATENCY_MS", "50")),
+            token_ms=float(os.getenv("LLM_FAKE_TOKEN_MS", "0")),
+            answer_words=int(os.getenv("LLM_FAKE_ANSWER_WORDS", "40")),
+            **kwargs
+        )
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _content(self, messages, structured_output=None):
+        question = _question(messages)
+        if structured_output:
+            return json.dumps(canned_structured(structured_output, question))
+        # Free text: the question followed by words of the prompt, so answers differ per input
+        words = " ".join(str(m.content) for m in messages).split()
+        filler = " ".join(words[-self.answer_words:])
+        return f"Offline answer to: {question}. {filler}"
+
+    @staticmethod
+    def _usage(messages, content):
+        # Rough word-based estimate so token accounting has something to report
+        prompt_tokens = sum(len(str(m.content).split()) for m in messages)
+        completion_tokens = len(content.split())
+        return {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _result(self, messages, structured_output):
+        content = self._content(messages, structured_output)
+        message = AIMessage(content=content, usage_metadata=self._usage(messages, content))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, structured_output=None, **kwargs):
+        time.sleep((self.latency_ms + self.token_ms * self.answer_words) / 1000)
+        return self._result(messages, structured_output)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, structured_output=None, **kwargs):
+        await asyncio.sleep((self.latency_ms + self.token_ms * self.answer_words) / 1000)
+        return self._result(messages, structured_output)
+
+    def _stream(self, messages, stop=None, run_manager=None, structured_output=None, **kwargs):
+        time.sleep(self.latency_ms / 1000)
+        for word in self._content(messages, structured_output).split(" "):
+            time.sleep(self.token_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, structured_output=None, **kwargs):
+        await asyncio.sleep(self.latency_ms / 1000)
+        for word in self._content(messages, structured_output).split(" "):
+            await asyncio.sleep(self.token_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, **kwargs):
+        # The canned JSON goes through the normal generate path (latency, callbacks, tokens)
+        return self.bind(structured_output=schema) | RunnableLambda(
+            lambda message: schema.model_validate_json(message.content)
+        )
@@ -0,0 +1,266 @@
+"""
+Index advisor for the SQL workload of DatabaseAgent.
+
+Every statement `execute_sql` runs is logged with its timing. The advisor replays the
+logged SELECTs through EXPLAIN QUERY PLAN, and for each full table scan it proposes an
+index: equality filters first, then range/ORDER BY columns, then the remaining
+referenced columns when that keeps the index covering.
+
+From final_project/server:
+    python -m app.core.index_advisor             # print proposals
+    python -m app.core.index_advisor --apply     # create them in used_cars.db
+"""
+import argparse
+import atexit
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DB_DIR = Path(__file__).resolve().parents[1] / "db"
+DEFAULT_DB_PATH = DB_DIR / "used_cars.db"
+DEFAULT_LOG_PATH = DB_DIR / "sql_workload.db"
+
+SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+IDENT_RE = re.compile(r'"?([A-Za-z_]\w*)"?')
+CLAUSE_RE = re.compile(r"\b(where|group\s+by|order\s+by|having|limit)\b", re.IGNORECASE)
+SELECT_RE = re.compile(r"^\s*select\s+(.*?)\s+from\s+", re.IGNORECASE | re.DOTALL)
+
+
+def normalize_sql(sql_query):
+    return " ".join(sql_query.strip().rstrip(";").split())
+
+
+class SQLWorkloadLog:
+    """
+    Append-only log of executed statements with their latency, kept in a small sqlite
+    file next to the database. Entries are buffered in memory and flushed in batches so
+    the query path only pays for a list append. A batch is written once it holds
+    `flush_every` entries or its oldest entry is older than the flush interval, and
+    whatever is left at interpreter exit.
+      SQL_WORKLOAD_LOG             sqlite file, empty string disables logging
+      SQL_WORKLOAD_MAX_ENTRIES     oldest rows are pruned past this bound (default 20000)
+      SQL_WORKLOAD_FLUSH_SECONDS   longest time an entry stays buffered (default 10)
+    """
+
+    def __init__(self, path=None, max_entries=None, flush_every=50, flush_seconds=None):
+        path = os.getenv("SQL_WORKLOAD_LOG", str(DEFAULT_LOG_PATH)) if path is None else path
+        self.max_entries = max_entries or int(os.getenv("SQL_WORKLOAD_MAX_ENTRIES", "20000"))
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds or float(os.getenv("SQL_WORKLOAD_FLUSH_SECONDS", "10"))
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sql_workload ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, sql_query TEXT, elapsed_ms REAL,"
+                " row_count INTEGER, error TEXT, executed_at REAL)"
+            )
+            self._conn.commit()
+            atexit.register(self.flush)
+
+    @property
+    def enabled(self):
+        return self._conn is not None
+
+    def record(self, sql_query, elapsed_ms, row_count=None, error=None):
+        if self._conn is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._buffer.append((normalize_sql(sql_query), round(elapsed_ms, 3), row_count, error, now))
+            # The buffered rows carry their timestamp, the first one is the oldest
+            if len(self._buffer) >= self.flush_every or now - self._buffer[0][-1] >= self.flush_seconds:
+                self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        self._conn.executemany(
+            "INSERT INTO sql_workload (sql_query, elapsed_ms, row_count, error, executed_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            self._buffer
+        )
+        self._buffer = []
+        self._conn.execute(
+            "DELETE FROM sql_workload WHERE id <= (SELECT MAX(id) FROM sql_workload) - ?",
+            (self.max_entries,)
+        )
+        self._conn.commit()
+
+    def flush(self):
+        if self._conn is None:
+            return
+        with self._lock:
+            self._flush()
+
+    def summary(self, limit=50):
+        """Distinct successful statements, heaviest total time first."""
+        if self._conn is None:
+            return []
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(
+                "SELECT sql_query, COUNT(*), SUM(elapsed_ms), AVG(elapsed_ms), MAX(elapsed_ms)"
+                " FROM sql_workload WHERE error IS NULL"
+                " GROUP BY sql_query ORDER BY SUM(elapsed_ms) DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {"sql_query": sql, "count": count, "total_ms": round(total, 3),
+             "avg_ms": round(avg, 3), "max_ms": round(worst, 3)}
+            for sql, count, total, avg, worst in rows
+        ]
+
+
+class IndexAdvisor:
+    """
+    Turns a workload (list of {"sql_query", "count", "total_ms"}) into index proposals.
+    Only full scans are considered, statements that already use an index are left alone.
+      ADVISOR_MAX_INDEX_COLUMNS  widest index proposed, covering columns included (default 5)
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_columns=None):
+        self.db_path = str(db_path)
+        self.max_columns = max_columns or int(os.getenv("ADVISOR_MAX_INDEX_COLUMNS", "5"))
+
+    def _connect(self, read_only=True):
+        if read_only:
+            return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        return sqlite3.connect(self.db_path)
+
+    @staticmethod
+    def _table_columns(conn, table):
+        return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+    @staticmethod
+    def _clauses(sql_query):
+        """Splits the text after FROM into WHERE / GROUP BY / ORDER BY / ... pieces."""
+        clauses = {}
+        parts = CLAUSE_RE.split(sql_query)
+        for keyword, body in zip(parts[1::2], parts[2::2]):
+            clauses[" ".join(keyword.lower().split())] = body
+        return clauses
+
+    @staticmethod
+    def _referenced(text, columns):
+        lookup = {column.lower(): column for column in columns}
+        found = []
+        for name in IDENT_RE.findall(text or ""):
+            column = lookup.get(name.lower())
+            if column and column not in found:
+                found.append(column)
+        return found
+
+    def candidate_columns(self, sql_query, columns):
+        """Ordered index columns for one statement, or None when nothing is indexable."""
+        clauses = self._clauses(sql_query)
+        where = clauses.get("where", "")
+        equality, ranges = [], []
+        for column in self._referenced(where, columns):
+            pattern = rf'"?\b{re.escape(column)}\b"?\s*'
+            if re.search(pattern + r"(=|\bin\b|\bis\b)", where, re.IGNORECASE):
+                equality.append(column)
+            elif re.search(pattern + r"(<|>|\bbetween\b)", where, re.IGNORECASE):
+                ranges.append(column)
+
+        group_by = self._referenced(clauses.get("group by"), columns)
+        order_by = self._referenced(clauses.get("order by"), columns)
+        # GROUP BY needs its columns right after the equality prefix to avoid a temp b-tree
+        key = equality + [c for c in group_by if c not in equality]
+        key += [c for c in ranges + order_by if c not in key][:1]
+        if not key:
+            return None
+
+        select = SELECT_RE.search(sql_query)
+        select_list = select.group(1) if select else "*"
+        if select_list.strip() != "*" and "*" not in select_list.replace("count(*)", ""):
+            referenced = self._referenced(select_list, columns) + self._referenced(where, columns)
+            referenced += order_by + self._referenced(clauses.get("having"), columns)
+            covering = key + [c for c in referenced if c not in key]
+            if len(covering) <= self.max_columns:
+                return covering
+        return key[:self.max_columns]
+
+    @staticmethod
+    def _index_name(table, columns):
+        return f"idx_advisor_{table}_{'_'.join(columns)}"[:120]
+
+    def analyze(self, workload):
+        proposals = {}
+        with self._connect() as conn:
+            for entry in workload:
+                sql_query = entry["sql_query"]
+                if not sql_query.lower().startswith(("select", "with")):
+                    continue
+                try:
+                    plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql_query}")]
+                except sqlite3.Error:
+                    continue
+                for step in plan:
+                    match = SCAN_RE.match(step)
+                    if not match:
+                        continue
+                    table = match.group(1)
+                    columns = self.candidate_columns(sql_query, self._table_columns(conn, table))
+                    if not columns:
+                        continue
+                    proposal = proposals.setdefault((table, tuple(columns)), {
+                        "table": table,
+                        "columns": columns,
+                        "name": self._index_name(table, columns),
+                        "queries": 0,
+                        "total_ms": 0.0,
+                        "examples": [],
+                    })
+                    proposal["queries"] += entry.get("count", 1)
+                    proposal["total_ms"] = round(proposal["total_ms"] + entry.get("total_ms", 0.0), 3)
+                    if len(proposal["examples"]) < 3:
+                        proposal["examples"].append(sql_query)
+
+        # An index whose columns are a prefix of a wider proposal is redundant
+        ranked = sorted(proposals.values(), key=lambda p: (-len(p["columns"]), -p["total_ms"]))
+        kept = []
+        for proposal in ranked:
+            wider = next((k for k in kept if k["table"] == proposal["table"]
+                          and k["columns"][:len(proposal["columns"])] == proposal["columns"]), None)
+            if wider is not None:
+                wider["queries"] += proposal["queries"]
+                wider["total_ms"] = round(wider["total_ms"] + proposal["total_ms"], 3)
+                continue
+            kept.append(proposal)
+        for proposal in kept:
+            cols = ", ".join(f'"{c}"' for c in proposal["columns"])
+            proposal["sql"] = f'CREATE INDEX IF NOT EXISTS "{proposal["name"]}" ON "{proposal["table"]}" ({cols})'
+        return sorted(kept, key=lambda p: -p["total_ms"])
+
+    def apply(self, proposals):
+        """Creates the proposed indexes and refreshes planner statistics."""
+        with self._connect(read_only=False) as conn:
+            for proposal in proposals:
+                conn.execute(proposal["sql"])
+                print(f"✅ Created index {proposal['name']}")
+            conn.execute("ANALYZE")
+        return [proposal["name"] for proposal in proposals]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH))
+    parser.add_argument("--log", default=str(DEFAULT_LOG_PATH))
+    parser.add_argument("--apply", action="store_true", help="create the proposed indexes")
+    args = parser.parse_args()
+
+    workload = SQLWorkloadLog(path=args.log).summary(limit=200)
+    advisor = IndexAdvisor(args.db)
+    proposals = advisor.analyze(workload)
+    if not proposals:
+        print("No index proposals, the logged workload has no indexable full scans.")
+    for proposal in proposals:
+        print(f"{proposal['sql']};  -- {proposal['queries']} queries, {proposal['total_ms']} ms")
+    if args.apply and proposals:
+        advisor.apply(proposals)
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from app.core.knowledge_base import BuildRag
+
+
+class IngestionJobQueue:
+    """
+    Runs ingestion off the event loop on a small worker pool and keeps per-job progress
+    (stage, chunks embedded, throughput) so clients can poll it by job id. Jobs parse and
+    embed in parallel, a job waiting for another one to finish writing to the store is
+    back in stage "queued" meanwhile.
+    """
+
+    def __init__(self, max_workers=None, max_jobs=200):
+        max_workers = max_workers or int(os.getenv("INGESTION_WORKERS", "2"))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        self._jobs = OrderedDict()
+        self._max_jobs = max_jobs
+        self._lock = threading.Lock()
+
+    def submit(self, file_path, filename):
+        job_id = uuid4().hex
+        job = {
+            "job_id": job_id,
+            "filename": filename,
+            "path": file_path,
+            "stage": "queued",
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "chunks_per_second": None,
+            "result": None,
+            "error": None,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            # Keep memory bounded, oldest finished jobs are forgotten first
+            while len(self._jobs) > self._max_jobs:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if oldest["stage"] not in ("completed", "failed"):
+                    break
+                self._jobs.pop(oldest_id)
+
+        self._executor.submit(self._run, job_id, file_path)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            # The embedding pipeline reports its own rate, otherwise derive it from the job clock
+            if "chunks_per_second" not in fields and job["started_at"] and job["chunks_embedded"]:
+                elapsed = time.time() - job["started_at"]
+                job["chunks_per_second"] = round(job["chunks_embedded"] / elapsed, 2) if elapsed > 0 else None
+
+    def _run(self, job_id, file_path):
+        self._update(job_id, stage="parsing", started_at=time.time())
+        try:
+            stats = BuildRag().ingest_file(
+                file_path,
+                progress=lambda stage, **fields: self._update(job_id, stage=stage, **fields)
+            )
+            self._update(job_id, stage="completed", result=stats, finished_at=time.time())
+        except Exception as e:
+            print(f"❌ Ingestion job {job_id} failed: {e}")
+            self._update(job_id, stage="failed", error=str(e), finished_at=time.time())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+ingestion_jobs = IngestionJobQueue()
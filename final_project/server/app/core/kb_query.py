@@ -1,26 +1,49 @@
 from langchain_community.vectorstores import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
-from langchain.chains import RetrievalQA
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from app.core.llm import get_chat_model
+from app.core.context_packer import ContextPacker, SYSTEM_TEMPLATE
+from app.core.reranker import CrossEncoderReranker
+from app.core.lexical_index import LexicalIndex, rrf_fuse
+from app.core.embedding_cache import CachedEmbeddings
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 from pathlib import Path
 
 
+def _ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
 class RAGQueryEngine:
-    def __init__(self, index_path="../../chroma_store"):
+    """
+    QA over the Chroma store. Retrieval is hybrid: the dense search and a BM25 search of
+    the lexical index (see LexicalIndex) run in parallel and are fused with RRF before the
+    optional re-ranker and the context packer. Every answer reports per-stage timings.
+    """
+
+    def __init__(self, index_path=None):
+        index_path = index_path or os.getenv("CHROMA_PERSIST_DIRECTORY", "../../chroma_store")
         try:
             # Load .env variables
             env_path = Path(__file__).resolve().parent.parent.parent / '.env'
             load_dotenv(dotenv_path=env_path)
 
-            os.environ["HUGGINGFACEHUB_API_TOKEN"] = os.getenv("HUGGINGFACEHUB_API_TOKEN")
-            os.environ["GROQ_API_KEY"] = os.getenv("grok_api_key")
+            # Keys are optional, offline benchmarks (LLM_BACKEND=fake) run without them
+            if os.getenv("HUGGINGFACEHUB_API_TOKEN"):
+                os.environ["HUGGINGFACEHUB_API_TOKEN"] = os.getenv("HUGGINGFACEHUB_API_TOKEN")
+            if os.getenv("grok_api_key"):
+                os.environ["GROQ_API_KEY"] = os.getenv("grok_api_key")
 
-            # Load embedding model
-            self.embedding_model = HuggingFaceEmbeddings(
+            # Load embedding model, repeated questions are answered from the embedding cache
+            self.embedding_model = CachedEmbeddings(HuggingFaceEmbeddings(
                 model_name="sentence-transformers/all-MiniLM-L6-v2"
-            )
+            ))
 
             # Load Chroma vectorstore
             self.vectorstore = Chroma(
@@ -30,31 +53,115 @@ class RAGQueryEngine:
             )
             print("✅ Chroma index loaded.")
 
-            # Create retriever
-            self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 2})
+            # Over-fetch candidates, the optional re-ranker and the packer trim them
+            self.packer = ContextPacker.from_env(fetch_k=6, token_budget=300)
+            self.reranker = CrossEncoderReranker.from_env()
+            self.fetch_k = max(self.packer.fetch_k, self.reranker.top_n) if self.reranker else self.packer.fetch_k
+            self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": self.fetch_k})
+
+            # BM25 index written by BuildRag next to the Chroma files
+            self.lexical = LexicalIndex.from_env(index_path, k=self.fetch_k)
+            if self.lexical:
+                self._backfill_lexical()
+                self._lexical_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="lexical")
 
             # Initialize LLM
-            self.llm = ChatGroq(
-                temperature=0,
-                model_name="llama-3.3-70b-versatile"
-            )
+            self.llm = get_chat_model("knowledge_base", model="llama-3.3-70b-versatile", temperature=0)
 
-            # Build the QA chain
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                retriever=self.retriever,
-                chain_type="stuff"
-            )
+            # Build the QA chain, the context is packed before it is filled in
+            prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_TEMPLATE), ("human", "{question}")])
+            self.qa_chain = prompt | self.llm | StrOutputParser()
             print("✅ RAG Query Engine initialized.\n")
 
         except Exception as e:
             print(f"❌ Initialization error: {e}")
             raise
 
+    def _backfill_lexical(self):
+        # Stores ingested before the lexical index existed, chunks already indexed are ignored
+        stored = self.vectorstore._collection.count()
+        if stored and self.lexical.count() < stored:
+            chunks = self.vectorstore.get(include=["documents", "metadatas"])
+            docs = [Document(page_content=text, metadata=metadata or {})
+                    for text, metadata in zip(chunks["documents"], chunks["metadatas"])]
+            self.lexical.add(chunks["ids"], docs)
+            print(f"✅ Lexical index backfilled with {len(docs)} chunks.")
+
+    def _lexical_search(self, query):
+        started = time.perf_counter()
+        return self.lexical.search(query), _ms(started)
+
+    def _dense_search(self, query):
+        started = time.perf_counter()
+        return self.retriever.invoke(query), _ms(started)
+
+    async def _adense_search(self, query):
+        started = time.perf_counter()
+        return await self.retriever.ainvoke(query), _ms(started)
+
+    def _rerank(self, query, docs):
+        return self.reranker.rerank(query, docs) if self.reranker else docs
+
+    def _fuse_and_rerank(self, query, dense, lexical, timings):
+        (dense_docs, timings["dense_ms"]), (lexical_docs, timings["lexical_ms"]) = dense, lexical
+        started = time.perf_counter()
+        docs = rrf_fuse([dense_docs, lexical_docs], k=self.lexical.rrf_k)[:self.fetch_k] if lexical_docs else dense_docs
+        timings["fusion_ms"] = _ms(started)
+        started = time.perf_counter()
+        docs = self._rerank(query, docs)
+        timings["rerank_ms"] = _ms(started)
+        return docs
+
+    def _inputs(self, query, docs, timings):
+        started = time.perf_counter()
+        context, stats = self.packer.pack(docs)
+        timings["pack_ms"] = _ms(started)
+        print(f"Context packed: {stats}, timings: {timings}")
+        return {"context": context, "question": query}, stats
+
+    def retrieve(self, query, timings=None):
+        """Fused, re-ranked candidates for `query`, stage timings are recorded in `timings`."""
+        timings = {} if timings is None else timings
+        if self.lexical:
+            lexical = self._lexical_pool.submit(self._lexical_search, query)
+            dense = self._dense_search(query)
+            return self._fuse_and_rerank(query, dense, lexical.result(), timings)
+        return self._fuse_and_rerank(query, self._dense_search(query), ([], 0.0), timings)
+
+    async def aretrieve(self, query, timings=None):
+        timings = {} if timings is None else timings
+        if self.lexical:
+            dense, lexical = await asyncio.gather(
+                self._adense_search(query), asyncio.to_thread(self._lexical_search, query)
+            )
+        else:
+            dense, lexical = await self._adense_search(query), ([], 0.0)
+        # Cross-encoder scoring is CPU bound, keep it off the event loop
+        return await asyncio.to_thread(self._fuse_and_rerank, query, dense, lexical, timings)
+
     def ask(self, query: str):
         try:
-            response = self.qa_chain.invoke(query)
-            return response
+            timings = {}
+            docs = self.retrieve(query, timings)
+            inputs, stats = self._inputs(query, docs, timings)
+            started = time.perf_counter()
+            result = self.qa_chain.invoke(inputs)
+            timings["llm_ms"] = _ms(started)
+            # Same keys as the RetrievalQA output, plus the packing stats and stage timings
+            return {"query": query, "result": result, "context": stats, "timings": timings}
+        except Exception as e:
+            print(f"❌ Error during query: {e}")
+            return None
+
+    async def aask(self, query: str):
+        try:
+            timings = {}
+            docs = await self.aretrieve(query, timings)
+            inputs, stats = self._inputs(query, docs, timings)
+            started = time.perf_counter()
+            result = await self.qa_chain.ainvoke(inputs)
+            timings["llm_ms"] = _ms(started)
+            return {"query": query, "result": result, "context": stats, "timings": timings}
         except Exception as e:
             print(f"❌ Error during query: {e}")
             return None
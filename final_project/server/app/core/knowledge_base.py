@@ -2,11 +2,53 @@ from langchain.document_loaders import PyPDFLoader, DirectoryLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 # from langchain_community.vectorstores import FAISS
 from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from uuid import uuid4
+from contextlib import contextmanager
+from pathlib import Path
+import os, threading
+
+from app.core.ingest_manifest import IngestManifest, hash_file, chunk_ids
+from app.core.embedding_pipeline import EmbeddingPipeline
+from app.core.lexical_index import LEXICAL_FILE, LexicalIndex
+
+# Serialises store writes and the manifest read-modify-write across concurrent uploads,
+# parsing and embedding of concurrent jobs run outside of it
+_ingest_lock = threading.RLock()
+
+
+@contextmanager
+def _locked(progress=None):
+    # A job waiting for another job's write reports "queued" meanwhile
+    if not _ingest_lock.acquire(blocking=False):
+        if progress:
+            progress("queued")
+        _ingest_lock.acquire()
+    try:
+        yield
+    finally:
+        _ingest_lock.release()
+
 
 class BuildRag:
 
+    def __init__(self, persist_directory=None, pipeline=None):
+        # Local folder for persistence, CHROMA_PERSIST_DIRECTORY points it elsewhere
+        persist_directory = persist_directory or os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_store")
+        self.persist_directory = persist_directory
+        self.manifest_path = Path(persist_directory) / "ingest_manifest.json"
+        self.pipeline = pipeline or EmbeddingPipeline()
+        # BM25 index of the same chunks, updated together with Chroma
+        self.lexical = LexicalIndex(Path(persist_directory) / LEXICAL_FILE)
+
+    def _splitter(self):
+        return RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+
+    def _vector_store(self):
+        # Vectors are computed by the embedding pipeline, the store only persists them
+        return Chroma(
+            collection_name="my_docs",
+            persist_directory=self.persist_directory
+        )
+
     def load_documents(self, path):
         try:
             # Loading documents
@@ -14,36 +56,188 @@ class BuildRag:
             docs = loader.load()
 
             # Splitting text
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-            texts = text_splitter.split_documents(docs)
+            texts = self._splitter().split_documents(docs)
             return texts
         except Exception as e:
             print(f"❌ Error while loading documents: {e}")
-            raise e        
+            raise e
 
-    def embedding_vector_store(self, texts):
+    def load_file(self, file_path):
         try:
-            embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-            # vectorstore = FAISS.from_documents(texts, embedding_model)
-            # vectorstore.save_local("faiss_index")
-            persist_directory = "./chroma_store"  # Local folder for persistence
-
-            vector_store = Chroma(
-                collection_name="my_docs",
-                embedding_function=embedding_model,
-                persist_directory=persist_directory
-            )
-            ids = [str(uuid4()) for _ in range(len(texts))]
-            vector_store.add_documents(documents=texts, ids=ids)
-            vector_store.persist()
+            docs = PyPDFLoader(str(file_path)).load()
+            return self._splitter().split_documents(docs)
+        except Exception as e:
+            print(f"❌ Error while loading {file_path}: {e}")
+            raise e
+
+    def _writer(self, vector_store, progress=None):
+        def write(ids, docs, vectors):
+            with _locked(progress):
+                vector_store._collection.upsert(
+                    ids=ids,
+                    embeddings=vectors,
+                    documents=[doc.page_content for doc in docs],
+                    metadatas=[doc.metadata for doc in docs]
+                )
+                self.lexical.add(ids, docs)
+        return write
+
+    def embedding_vector_store(self, texts, ids=None, vector_store=None, progress=None):
+        try:
+            if vector_store is None:
+                vector_store = self._vector_store()
+            if ids is None:
+                ids = self._content_ids(texts)
+
+            # Skip chunks whose content hash is already stored
+            existing = set(vector_store.get(ids=ids, include=[])["ids"]) if ids else set()
+            new = [(chunk_id, doc) for chunk_id, doc in zip(ids, texts) if chunk_id not in existing]
+            stats = self.pipeline.run(iter(new), self._writer(vector_store, progress), progress=progress)
+            if new:
+                with _locked(progress):
+                    vector_store.persist()
 
-            print(f"✅ {len(texts)} documents stored in Chroma.")
+            print(f"✅ {len(new)} documents stored in Chroma, {len(texts) - len(new)} unchanged skipped.")
+            return stats
 
         except Exception as e:
             print(f"❌ Error while creating embeddings and vector store {e}")
             raise e
-        
+
+    def _content_ids(self, texts):
+        by_source = {}
+        for index, doc in enumerate(texts):
+            source = Path(doc.metadata.get("source", "")).name
+            by_source.setdefault(source, []).append(index)
+        ids = [None] * len(texts)
+        for source, indexes in by_source.items():
+            for index, chunk_id in zip(indexes, chunk_ids(source, [texts[i] for i in indexes])):
+                ids[index] = chunk_id
+        return ids
+
+    def _ingest_changed(self, changed, manifest, vector_store, progress=None):
+        """
+        Stream the chunks of every changed file through the embedding pipeline. Parsing of
+        the next file overlaps with embedding and writing of the previous one. `manifest`
+        is the snapshot taken when the ingest started, chunks it lists are not embedded again.
+        """
+        results = {}
+
+        def chunk_source():
+            # Runs on the pipeline's parser thread
+            for file_path, file_hash in changed:
+                name = file_path.name
+                if progress:
+                    progress("parsing", current_file=name)
+                texts = self.load_file(file_path)
+                ids = chunk_ids(name, texts)
+                previous = set(manifest.chunk_ids(name))
+
+                new = [(chunk_id, doc) for chunk_id, doc in zip(ids, texts) if chunk_id not in previous]
+                results[name] = {
+                    "file": name,
+                    "skipped": False,
+                    "chunks_added": len(new),
+                    "chunks_unchanged": len(texts) - len(new),
+                    "chunks_deleted": 0,
+                    "_hash": file_hash,
+                    "_ids": ids,
+                    "_reused": {chunk_id: doc for chunk_id, doc in zip(ids, texts) if chunk_id in previous},
+                }
+                if progress:
+                    progress("embedding", chunks_total=sum(r["chunks_added"] for r in results.values()))
+                yield from new
+
+        pipeline_stats = self.pipeline.run(chunk_source(), self._writer(vector_store, progress), progress=progress)
+        for result in results.values():
+            result["pipeline"] = pipeline_stats
+        return list(results.values())
+
+    def _commit(self, results, vector_store, manifest=None, directory=None, progress=None):
+        """
+        Record ingested files, under the lock and against the manifest as it is now: other
+        jobs may have committed since this one took its snapshot. Chunks the manifest
+        lists for a file but its new version lacks are deleted here, so the old version
+        stays searchable until the new one is written. With `directory`, files no longer in
+        it are removed. A caller passing `manifest` saves it itself.
+        """
+        if progress:
+            progress("writing")
+        with _locked(progress):
+            current = manifest if manifest is not None else IngestManifest(self.manifest_path)
+            removed = []
+            for result in results:
+                ids = result.pop("_ids")
+                reused = result.pop("_reused")
+                committed = set(current.chunk_ids(result["file"]))
+                stale = list(committed - set(ids))
+                if stale:
+                    vector_store.delete(ids=stale)
+                    self.lexical.delete(stale)
+                result["chunks_deleted"] = len(stale)
+                # Chunks of the snapshot that a concurrent ingest of this file deleted meanwhile
+                lost = [chunk_id for chunk_id in reused if chunk_id not in committed]
+                if lost:
+                    docs = [reused[chunk_id] for chunk_id in lost]
+                    self._writer(vector_store)(lost, docs, self.pipeline.embed([doc.page_content for doc in docs]))
+                current.record(result["file"], result.pop("_hash"), ids)
+
+            if directory is not None:
+                for name in list(current.files):
+                    # Checked on disk, a file uploaded after the scan may be committed already
+                    if not (Path(directory) / name).exists():
+                        stale = current.chunk_ids(name)
+                        if stale:
+                            vector_store.delete(ids=stale)
+                            self.lexical.delete(stale)
+                        current.forget(name)
+                        removed.append({"file": name, "removed": True, "chunks_deleted": len(stale)})
+
+            vector_store.persist()
+            # Files are recorded only once all their chunks are written, so an interrupted
+            # ingest is redone next time (upserts by content id make that idempotent)
+            if manifest is None:
+                current.save()
+            return removed
+
+    def ingest_file(self, file_path, vector_store=None, manifest=None, progress=None):
+        """
+        Embed only what changed in one PDF: unchanged files are skipped by file hash,
+        unchanged chunks by chunk hash, and chunks no longer in the file are deleted.
+        `progress(stage, **fields)` is called as the file moves through the stages.
+        """
+        file_path = Path(file_path)
+        name = file_path.name
+
+        snapshot = manifest if manifest is not None else IngestManifest(self.manifest_path)
+        file_hash = hash_file(file_path)
+        if snapshot.file_hash(name) == file_hash:
+            print(f"⏭️ {name} unchanged, skipping ingestion.")
+            return {"file": name, "skipped": True, "chunks_added": 0, "chunks_unchanged": 0, "chunks_deleted": 0}
+
+        if vector_store is None:
+            vector_store = self._vector_store()
+        stats = self._ingest_changed([(file_path, file_hash)], snapshot, vector_store, progress)
+        self._commit(stats, vector_store, manifest=manifest, progress=progress)
+        return stats[0]
+
+    def ingest_directory(self, path, progress=None):
+        """Sync the vector store with every PDF in `path`, removing vectors of deleted files."""
+        snapshot = IngestManifest(self.manifest_path)
+        vector_store = self._vector_store()
+        changed = []
+        results = []
+        for file_path in sorted(Path(path).glob("*.pdf")):
+            file_hash = hash_file(file_path)
+            if snapshot.file_hash(file_path.name) == file_hash:
+                results.append({"file": file_path.name, "skipped": True})
+            else:
+                changed.append((file_path, file_hash))
+
+        ingested = self._ingest_changed(changed, snapshot, vector_store, progress) if changed else []
+        removed = self._commit(ingested, vector_store, directory=path, progress=progress)
+        return results + ingested + removed
+
 if __name__ == '__main__':
     build_instance = BuildRag()
-    texts = build_instance.load_documents('./documents')
-    build_instance.embedding_vector_store(texts)
+    print(build_instance.ingest_directory('./documents'))
@@ -4,12 +4,22 @@ from pydantic import BaseModel, Field
 # --- Graph state ---
 class GraphState(TypedDict):
     query: str
+    original_query: str
     relevance: str
+    route_source: str
+    ambiguous: bool
     answer: str 
     sql_query: str
+    sql_validation: dict
+    sql_engine: str
+    query_columns: list
     query_rows: list
+    row_count: int
+    rows_truncated: bool
     attempts: int
     sql_error: bool
+    query_result: str
+    sql_cache_hit: bool
 
 class CheckRelevance(BaseModel):
     relevance: str = Field(
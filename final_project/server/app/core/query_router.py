@@ -0,0 +1,228 @@
+import os
+import re
+import threading
+
+import numpy as np
+
+# Labelled seed questions for the nearest-centroid classifier
+SEED_EXAMPLES = {
+    "convert_to_sql": [
+        "Show me the cheapest diesel cars in Delhi",
+        "What is the average sale price by city?",
+        "How many cars are listed for sale?",
+        "Top 5 most viewed hatchbacks",
+        "Which make has the most listings?",
+        "List automatic SUVs manufactured after 2018",
+        "Cars with less than 30000 kms run under 5 lakh",
+        "How many petrol cars are available in Bangalore?",
+        "Which used cars have a warranty available?",
+        "Average kms run of Maruti Swift cars",
+    ],
+    "knowledge_base": [
+        "What is generative AI?",
+        "Explain retrieval augmented generation",
+        "How do transformer models work?",
+        "What is prompt engineering?",
+        "Why do large language models hallucinate?",
+        "What is the difference between fine-tuning and RAG?",
+        "Explain embeddings and vector databases",
+        "What are AI agents?",
+        "Summarize the course document",
+        "What are the risks of generative AI?",
+    ],
+}
+
+STOPWORDS = {
+    "the", "and", "for", "are", "how", "you", "can", "all", "any", "not", "but", "has",
+    "was", "per", "new", "out", "run", "from", "with", "what", "which", "when", "where",
+    "that", "this", "have", "does", "show", "list", "give", "there", "about", "their",
+    "type", "name", "created",
+}
+
+# Everyday words that happen to be column values (car_rating, source, city...), they
+# show up in knowledge-base questions just as often and say nothing about the schema
+COMMON_WORDS = {
+    "good", "great", "fair", "best", "better", "bad", "high", "low", "old", "first", "last",
+    "top", "open", "online", "offline", "stock", "transit", "pending", "pickup", "person",
+    "customer", "sale", "hot", "city", "state", "model", "source", "original", "price",
+    "variant", "code", "data", "fit", "every", "other", "one", "two", "more", "most", "less",
+    "only", "used", "use", "work", "make", "made", "like", "just", "also", "into", "over",
+    "under", "after", "before", "some", "many", "much", "each", "such", "than", "then",
+    "them", "they", "will", "would", "should", "could", "why", "who", "whom", "its", "our",
+    "your", "his", "her", "time", "year", "way", "day", "part", "case", "point", "world",
+    "true", "false", "none", "null", "yes",
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _tokens(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def _terms(text):
+    return {t for t in _tokens(text) if len(t) >= 3 and t not in STOPWORDS}
+
+
+def _value_terms(text):
+    return {t for t in _terms(text) if t not in COMMON_WORDS and not t.isdigit()}
+
+
+class FastPathRouter:
+    """
+    Local routing ahead of the LLM relevance check. A keyword stage matches the question
+    against column names and low-cardinality column values of the cached schema, then a
+    nearest-centroid classifier over MiniLM embeddings of SEED_EXAMPLES decides. Only when
+    neither is confident does the graph fall back to `check_relevance`.
+
+    Column names alone are generic words (model, price, source), so the keyword stage only
+    routes when at least one term is a column value, questions hitting column names only
+    go to the LLM.
+
+    Thresholds are read from the environment:
+      ROUTER_KEYWORD_HITS      distinct schema terms, one of them a column value, that send
+                               a question to SQL (default 2)
+      ROUTER_CENTROID_MARGIN   minimum cosine gap between the two centroids (default 0.08)
+      ROUTER_CENTROID_MIN_SIM  minimum cosine similarity to the winning centroid (default 0.3)
+    """
+
+    def __init__(self, db_agent, embeddings_provider=None, max_distinct_values=200):
+        self.db_agent = db_agent
+        self.embeddings_provider = embeddings_provider
+        self.max_distinct_values = max_distinct_values
+        self.keyword_hits = int(os.getenv("ROUTER_KEYWORD_HITS", "2"))
+        self.centroid_margin = float(os.getenv("ROUTER_CENTROID_MARGIN", "0.08"))
+        self.centroid_min_sim = float(os.getenv("ROUTER_CENTROID_MIN_SIM", "0.3"))
+
+        self._lock = threading.Lock()
+        self._vocabulary = None
+        self._vocabulary_schema = None
+        self._centroids = None
+        self._stats = {"keyword": {}, "centroid": {}, "llm": {}}
+
+    # --- Keyword stage ---
+    def _build_vocabulary(self, schema):
+        """(column terms, value terms) of the user tables in `schema`."""
+        columns, values = set(), set()
+        text_columns = []
+        table = None
+        for line in schema.splitlines():
+            if line.startswith("Table: "):
+                table = line[len("Table: "):].strip()
+                if table.lower().startswith("sqlite_"):
+                    # Internal bookkeeping (sqlite_sequence...), not something users ask about
+                    table = None
+                    continue
+                columns.update(_terms(table))
+            elif line.startswith("- ") and ":" in line and table:
+                column, col_type = line[2:].split(":", 1)
+                column = column.strip()
+                columns.add(column.lower())
+                columns.update(_terms(column.replace("_", " ")))
+                if "TEXT" in col_type.upper():
+                    text_columns.append((table, column))
+
+        # Categorical values (cities, makes, fuel types...) are strong SQL signals
+        with self.db_agent.engine.connect() as conn:
+            for table, column in text_columns:
+                count = conn.exec_driver_sql(f'SELECT COUNT(DISTINCT "{column}") FROM "{table}"').scalar()
+                if count and count <= self.max_distinct_values:
+                    for (value,) in conn.exec_driver_sql(f'SELECT DISTINCT "{column}" FROM "{table}"'):
+                        if isinstance(value, str):
+                            values.update(_value_terms(value))
+        return columns, values
+
+    def _vocabulary_for_schema(self):
+        schema = self.db_agent.get_database_schema()
+        with self._lock:
+            if self._vocabulary is None or self._vocabulary_schema != schema:
+                self._vocabulary = self._build_vocabulary(schema)
+                self._vocabulary_schema = schema
+            return self._vocabulary
+
+    @staticmethod
+    def _words(query):
+        tokens = _tokens(query)
+        return set(tokens) | {"_".join(pair) for pair in zip(tokens, tokens[1:])}
+
+    def keyword_matches(self, query):
+        columns, values = self._vocabulary_for_schema()
+        return sorted(self._words(query) & (columns | values))
+
+    def value_matches(self, query):
+        """Query terms that are column values (cities, makes, fuel types...)."""
+        _, values = self._vocabulary_for_schema()
+        return sorted(self._words(query) & values)
+
+    # --- Embedding stage ---
+    def _embeddings(self):
+        if self.embeddings_provider is None:
+            return None
+        try:
+            return self.embeddings_provider()
+        except Exception as e:
+            print(f"⚠️ Router embeddings unavailable, skipping centroid stage: {e}")
+            return None
+
+    def _get_centroids(self, embeddings):
+        with self._lock:
+            if self._centroids is None:
+                centroids = {}
+                for route, examples in SEED_EXAMPLES.items():
+                    vectors = np.asarray(embeddings.embed_documents(examples), dtype=np.float32)
+                    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                    centroid = vectors.mean(axis=0)
+                    centroids[route] = centroid / np.linalg.norm(centroid)
+                self._centroids = centroids
+            return self._centroids
+
+    def centroid_scores(self, query):
+        embeddings = self._embeddings()
+        if embeddings is None:
+            return {}
+        centroids = self._get_centroids(embeddings)
+        vector = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+        vector /= np.linalg.norm(vector)
+        return {route: float(vector @ centroid) for route, centroid in centroids.items()}
+
+    # --- Routing ---
+    def _record(self, source, route):
+        with self._lock:
+            self._stats[source][route] = self._stats[source].get(route, 0) + 1
+
+    def route(self, query):
+        """Returns (route, source, details); route is None when the LLM has to decide."""
+        matches = self.keyword_matches(query)
+        if len(matches) >= self.keyword_hits:
+            if self.value_matches(query):
+                self._record("keyword", "convert_to_sql")
+                return "convert_to_sql", "keyword", {"matches": matches}
+            # Only column names ("model", "price"), as likely a knowledge-base question
+            self._record("llm", "ambiguous")
+            return None, "llm", {"matches": matches}
+
+        scores = self.centroid_scores(query)
+        if scores:
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            (best, best_score), (_, second_score) = ranked[0], ranked[1]
+            confident = best_score >= self.centroid_min_sim and best_score - second_score >= self.centroid_margin
+            # A lone schema term next to a knowledge-base centroid is still ambiguous
+            if confident and not (best == "knowledge_base" and matches):
+                self._record("centroid", best)
+                return best, "centroid", {"matches": matches, "scores": scores}
+
+        self._record("llm", "fallback")
+        return None, "llm", {"matches": matches, "scores": scores}
+
+    def stats(self):
+        with self._lock:
+            counts = {source: dict(routes) for source, routes in self._stats.items()}
+        total = sum(sum(routes.values()) for routes in counts.values())
+        return {
+            "total": total,
+            "counts": counts,
+            "hit_rates": {
+                source: round(sum(routes.values()) / total, 4) if total else 0.0
+                for source, routes in counts.items()
+            },
+        }
@@ -0,0 +1,55 @@
+import re
+from collections import Counter
+
+LIMIT_RE = re.compile(r"\blimit\s+(\d+)(?:\s*(?:,|offset)\s*\d+)?\s*$", re.IGNORECASE)
+
+
+def bound_select(sql_query, max_rows):
+    """
+    Push a row cap into a SELECT so the database stops early. One extra row is requested
+    to tell whether the result was truncated. An existing LIMIT within the cap is kept.
+    """
+    sql_query = sql_query.strip().rstrip(";").strip()
+    match = LIMIT_RE.search(sql_query)
+    if match is None:
+        return f"{sql_query}\nLIMIT {max_rows + 1}"
+    if int(match.group(1)) <= max_rows + 1:
+        return sql_query
+    return f"SELECT * FROM (\n{sql_query}\n) LIMIT {max_rows + 1}"
+
+
+def format_rows(columns, rows):
+    header = ", ".join(columns)
+    data = "; ".join(
+        ", ".join(f"{column}: {value}" for column, value in zip(columns, row))
+        for row in rows
+    )
+    return f"{header}\n{data}"
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def summarize_rows(columns, rows, sample_size=10, top_values=3):
+    """
+    Compact text for the LLM when a result set is large: per-column aggregate stats
+    (min/max/mean for numbers, distinct count and most common values otherwise)
+    followed by a small sample of rows.
+    """
+    lines = [f"Rows returned: {len(rows)}", "Column statistics:"]
+    for index, column in enumerate(columns):
+        values = [row[index] for row in rows if row[index] is not None]
+        if not values:
+            lines.append(f"- {column}: all null")
+        elif all(_is_number(value) for value in values):
+            mean = sum(values) / len(values)
+            lines.append(f"- {column}: min {min(values)}, max {max(values)}, mean {round(mean, 2)}")
+        else:
+            counts = Counter(str(value) for value in values)
+            common = ", ".join(f"{value} ({count})" for value, count in counts.most_common(top_values))
+            lines.append(f"- {column}: {len(counts)} distinct, most common: {common}")
+
+    lines.append(f"Sample of {min(sample_size, len(rows))} rows:")
+    lines.append(format_rows(columns, rows[:sample_size]))
+    return "\n".join(lines)
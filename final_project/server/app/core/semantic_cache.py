@@ -0,0 +1,214 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[1] / "db" / "semantic_cache.db"
+
+
+def normalize_question(question):
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+
+NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+class SemanticSQLCache:
+    """
+    Maps questions to SQL that already executed successfully. A new question reuses the
+    SQL of the most similar cached question when the cosine similarity of their embeddings
+    is above the threshold. Only the SQL is cached, it is re-run so answers stay fresh.
+    Questions that differ only in a literal embed very close ("diesel cars in Delhi" and
+    "... in Mumbai", 2018 and 2019), so a hit also needs the same literals: the numbers in
+    the question and the schema values returned by `literals_provider(question)`.
+
+    Entries live in memory (LRU + TTL) and in a sqlite file so they survive restarts.
+      SQL_CACHE_THRESHOLD    minimum cosine similarity for a hit (default 0.92)
+      SQL_CACHE_MAX_ENTRIES  LRU bound (default 1000)
+      SQL_CACHE_TTL_SECONDS  entry lifetime (default 86400)
+      SQL_CACHE_PATH         sqlite file (default app/db/semantic_cache.db)
+    """
+
+    def __init__(self, embeddings_provider, db_path=None, threshold=None, max_entries=None, ttl_seconds=None,
+                 literals_provider=None):
+        db_path = db_path or os.getenv("SQL_CACHE_PATH", str(DEFAULT_CACHE_PATH))
+        self.embeddings_provider = embeddings_provider
+        self.literals_provider = literals_provider
+        self.threshold = threshold or float(os.getenv("SQL_CACHE_THRESHOLD", "0.92"))
+        self.max_entries = max_entries or int(os.getenv("SQL_CACHE_MAX_ENTRIES", "1000"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("SQL_CACHE_TTL_SECONDS", "86400"))
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # normalized question -> entry, least recently used first
+        self._matrix = None
+        self._matrix_keys = []
+        self._stats = {"hits": 0, "exact_hits": 0, "misses": 0, "literal_mismatches": 0, "stores": 0,
+                       "evictions": 0, "invalidations": 0}
+
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_sql_cache ("
+            " normalized TEXT PRIMARY KEY, question TEXT, sql_query TEXT,"
+            " embedding BLOB, created_at REAL, last_used REAL)"
+        )
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        cutoff = time.time() - self.ttl_seconds
+        self._conn.execute("DELETE FROM semantic_sql_cache WHERE created_at < ?", (cutoff,))
+        self._conn.commit()
+        rows = self._conn.execute(
+            "SELECT normalized, question, sql_query, embedding, created_at, last_used"
+            " FROM semantic_sql_cache ORDER BY last_used DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+        for normalized, question, sql_query, embedding, created_at, last_used in reversed(rows):
+            self._entries[normalized] = {
+                "question": question,
+                "sql_query": sql_query,
+                "vector": np.frombuffer(embedding, dtype=np.float32),
+                "created_at": created_at,
+                "last_used": last_used,
+            }
+        print(f"✅ Semantic SQL cache loaded with {len(self._entries)} entries.")
+
+    def _embed(self, question):
+        vector = np.asarray(self.embeddings_provider().embed_query(question), dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def _literals(self, question):
+        literals = set(NUMBER_RE.findall(question))
+        if self.literals_provider is not None:
+            literals.update(self.literals_provider(question))
+        return frozenset(literals)
+
+    def _entry_literals(self, entry):
+        # Computed on first use, entries loaded from disk only carry the question
+        if "literals" not in entry:
+            entry["literals"] = self._literals(entry["question"])
+        return entry["literals"]
+
+    def _expired(self, entry, now):
+        return now - entry["created_at"] > self.ttl_seconds
+
+    def _remove(self, normalized):
+        self._entries.pop(normalized, None)
+        self._matrix = None
+        self._conn.execute("DELETE FROM semantic_sql_cache WHERE normalized = ?", (normalized,))
+        self._conn.commit()
+
+    def _search_matrix(self):
+        # Stacked vectors are rebuilt only after the entry set changes
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries)
+            self._matrix = (
+                np.stack([self._entries[key]["vector"] for key in self._matrix_keys])
+                if self._matrix_keys else None
+            )
+        return self._matrix, self._matrix_keys
+
+    def _touch(self, normalized, now):
+        entry = self._entries[normalized]
+        entry["last_used"] = now
+        self._entries.move_to_end(normalized)
+        self._conn.execute(
+            "UPDATE semantic_sql_cache SET last_used = ? WHERE normalized = ?", (now, normalized)
+        )
+        self._conn.commit()
+        return entry
+
+    def lookup(self, question):
+        """Returns {"sql_query", "similarity", "cached_question"} or None."""
+        normalized = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(normalized)
+            if entry is not None and not self._expired(entry, now):
+                self._stats["hits"] += 1
+                self._stats["exact_hits"] += 1
+                entry = self._touch(normalized, now)
+                return {"sql_query": entry["sql_query"], "similarity": 1.0, "cached_question": entry["question"]}
+
+        vector = self._embed(question)
+        literals = self._literals(question)
+        with self._lock:
+            matrix, keys = self._search_matrix()
+            if matrix is not None:
+                similarities = matrix @ vector
+                mismatched = False
+                # Most similar first, the best paraphrase may name other literals
+                for best in np.argsort(-similarities):
+                    if similarities[best] < self.threshold:
+                        break
+                    key = keys[best]
+                    entry = self._entries.get(key)
+                    if entry is None:
+                        continue
+                    if self._expired(entry, now):
+                        # Less similar entries above the threshold may still be valid
+                        self._remove(key)
+                        self._stats["evictions"] += 1
+                        continue
+                    if self._entry_literals(entry) != literals:
+                        mismatched = True
+                        continue
+                    self._stats["hits"] += 1
+                    entry = self._touch(key, now)
+                    return {
+                        "sql_query": entry["sql_query"],
+                        "similarity": round(float(similarities[best]), 4),
+                        "cached_question": entry["question"],
+                    }
+                if mismatched:
+                    self._stats["literal_mismatches"] += 1
+            self._stats["misses"] += 1
+            return None
+
+    def store(self, question, sql_query):
+        normalized = normalize_question(question)
+        vector = self._embed(question)
+        now = time.time()
+        with self._lock:
+            self._entries[normalized] = {
+                "question": question,
+                "sql_query": sql_query,
+                "vector": vector,
+                "literals": self._literals(question),
+                "created_at": now,
+                "last_used": now,
+            }
+            self._entries.move_to_end(normalized)
+            self._matrix = None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO semantic_sql_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (normalized, question, sql_query, vector.tobytes(), now, now)
+            )
+            self._conn.commit()
+            self._stats["stores"] += 1
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, sql_query):
+        """Drops every entry holding `sql_query`, used when cached SQL stops executing."""
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry["sql_query"] == sql_query]:
+                self._remove(key)
+                self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,141 @@
+import difflib
+import os
+import re
+import sqlite3
+import threading
+
+from app.core.result_summary import LIMIT_RE, bound_select
+
+READ_PREFIXES = ("select", "with", "explain")
+# Statements returning rows that a LIMIT can bound, EXPLAIN output can't take one
+ROW_PREFIXES = ("select", "with")
+EXPLAIN_RE = re.compile(r"^\s*explain(\s+query\s+plan)?\s+", re.IGNORECASE)
+# A CTE can also lead into a write, replace( is the string function
+CTE_WRITE_RE = re.compile(r"\b(insert|update|delete)\b|\breplace\b(?!\s*\()", re.IGNORECASE)
+MISSING_RE = re.compile(r"no such (column|table): ([\w.]+)", re.IGNORECASE)
+AGGREGATE_RE = re.compile(r"\b(count|sum|avg|min|max|group_concat|total)\s*\(|\bgroup\s+by\b", re.IGNORECASE)
+QUOTED_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+
+def split_quoted(sql_query):
+    """
+    Splits SQL into code and quoted spans: even items are code, odd items are a string
+    literal ('...') or a quoted identifier ("..."), quotes included.
+    """
+    return QUOTED_RE.split(sql_query)
+
+
+def is_read_query(sql_query):
+    """
+    True for statements that only read: SELECT, EXPLAIN, and WITH when its main statement
+    is a SELECT. Shared by the validator and execute_sql, a read runs as a query whose
+    rows are returned, anything else as a command.
+    """
+    sql_query = sql_query.lstrip().lower()
+    if not sql_query.startswith(READ_PREFIXES):
+        return False
+    return not sql_query.startswith("with") or not CTE_WRITE_RE.search(" ".join(split_quoted(sql_query)[::2]))
+
+
+class SQLValidator:
+    """
+    Local checks between `convert_to_sql` and `execute_sql`, no network involved:
+      1. read-only unless SQL_ALLOW_WRITES is set, a single statement only
+      2. compile with EXPLAIN QUERY PLAN on a read-only connection, unknown columns or
+         tables are repaired from the cached schema when a close name exists
+      3. cost estimate from the plan, full scans without a LIMIT get one forced
+
+    `validate` returns a dict with status "ok", "invalid" (send back to the LLM to
+    rewrite) or "rejected" (never execute), the possibly repaired SQL and the plan.
+    """
+
+    def __init__(self, db_path, tables_provider, max_rows=200, allow_writes=None, max_repairs=3):
+        self.db_path = str(db_path)
+        self.tables_provider = tables_provider
+        self.max_rows = max_rows
+        self.allow_writes = (
+            os.getenv("SQL_ALLOW_WRITES", "false").lower() == "true" if allow_writes is None else allow_writes
+        )
+        self.max_repairs = max_repairs
+        self._local = threading.local()
+
+    def _connection(self):
+        # One read-only connection per thread, EXPLAIN never needs write access
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def _repair(self, sql_query, kind, name):
+        tables = self.tables_provider()
+        candidates = list(tables) if kind == "table" else sorted({c for cols in tables.values() for c in cols})
+        bare = name.split(".")[-1]
+        match = difflib.get_close_matches(bare.lower(), [c.lower() for c in candidates], n=1, cutoff=0.75)
+        if not match:
+            return None, None
+        replacement = next(c for c in candidates if c.lower() == match[0])
+        # String literals are values, a word in there that looks like the name stays as is
+        pattern = re.compile(rf"\b{re.escape(bare)}\b")
+        repaired = "".join(
+            span if i % 2 and span.startswith("'") else pattern.sub(replacement, span)
+            for i, span in enumerate(split_quoted(sql_query))
+        )
+        return repaired, f"{kind} {bare} -> {replacement}"
+
+    def explain(self, sql_query):
+        # An EXPLAIN statement is planned as the statement it explains
+        rows = self._connection().execute(f"EXPLAIN QUERY PLAN {EXPLAIN_RE.sub('', sql_query)}").fetchall()
+        return [row[-1] for row in rows]
+
+    @staticmethod
+    def estimate_cost(plan):
+        full_scans = [step for step in plan if step.startswith("SCAN") and "USING" not in step]
+        return {
+            "full_scans": full_scans,
+            "index_searches": sum(1 for step in plan if step.startswith("SEARCH")),
+            "temp_btrees": sum(1 for step in plan if "TEMP B-TREE" in step),
+        }
+
+    def validate(self, sql_query):
+        sql_query = sql_query.strip().rstrip(";").strip()
+        report = {"status": "ok", "sql_query": sql_query, "error": None, "repairs": [], "plan": [], "cost": {}}
+
+        if not sql_query:
+            report.update(status="invalid", error="Empty SQL query.")
+            return report
+        is_read = is_read_query(sql_query)
+        if not is_read and not self.allow_writes:
+            report.update(status="rejected", error="The database is read-only, only SELECT queries are allowed.")
+            return report
+
+        for _ in range(self.max_repairs + 1):
+            try:
+                report["plan"] = self.explain(sql_query)
+                break
+            except (sqlite3.Warning, sqlite3.ProgrammingError) as e:
+                # e.g. "You can only execute one statement at a time."
+                report.update(status="rejected", error=str(e))
+                return report
+            except sqlite3.Error as e:
+                missing = MISSING_RE.search(str(e))
+                repaired, note = self._repair(sql_query, *missing.groups()) if missing else (None, None)
+                if repaired is None or repaired == sql_query:
+                    report.update(status="invalid", error=str(e), sql_query=sql_query)
+                    return report
+                sql_query = repaired
+                report["repairs"].append(note)
+        else:
+            report.update(status="invalid", error="Too many unknown identifiers to repair.", sql_query=sql_query)
+            return report
+
+        report["cost"] = self.estimate_cost(report["plan"])
+        # A full scan that may return every row gets a LIMIT, aggregates return few rows anyway
+        if (is_read and sql_query.lower().startswith(ROW_PREFIXES) and report["cost"]["full_scans"]
+                and not LIMIT_RE.search(sql_query) and not AGGREGATE_RE.search(sql_query)):
+            sql_query = bound_select(sql_query, self.max_rows)
+            # bound_select asks for one row more than max_rows to detect truncation
+            report["repairs"].append(f"forced LIMIT {self.max_rows + 1}")
+
+        report["sql_query"] = sql_query
+        return report
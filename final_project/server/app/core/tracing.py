@@ -0,0 +1,201 @@
+import contextvars
+import functools
+import inspect
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+except ImportError:
+    CONTENT_TYPE_LATEST = None
+    generate_latest = None
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class RequestTrace:
+    """Spans of one graph run, one per executed node in execution order."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def breakdown(self):
+        nodes = [span.as_dict() for span in self.spans]
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "prompt_tokens": sum(span.prompt_tokens for span in self.spans),
+            "completion_tokens": sum(span.completion_tokens for span in self.spans),
+            "llm_calls": sum(span.llm_calls for span in self.spans),
+            "retries": sum(1 for span in self.spans if span.node == "regenerate_query"),
+            "nodes": nodes,
+        }
+
+
+class NodeSpan:
+    def __init__(self, node):
+        self.node = node
+        self.wall_ms = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_calls = 0
+        self.cache_hits = {}
+        self.error = None
+        self._cached_responses = 0
+
+    def as_dict(self):
+        return {
+            "node": self.node,
+            "wall_ms": self.wall_ms,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "llm_calls": self.llm_calls,
+            "cache_hits": dict(self.cache_hits),
+            "error": self.error,
+        }
+
+
+# --- Prometheus metrics, only when prometheus_client is installed ---
+if generate_latest is not None:
+    NODE_LATENCY = Histogram(
+        "chatbot_node_latency_seconds", "Wall time per graph node", ["node"],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    )
+    REQUEST_LATENCY = Histogram(
+        "chatbot_request_latency_seconds", "Wall time per chatbot request", ["endpoint"],
+        buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+    )
+    LLM_TOKENS = Counter("chatbot_llm_tokens_total", "LLM tokens per node", ["node", "kind"])
+    LLM_CALLS = Counter("chatbot_llm_calls_total", "LLM calls per node, cached responses included", ["node"])
+    CACHE_HITS = Counter("chatbot_cache_hits_total", "Cache hits per node", ["node", "cache"])
+    NODE_ERRORS = Counter("chatbot_node_errors_total", "Exceptions raised per node", ["node"])
+    RETRIES = Counter("chatbot_sql_retries_total", "Question rewrites after failing SQL")
+
+
+def metrics_payload():
+    """(body, content type) for GET /metrics, None without prometheus_client."""
+    if generate_latest is None:
+        return None
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def start_trace():
+    trace = RequestTrace()
+    _current_trace.set(trace)
+    return trace
+
+
+def observe_request(endpoint, trace):
+    if generate_latest is not None:
+        REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - trace.started)
+
+
+def note_cache_hit(cache, response=False):
+    """Called by caches on a hit. `response` marks a cached LLM response so its tokens aren't counted."""
+    span = _current_span.get()
+    if span is None:
+        return
+    span.cache_hits[cache] = span.cache_hits.get(cache, 0) + 1
+    if response:
+        span._cached_responses += 1
+    if generate_latest is not None:
+        CACHE_HITS.labels(span.node, cache).inc()
+
+
+def _open_span(node):
+    span = NodeSpan(node)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append(span)
+    return span, _current_span.set(span), time.perf_counter()
+
+
+def _close_span(span, token, started, result, error):
+    span.wall_ms = round((time.perf_counter() - started) * 1000, 2)
+    _current_span.reset(token)
+    if error is not None:
+        span.error = str(error)
+    # The semantic SQL cache reports through the state, not through a callback
+    if isinstance(result, dict) and result.get("sql_cache_hit") and span.node in ("convert_to_sql", "fan_sql_draft"):
+        span.cache_hits["sql"] = span.cache_hits.get("sql", 0) + 1
+        if generate_latest is not None:
+            CACHE_HITS.labels(span.node, "sql").inc()
+    if generate_latest is not None:
+        NODE_LATENCY.labels(span.node).observe(span.wall_ms / 1000)
+        if error is not None:
+            NODE_ERRORS.labels(span.node).inc()
+        if span.node == "regenerate_query" and error is None:
+            RETRIES.inc()
+
+
+def traced(node, func):
+    """Wraps a graph node (sync or async) in a span of the current request trace."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(state, *args, **kwargs):
+            span, token, started = _open_span(node)
+            result, error = None, None
+            try:
+                result = await func(state, *args, **kwargs)
+                return result
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                _close_span(span, token, started, result, error)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(state, *args, **kwargs):
+        span, token, started = _open_span(node)
+        result, error = None, None
+        try:
+            result = func(state, *args, **kwargs)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _close_span(span, token, started, result, error)
+    return wrapper
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Adds the prompt/completion tokens of every LLM call to the span of the running node."""
+
+    # Cheap enough for the event loop, and running inline keeps the node's context
+    run_inline = True
+
+    def on_llm_end(self, response, **kwargs):
+        span = _current_span.get()
+        if span is None:
+            return
+        span.llm_calls += 1
+        if generate_latest is not None:
+            LLM_CALLS.labels(span.node).inc()
+        if span._cached_responses:
+            # Served from the response cache, no tokens were spent
+            span._cached_responses -= 1
+            return
+
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+        if not prompt_tokens and not completion_tokens:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+
+        span.prompt_tokens += prompt_tokens
+        span.completion_tokens += completion_tokens
+        if generate_latest is not None:
+            LLM_TOKENS.labels(span.node, "prompt").inc(prompt_tokens)
+            LLM_TOKENS.labels(span.node, "completion").inc(completion_tokens)
+
+
+token_usage_handler = TokenUsageHandler()
@@ -1,7 +1,24 @@
+import threading
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from app.api import ingestion, chatbot
+from app.core.engine_registry import engine_registry
+from app.core.ingestion_jobs import ingestion_jobs
+from app.core.tracing import metrics_payload
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm engines in the background so the server accepts connections immediately,
+    # requests arriving before warm-up finishes wait for the engine they need.
+    threading.Thread(target=engine_registry.warm_up, daemon=True).start()
+    yield
+    ingestion_jobs.shutdown()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(ingestion.router)
 app.include_router(chatbot.router)
@@ -9,3 +26,19 @@ app.include_router(chatbot.router)
 @app.get("/test")
 def testing():
     return {"message": "✅ Deployment Pipeline Working"}
+
+@app.get("/ready")
+def readiness():
+    ready = engine_registry.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "engines": engine_registry.status()}
+    )
+
+@app.get("/metrics")
+def metrics():
+    payload = metrics_payload()
+    if payload is None:
+        return JSONResponse(status_code=503, content={"detail": "prometheus_client is not installed"})
+    body, content_type = payload
+    return Response(content=body, media_type=content_type)
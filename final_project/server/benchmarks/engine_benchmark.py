@@ -0,0 +1,73 @@
+"""
+Throughput of the DatabaseAgent engine at 1/8/32 concurrent readers, comparing a plain
+`create_engine` (the old setup) with the tuned EngineProfile.
+
+Runs on a temporary copy of used_cars.db, switched to WAL, so the shipped file is never
+touched. From final_project/server:
+    python -m benchmarks.engine_benchmark --concurrency 1 8 32 --requests 2000
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db_engine import EngineProfile
+from app.core.index_advisor import DEFAULT_DB_PATH
+from benchmarks.index_benchmark import DEFAULT_WORKLOAD
+from benchmarks.stats import summarize, print_table
+
+
+def baseline_engine(db_path):
+    return create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+
+
+def run_level(engine, concurrency, total):
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    latencies = []
+
+    def one_request(i):
+        # Same shape as execute_sql: a session per request
+        started = time.perf_counter()
+        session = SessionLocal()
+        try:
+            session.execute(text(DEFAULT_WORKLOAD[i % len(DEFAULT_WORKLOAD)])).fetchall()
+        finally:
+            session.close()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(total)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_copy = Path(tmp) / "used_cars.db"
+        shutil.copyfile(args.db, db_copy)
+
+        engines = {
+            "baseline": baseline_engine(db_copy),
+            "profile": EngineProfile(db_copy, journal_mode="wal").create_engines()[0],
+        }
+        rows = []
+        for name, engine in engines.items():
+            for concurrency in args.concurrency:
+                print(f"🚀 {name}: {args.requests} queries at concurrency {concurrency}...")
+                rows.append({"engine": name, "concurrency": concurrency, **run_level(engine, concurrency, args.requests)})
+            engine.dispose()
+
+    print_table(rows, ["engine", "concurrency", "requests", "throughput_rps", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=2000)
+    main(parser.parse_args())
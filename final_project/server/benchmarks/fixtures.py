@@ -0,0 +1,100 @@
+"""
+Fixture corpus and question sets for the offline benchmarks. The PDFs are generated on
+the fly (plain text pages, no dependencies) so nothing binary is checked in.
+"""
+from pathlib import Path
+
+FIXTURE_DOCS = {
+    "generative_ai": [
+        "Generative AI refers to models that create new content such as text, images, audio or code.",
+        "Large language models are trained on large text corpora to predict the next token.",
+        "Transformers use self-attention to relate every token of a sequence to every other token.",
+        "Prompt engineering shapes model behaviour through instructions, examples and constraints.",
+        "Hallucinations are fluent but unsupported statements produced by a language model.",
+    ],
+    "retrieval": [
+        "Retrieval augmented generation grounds answers in documents fetched at query time.",
+        "Documents are split into chunks, embedded, and stored in a vector database.",
+        "At query time the question is embedded and the nearest chunks are retrieved.",
+        "Retrieved chunks are placed in the prompt so the model can cite them.",
+        "Hybrid retrieval combines dense vectors with lexical BM25 scores.",
+    ],
+    "agents": [
+        "AI agents combine a language model with tools, memory and a planning loop.",
+        "A router decides which tool or sub-agent should handle a question.",
+        "Text-to-SQL agents translate natural language questions into database queries.",
+        "Guardrails validate model outputs before they reach users or databases.",
+        "Evaluation of agents measures task success, latency and cost per request.",
+    ],
+    "fine_tuning": [
+        "Fine-tuning adapts a pretrained model to a task with additional labelled data.",
+        "Parameter-efficient methods such as LoRA train small adapter matrices only.",
+        "Instruction tuning teaches models to follow natural language instructions.",
+        "Fine-tuning changes model weights, retrieval changes the context instead.",
+        "Quantization stores weights in fewer bits to reduce memory and latency.",
+    ],
+}
+
+KB_QUESTIONS = [
+    "What is generative AI?",
+    "Explain retrieval augmented generation",
+    "How do transformer models work?",
+    "What are AI agents?",
+    "What is the difference between fine-tuning and RAG?",
+    "Why do language models hallucinate?",
+]
+
+SQL_QUESTIONS = [
+    "What is the average sale price of cars by city?",
+    "How many cars are listed?",
+    "Top 5 most viewed cars",
+    "Cheapest cars for sale",
+    "Show some diesel cars",
+]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, lines):
+    """Minimal single-page PDF with one line of Helvetica text per entry."""
+    text = ["BT", "/F1 11 Tf", "14 TL", "50 780 Td"]
+    for line in lines:
+        text.append(f"({_escape(line)}) Tj T*")
+    text.append("ET")
+    stream = "\n".join(text).encode("latin-1", "replace")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    Path(path).write_bytes(bytes(out))
+
+
+def write_corpus(directory, copies=1):
+    """Writes every fixture document `copies` times, returns the PDF paths."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for copy in range(copies):
+        for name, lines in FIXTURE_DOCS.items():
+            path = directory / f"{name}_{copy}.pdf"
+            # The copy number keeps content hashes distinct so every file is really ingested
+            write_pdf(path, lines + [f"Fixture copy {copy} of {name}."])
+            paths.append(path)
+    return paths
@@ -0,0 +1,94 @@
+"""
+Query latency on used_cars.db before and after the index advisor's proposals.
+
+Works on a temporary copy, the shipped database is never modified. The workload is the
+logged SQL (app/db/sql_workload.db) when there is one, otherwise a representative set of
+generated queries. From final_project/server:
+    python -m benchmarks.index_benchmark --repeat 50
+"""
+import argparse
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from app.core.index_advisor import DEFAULT_DB_PATH, DEFAULT_LOG_PATH, IndexAdvisor, SQLWorkloadLog
+from benchmarks.stats import percentile, print_table
+
+DEFAULT_WORKLOAD = [
+    "SELECT car_name, sale_price, kms_run FROM used_cars WHERE city = 'pune' AND fuel_type = 'diesel' ORDER BY sale_price LIMIT 10",
+    "SELECT AVG(sale_price) FROM used_cars WHERE city = 'mumbai'",
+    "SELECT city, AVG(sale_price) FROM used_cars GROUP BY city",
+    "SELECT COUNT(*) FROM used_cars WHERE make = 'maruti' AND model = 'swift'",
+    "SELECT car_name, times_viewed FROM used_cars WHERE make = 'hyundai' ORDER BY times_viewed DESC LIMIT 5",
+    "SELECT car_name, yr_mfr, sale_price FROM used_cars WHERE yr_mfr > 2018 AND transmission = 'automatic' LIMIT 20",
+    "SELECT COUNT(*) FROM used_cars WHERE body_type = 'hatchback' AND city = 'delhi'",
+    "SELECT make, COUNT(*) FROM used_cars WHERE fuel_type = 'petrol' GROUP BY make",
+]
+
+
+def measure(db_path, workload, repeat):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    latencies = {}
+    for sql_query in workload:
+        conn.execute(sql_query).fetchall()  # warm the page cache
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(sql_query).fetchall()
+            samples.append(time.perf_counter() - started)
+        latencies[sql_query] = samples
+    conn.close()
+    return latencies
+
+
+def row(label, samples):
+    return {
+        "query": label,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+    }
+
+
+def main(args):
+    logged = SQLWorkloadLog(path=args.log).summary(limit=50) if Path(args.log).exists() else []
+    workload = [entry["sql_query"] for entry in logged]
+    workload = [sql for sql in workload if sql.lower().startswith(("select", "with"))] or DEFAULT_WORKLOAD
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_copy = Path(tmp) / "used_cars.db"
+        shutil.copyfile(args.db, db_copy)
+
+        before = measure(db_copy, workload, args.repeat)
+        advisor = IndexAdvisor(db_copy)
+        proposals = advisor.analyze([{"sql_query": sql, "count": 1, "total_ms": sum(before[sql]) * 1000} for sql in workload])
+        for proposal in proposals:
+            print(f"{proposal['sql']};")
+        advisor.apply(proposals)
+        after = measure(db_copy, workload, args.repeat)
+
+    rows = []
+    for index, sql_query in enumerate(workload, start=1):
+        b, a = row(f"q{index}", before[sql_query]), row(f"q{index}", after[sql_query])
+        rows.append({"query": b["query"], "before_p50_ms": b["p50_ms"], "before_p95_ms": b["p95_ms"],
+                     "after_p50_ms": a["p50_ms"], "after_p95_ms": a["p95_ms"]})
+    all_before = [s for samples in before.values() for s in samples]
+    all_after = [s for samples in after.values() for s in samples]
+    b, a = row("all", all_before), row("all", all_after)
+    rows.append({"query": "all", "before_p50_ms": b["p50_ms"], "before_p95_ms": b["p95_ms"],
+                 "after_p50_ms": a["p50_ms"], "after_p95_ms": a["p95_ms"]})
+
+    print()
+    for index, sql_query in enumerate(workload, start=1):
+        print(f"q{index}: {sql_query}")
+    print()
+    print_table(rows, ["query", "before_p50_ms", "before_p95_ms", "after_p50_ms", "after_p95_ms"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH))
+    parser.add_argument("--log", default=str(DEFAULT_LOG_PATH))
+    parser.add_argument("--repeat", type=int, default=50)
+    main(parser.parse_args())
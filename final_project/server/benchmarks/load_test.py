@@ -0,0 +1,73 @@
+"""
+Concurrency load test for the /chatbot endpoint.
+
+Start the server first (python run.py), then from final_project/server:
+    python -m benchmarks.load_test --concurrency 1 8 32 --requests 64
+
+With the async graph (ainvoke) throughput should grow with concurrency until the
+LLM provider or the CPU becomes the bottleneck, a blocking handler stays flat.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.stats import summarize, print_table
+
+DEFAULT_QUESTIONS = [
+    "What is the average sale price of diesel cars in pune?",
+    "How many hatchbacks are listed in mumbai?",
+    "Top 5 most viewed cars",
+    "What is generative AI?",
+    "Explain retrieval augmented generation",
+]
+
+
+async def run_level(client, url, concurrency, total, questions):
+    latencies = []
+    errors = 0
+    pending = asyncio.Queue()
+    for i in range(total):
+        pending.put_nowait(questions[i % len(questions)])
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                question = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.post(url, data={"query": question})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors += 1
+                print(f"⚠️ Request failed: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"concurrency": concurrency, **summarize(latencies, elapsed, errors)}
+
+
+async def main(args):
+    url = args.base_url.rstrip("/") + "/chatbot"
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        rows = []
+        for concurrency in args.concurrency:
+            print(f"🚀 {args.requests} requests at concurrency {concurrency}...")
+            rows.append(await run_level(client, url, concurrency, args.requests, DEFAULT_QUESTIONS))
+    print_table(rows, ["concurrency", "requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(main(parser.parse_args()))
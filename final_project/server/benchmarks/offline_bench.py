@@ -0,0 +1,114 @@
+"""
+Offline benchmark of the whole chatbot stack, no Groq key and no network LLM needed.
+
+LLM calls go to the deterministic FakeChatModel (LLM_BACKEND=fake), the knowledge base
+is a fixture corpus ingested into a temporary Chroma store, and SQL runs against the
+shipped used_cars.db. Caches and logs are redirected to the temporary directory.
+From final_project/server:
+    python -m benchmarks.offline_bench --copies 5 --repeat 50 --concurrency 1 8 32
+
+Reports throughput and p50/p95/p99 for ingestion (per file), retrieval, the SQL path
+(NL-to-SQL, validation, execution) and end-to-end POST /chatbot served in-process.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+def configure_environment(workdir, latency_ms):
+    # Must run before any app module is imported, they read their settings at import time
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_MS"] = str(latency_ms)
+    os.environ["CHROMA_PERSIST_DIRECTORY"] = str(workdir / "chroma_store")
+    os.environ["LLM_CACHE_PATH"] = ""
+    os.environ["SQL_WORKLOAD_LOG"] = ""
+    os.environ["SQL_CACHE_PATH"] = str(workdir / "semantic_cache.db")
+    os.environ["ANALYTICS_DUCKDB_PATH"] = str(workdir / "used_cars.duckdb")
+
+
+def timed_calls(func, items):
+    latencies = []
+    started = time.perf_counter()
+    for item in items:
+        call_started = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - call_started)
+    return latencies, time.perf_counter() - started
+
+
+async def atimed_calls(func, items):
+    latencies = []
+    started = time.perf_counter()
+    for item in items:
+        call_started = time.perf_counter()
+        await func(item)
+        latencies.append(time.perf_counter() - call_started)
+    return latencies, time.perf_counter() - started
+
+
+async def run(args, workdir):
+    from benchmarks.fixtures import KB_QUESTIONS, SQL_QUESTIONS, write_corpus
+    from benchmarks.stats import summarize, print_table
+    from app.core.knowledge_base import BuildRag
+    from app.core.engine_registry import engine_registry
+
+    rows = []
+
+    # --- Ingestion ---
+    paths = write_corpus(workdir / "corpus", copies=args.copies)
+    builder = BuildRag()
+    latencies, elapsed = timed_calls(builder.ingest_file, paths)
+    rows.append({"stage": "ingestion (file)", **summarize(latencies, elapsed)})
+
+    # --- Retrieval ---
+    engine = engine_registry.get("knowledge_base")
+    questions = [KB_QUESTIONS[i % len(KB_QUESTIONS)] for i in range(args.repeat)]
+    latencies, elapsed = timed_calls(engine.retrieve, questions)
+    rows.append({"stage": "retrieval", **summarize(latencies, elapsed)})
+
+    # --- SQL path ---
+    from app.api.chatbot import db_agent
+
+    async def sql_path(question):
+        state = {"query": question, "relevance": "relevant", "attempts": 0}
+        state = await db_agent.aconvert_nl_to_sql(state)
+        state = await db_agent.avalidate_sql(state)
+        if state["sql_validation"]["status"] == "ok":
+            await db_agent.aexecute_sql(state)
+
+    questions = [SQL_QUESTIONS[i % len(SQL_QUESTIONS)] for i in range(args.repeat)]
+    latencies, elapsed = await atimed_calls(sql_path, questions)
+    rows.append({"stage": "sql (nl->sql->execute)", **summarize(latencies, elapsed)})
+
+    # --- End to end, served in-process ---
+    import httpx
+    from app.main import app
+    from benchmarks.load_test import run_level
+
+    mixed = [q for pair in zip(KB_QUESTIONS, SQL_QUESTIONS) for q in pair]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://offline", timeout=120) as client:
+        for concurrency in args.concurrency:
+            result = await run_level(client, "/chatbot", concurrency, args.repeat, mixed)
+            rows.append({"stage": f"/chatbot c={concurrency}", **{k: v for k, v in result.items() if k != "concurrency"}})
+
+    print()
+    print(f"Fake LLM latency {args.llm_latency_ms} ms per call, {len(paths)} fixture PDFs.")
+    print_table(rows, ["stage", "requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=5, help="copies of the fixture corpus to ingest")
+    parser.add_argument("--repeat", type=int, default=50, help="requests per stage")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="offline_bench_") as tmp:
+        workdir = Path(tmp)
+        configure_environment(workdir, args.llm_latency_ms)
+        asyncio.run(run(args, workdir))
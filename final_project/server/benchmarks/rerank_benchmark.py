@@ -0,0 +1,121 @@
+"""
+Recall and latency of bi-encoder retrieval with and without the cross-encoder re-ranker.
+
+The shipped app/documents/genai.pdf is split like BuildRag does and embedded in memory
+(no Chroma store needed). Each query is the opening words of a sentence sampled from a
+chunk, every chunk containing that sentence counts as relevant. Compared:
+  dense top-k                         the engine's retrieval without re-ranking
+  dense top-N -> rerank top-k (cold)  first pass, every pair is scored
+  dense top-N -> rerank top-k (warm)  same queries again, scores come from the cache
+From final_project/server:
+    python -m benchmarks.rerank_benchmark --queries 50 --top-n 20 --top-k 4
+"""
+import argparse
+import random
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.core.reranker import DEFAULT_RERANK_MODEL, CrossEncoderReranker
+from benchmarks.stats import percentile, print_table
+
+DEFAULT_PDF = Path(__file__).resolve().parents[1] / "app" / "documents" / "genai.pdf"
+SENTENCE_RE = re.compile(r"[^.!?]{40,}[.!?]")
+
+
+def load_chunks(pdf_path):
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    docs = PyPDFLoader(str(pdf_path)).load()
+    # Same splitter settings as BuildRag
+    return RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100).split_documents(docs)
+
+
+def sample_queries(chunks, count, words, seed):
+    rng = random.Random(seed)
+    queries = []
+    for index in rng.sample(range(len(chunks)), min(count * 3, len(chunks))):
+        sentences = SENTENCE_RE.findall(chunks[index].page_content)
+        if not sentences:
+            continue
+        sentence = " ".join(rng.choice(sentences).split())
+        query = " ".join(sentence.split()[:words])
+        relevant = {i for i, chunk in enumerate(chunks) if sentence in " ".join(chunk.page_content.split())}
+        queries.append((query, relevant))
+        if len(queries) == count:
+            break
+    return queries
+
+
+def row(label, hits, latencies):
+    return {
+        "setup": label,
+        "recall": round(sum(hits) / len(hits), 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+def main(args):
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    chunks = load_chunks(args.pdf)
+    queries = sample_queries(chunks, args.queries, args.query_words, args.seed)
+    print(f"{len(chunks)} chunks, {len(queries)} queries.")
+
+    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    matrix = np.array(embeddings.embed_documents([chunk.page_content for chunk in chunks]), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    def dense(query, k):
+        vector = np.array(embeddings.embed_query(query), dtype=np.float32)
+        scores = matrix @ (vector / np.linalg.norm(vector))
+        return list(np.argsort(-scores)[:k])
+
+    # No budget or concurrency limit, every query is re-ranked
+    reranker = CrossEncoderReranker(
+        model_name=args.model, top_n=args.top_n, top_k=args.top_k,
+        budget_ms=float("inf"), background_load=False
+    )
+    for position, chunk in enumerate(chunks):
+        chunk.id = str(position)
+
+    rows = []
+    hits, latencies = [], []
+    for query, relevant in queries:
+        started = time.perf_counter()
+        found = dense(query, args.top_k)
+        latencies.append(time.perf_counter() - started)
+        hits.append(bool(relevant & set(found)))
+    rows.append(row(f"dense top-{args.top_k}", hits, latencies))
+
+    for label in ("cold", "warm"):
+        hits, latencies = [], []
+        for query, relevant in queries:
+            started = time.perf_counter()
+            candidates = [chunks[i] for i in dense(query, args.top_n)]
+            found = {int(doc.id) for doc in reranker.rerank(query, candidates)}
+            latencies.append(time.perf_counter() - started)
+            hits.append(bool(relevant & found))
+        rows.append(row(f"dense top-{args.top_n} -> rerank top-{args.top_k} ({label})", hits, latencies))
+
+    print()
+    print_table(rows, ["setup", "recall", "p50_ms", "p95_ms", "max_ms"])
+    print()
+    print(f"Re-ranker: {reranker.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default=str(DEFAULT_PDF))
+    parser.add_argument("--model", default=DEFAULT_RERANK_MODEL)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--query-words", type=int, default=8, help="words of the sampled sentence used as query")
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
@@ -0,0 +1,77 @@
+"""AnalyticalMirror answers the same as sqlite for the queries it accepts. From final_project/server:
+    python -m pytest tests
+"""
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("duckdb")
+
+from app.core.analytics_mirror import AnalyticalMirror
+
+DB_PATH = Path(__file__).resolve().parents[1] / "app" / "db" / "used_cars.db"
+
+EQUIVALENT_QUERIES = [
+    "SELECT city, COUNT(*) FROM used_cars WHERE city LIKE '%DELHI%' GROUP BY city ORDER BY city",
+    "SELECT COUNT(*) FROM used_cars WHERE fuel_type NOT LIKE 'PETROL'",
+    "SELECT fuel_type, AVG(sale_price) FROM used_cars GROUP BY fuel_type ORDER BY fuel_type",
+    "SELECT MAX(sale_price) - MIN(sale_price) FROM used_cars",
+    "SELECT body_type, SUM(kms_run) FROM used_cars GROUP BY body_type ORDER BY body_type",
+    "SELECT body_type, COUNT(*) FROM used_cars GROUP BY body_type ORDER BY body_type DESC",
+    "SELECT make, COUNT(*) FROM used_cars WHERE car_name LIKE '%swift%' GROUP BY make ORDER BY make",
+    # No ORDER BY, sqlite returns the groups sorted by key
+    "SELECT make, COUNT(*) FROM used_cars GROUP BY make LIMIT 3",
+    "SELECT city, AVG(sale_price) AS avg_price FROM used_cars GROUP BY city\nLIMIT 201",
+    "SELECT body_type, fuel_type, COUNT(*) FROM used_cars GROUP BY body_type, fuel_type HAVING COUNT(*) > 5",
+    # Flags are 0/1 integers in sqlite
+    "SELECT is_hot, COUNT(*) FROM used_cars GROUP BY is_hot",
+    "SELECT city, AVG(assured_buy) FROM used_cars GROUP BY city ORDER BY city",
+]
+
+
+@pytest.fixture(scope="module")
+def mirror(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("mirror")
+    sqlite_path = directory / "used_cars.db"
+    shutil.copy(DB_PATH, sqlite_path)
+    mirror = AnalyticalMirror(sqlite_path, duckdb_path=directory / "used_cars.duckdb")
+    deadline = time.time() + 60
+    while not mirror._ready and time.time() < deadline:
+        time.sleep(0.1)
+    assert mirror._ready
+    return mirror
+
+
+def normalized(rows):
+    return [
+        tuple(pytest.approx(value) if isinstance(value, float) else value for value in row)
+        for row in rows
+    ]
+
+
+@pytest.mark.parametrize("sql_query", EQUIVALENT_QUERIES)
+def test_mirror_matches_sqlite(mirror, sql_query):
+    result = mirror.try_query(sql_query)
+    assert result is not None
+    expected = sqlite3.connect(mirror.sqlite_path).execute(sql_query).fetchall()
+    assert expected
+    assert normalized(result[1]) == normalized(expected)
+
+
+def test_division_stays_on_sqlite(mirror):
+    assert mirror.try_query("SELECT SUM(kms_run) / COUNT(*) FROM used_cars") is None
+
+
+def test_unordered_groups_of_a_subquery_stay_on_sqlite(mirror):
+    assert mirror.try_query(
+        "SELECT * FROM (SELECT make, COUNT(*) FROM used_cars GROUP BY make) LIMIT 3"
+    ) is None
+
+
+def test_like_inside_a_literal_is_left_alone():
+    assert AnalyticalMirror.translate("SELECT COUNT(*) FROM t WHERE a LIKE 'I like / it'") == (
+        "SELECT COUNT(*) FROM t WHERE a ILIKE 'I like / it'"
+    )
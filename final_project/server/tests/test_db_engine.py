@@ -0,0 +1,48 @@
+"""EngineProfile leaves the sqlite file's journal mode alone unless asked. From final_project/server:
+    python -m pytest tests
+"""
+import shutil
+import sqlite3
+from pathlib import Path
+
+from sqlalchemy import text
+
+from app.core.db_engine import EngineProfile
+
+DB_PATH = Path(__file__).resolve().parents[1] / "app" / "db" / "used_cars.db"
+
+
+def journal_mode(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def query_once(profile):
+    engine = profile.create_engines()[0]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM used_cars")).scalar() > 0
+    engine.dispose()
+
+
+def test_default_keeps_the_file_untouched(tmp_path, monkeypatch):
+    monkeypatch.delenv("SQLITE_JOURNAL_MODE", raising=False)
+    db_copy = tmp_path / "used_cars.db"
+    shutil.copyfile(DB_PATH, db_copy)
+    before = db_copy.read_bytes()
+
+    query_once(EngineProfile(db_copy))
+
+    assert db_copy.read_bytes() == before
+    assert journal_mode(db_copy) == journal_mode(DB_PATH)
+
+
+def test_wal_is_opt_in(tmp_path):
+    db_copy = tmp_path / "used_cars.db"
+    shutil.copyfile(DB_PATH, db_copy)
+
+    query_once(EngineProfile(db_copy, journal_mode="wal"))
+
+    assert journal_mode(db_copy) == "wal"
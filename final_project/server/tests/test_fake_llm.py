@@ -0,0 +1,43 @@
+"""Structured output of the offline FakeChatModel. From final_project/server:
+    python -m pytest tests
+"""
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel, Field
+
+from app.core.fake_llm import FakeChatModel
+from app.core.models import CheckRelevance, ConvertToSQL
+
+
+class Summary(BaseModel):
+    title: str
+    tags: list[str]
+    score: float
+    note: Optional[str] = Field(default="none")
+
+
+class Unbuildable(BaseModel):
+    payload: BaseModel
+
+
+@pytest.fixture
+def model():
+    return FakeChatModel(latency_ms=0)
+
+
+def test_canned_schemas(model):
+    assert model.with_structured_output(CheckRelevance).invoke("Question: cheapest cars").relevance == "relevant"
+    sql = model.with_structured_output(ConvertToSQL).invoke("Question: average price by city").sql_query
+    assert sql.startswith("SELECT city, AVG(sale_price)")
+
+
+def test_other_schemas_get_a_default_instance(model):
+    assert model.with_structured_output(Summary).invoke("Question: anything") == Summary(
+        title="", tags=[], score=0.0, note="none"
+    )
+
+
+def test_schema_without_defaults_is_named_in_the_error(model):
+    with pytest.raises(ValueError, match="Unbuildable"):
+        model.with_structured_output(Unbuildable).invoke("Question: anything")
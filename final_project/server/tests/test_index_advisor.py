@@ -0,0 +1,42 @@
+"""SQLWorkloadLog gets every recorded statement to disk. From final_project/server:
+    python -m pytest tests
+"""
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from app.core.index_advisor import SQLWorkloadLog
+
+SERVER_DIR = Path(__file__).resolve().parents[1]
+
+
+def logged(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM sql_workload").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_old_entries_are_flushed_before_the_batch_fills(tmp_path):
+    path = tmp_path / "workload.db"
+    log = SQLWorkloadLog(path=path, flush_every=50, flush_seconds=0.01)
+    log.record("SELECT 1", 1.0)
+    assert logged(path) == 0
+    time.sleep(0.05)
+    log.record("SELECT 2", 1.0)
+    assert logged(path) == 2
+
+
+def test_buffered_entries_are_flushed_at_exit(tmp_path):
+    path = tmp_path / "workload.db"
+    script = (
+        "from app.core.index_advisor import SQLWorkloadLog\n"
+        f"log = SQLWorkloadLog(path={str(path)!r}, flush_every=50, flush_seconds=3600)\n"
+        "for i in range(3):\n"
+        "    log.record(f'SELECT {i}', 1.0)\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=SERVER_DIR, check=True)
+    assert logged(path) == 3
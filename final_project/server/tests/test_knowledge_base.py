@@ -0,0 +1,118 @@
+"""Concurrent BuildRag ingests, with an in-memory store and pipeline. From final_project/server:
+    python -m pytest tests
+"""
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("langchain.document_loaders")
+os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
+
+from langchain_core.documents import Document
+
+from app.core import knowledge_base
+from app.core.ingest_manifest import IngestManifest
+
+
+class MemoryStore:
+    """The part of the Chroma store BuildRag writes to."""
+
+    def __init__(self):
+        self.chunks = {}
+        self._collection = self
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.chunks.update(zip(ids, documents))
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.chunks.pop(chunk_id, None)
+
+    def persist(self):
+        pass
+
+
+class BarrierPipeline:
+    """Every job has to reach the embedding stage before any of them writes."""
+
+    def __init__(self, parties):
+        self.barrier = threading.Barrier(parties, timeout=10)
+
+    def embed(self, texts):
+        return [[float(len(text))] for text in texts]
+
+    def run(self, chunk_source, write, progress=None):
+        items = list(chunk_source)
+        self.barrier.wait()
+        if items:
+            write([chunk_id for chunk_id, _ in items], [doc for _, doc in items],
+                  self.embed([doc.page_content for _, doc in items]))
+        return {"chunks": len(items)}
+
+
+class TextBuildRag(knowledge_base.BuildRag):
+    def load_file(self, file_path):
+        return [Document(page_content=line, metadata={"source": str(file_path)})
+                for line in open(file_path, encoding="utf-8").read().splitlines()]
+
+
+def write_files(directory, contents):
+    paths = []
+    for name, lines in contents.items():
+        path = directory / name
+        path.write_text("\n".join(lines), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def test_jobs_embed_in_parallel_and_both_reach_the_manifest(tmp_path):
+    paths = write_files(tmp_path, {"a.pdf": ["alpha one", "alpha two"], "b.pdf": ["beta one"]})
+    store, pipeline = MemoryStore(), BarrierPipeline(parties=2)
+    results, errors = {}, []
+
+    def ingest(path):
+        try:
+            results[path.name] = TextBuildRag(tmp_path / "store", pipeline).ingest_file(path, vector_store=store)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=ingest, args=(path,)) for path in paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert results["a.pdf"]["chunks_added"] == 2 and results["b.pdf"]["chunks_added"] == 1
+    assert sorted(IngestManifest(tmp_path / "store" / "ingest_manifest.json").files) == ["a.pdf", "b.pdf"]
+    assert sorted(store.chunks.values()) == ["alpha one", "alpha two", "beta one"]
+
+
+def test_job_waiting_for_a_write_reports_queued(tmp_path):
+    (path,) = write_files(tmp_path, {"a.pdf": ["alpha one"]})
+    stages = []
+    job = threading.Thread(target=lambda: TextBuildRag(tmp_path / "store", BarrierPipeline(parties=1)).ingest_file(
+        path, vector_store=MemoryStore(), progress=lambda stage, **fields: stages.append(stage)))
+
+    with knowledge_base._ingest_lock:
+        job.start()
+        job.join(timeout=0.5)
+        assert job.is_alive()
+        assert stages[-1] == "queued"
+    job.join(timeout=10)
+
+    assert not job.is_alive()
+    assert stages[-1] == "writing"
+
+
+def test_new_version_deletes_chunks_it_dropped(tmp_path):
+    (path,) = write_files(tmp_path, {"a.pdf": ["alpha one", "alpha two"]})
+    store = MemoryStore()
+    TextBuildRag(tmp_path / "store", BarrierPipeline(parties=1)).ingest_file(path, vector_store=store)
+    path.write_text("alpha one\nalpha three", encoding="utf-8")
+
+    stats = TextBuildRag(tmp_path / "store", BarrierPipeline(parties=1)).ingest_file(path, vector_store=store)
+
+    assert (stats["chunks_added"], stats["chunks_unchanged"], stats["chunks_deleted"]) == (1, 1, 1)
+    assert sorted(store.chunks.values()) == ["alpha one", "alpha three"]
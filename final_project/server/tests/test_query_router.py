@@ -0,0 +1,64 @@
+"""Keyword stage of FastPathRouter against the bundled used_cars.db. From final_project/server:
+    python -m pytest tests
+"""
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.core.query_router import FastPathRouter
+
+DB_PATH = Path(__file__).resolve().parents[1] / "app" / "db" / "used_cars.db"
+
+
+class SchemaAgent:
+    """Just what the router reads from DatabaseAgent, internal tables included."""
+
+    def __init__(self, db_path):
+        self.engine = create_engine(f"sqlite:///{db_path}")
+
+    def get_database_schema(self):
+        schema = ""
+        with self.engine.connect() as conn:
+            tables = conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+            for (table,) in tables:
+                schema += f"Table: {table}\n"
+                for column in conn.exec_driver_sql(f'PRAGMA table_info("{table}")'):
+                    schema += f"- {column[1]}: {column[2] or 'TEXT'}\n"
+                schema += "\n"
+        return schema
+
+
+@pytest.fixture(scope="module")
+def router():
+    return FastPathRouter(SchemaAgent(DB_PATH))
+
+
+@pytest.mark.parametrize("question", [
+    "Which model is best for online code generation?",
+    "Is RAG a good fit for every model?",
+    "What is the original source of the GPT model?",
+    "What is the price of training a new model?",
+    "What is the sqlite sequence of a transformer?",
+])
+def test_knowledge_base_questions_are_not_sent_to_sql(router, question):
+    route, source, _ = router.route(question)
+    assert route != "convert_to_sql"
+    assert source == "llm"
+
+
+@pytest.mark.parametrize("question", [
+    "Show me the cheapest diesel cars in Delhi",
+    "Average sale price of hyundai cars in mumbai",
+    "How many automatic suv are there in pune?",
+])
+def test_questions_naming_column_values_go_to_sql(router, question):
+    route, source, details = router.route(question)
+    assert (route, source) == ("convert_to_sql", "keyword")
+    assert router.value_matches(question)
+
+
+def test_internal_tables_are_not_in_the_vocabulary(router):
+    columns, values = router._vocabulary_for_schema()
+    assert not {"sqlite", "sequence", "seq"} & (columns | values)
+    assert not {"good", "great", "fair", "online", "new", "city"} & values
@@ -0,0 +1,49 @@
+"""Latency budget of CrossEncoderReranker, with a stand-in scoring model. From final_project/server:
+    python -m pytest tests
+"""
+from langchain_core.documents import Document
+
+from app.core.reranker import CrossEncoderReranker
+
+
+class LengthModel:
+    """Scores a pair by chunk length, fast enough to stay far below any budget."""
+
+    def predict(self, pairs, batch_size=None, show_progress_bar=False):
+        return [len(chunk) for _, chunk in pairs]
+
+
+def make_reranker():
+    reranker = CrossEncoderReranker(model_name="unused", top_k=3, budget_ms=50, cache_entries=1000,
+                                    background_load=False)
+    reranker._model = LengthModel()
+    return reranker
+
+
+def candidates(n):
+    return [Document(page_content="x" * (i + 1), id=f"chunk-{i}") for i in range(n)]
+
+
+def test_reranking_resumes_after_a_slow_estimate():
+    reranker = make_reranker()
+    reranker._ms_per_pair = 10.0  # one slow batch, 20 pairs would take 200 ms
+    docs = candidates(20)
+
+    results = [reranker.rerank(f"question {i}", docs) for i in range(30)]
+
+    assert results[0] == docs[:3]
+    assert reranker._stats["skipped_budget"] > 0
+    assert reranker._stats["reranked"] > 0
+    assert results[-1] == docs[::-1][:3]
+    assert reranker._ms_per_pair * len(docs) < reranker.budget_ms
+
+
+def test_cached_scores_skip_the_budget_check():
+    reranker = make_reranker()
+    reranker._ms_per_pair = 0.01
+    docs = candidates(5)
+    reranker.rerank("question", docs)
+    reranker._ms_per_pair = 1000.0
+
+    assert reranker.rerank("question", docs) == docs[::-1][:3]
+    assert reranker._stats["skipped_budget"] == 0
@@ -0,0 +1,71 @@
+"""SemanticSQLCache hits must not cross literals. From final_project/server:
+    python -m pytest tests
+"""
+import numpy as np
+import pytest
+
+from app.core.semantic_cache import SemanticSQLCache
+
+CITIES = {"delhi", "mumbai"}
+
+
+class SameVectorEmbeddings:
+    """Every question embeds to the same vector, only the literal check tells them apart."""
+
+    def embed_query(self, text):
+        return np.ones(8, dtype=np.float32)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SemanticSQLCache(
+        embeddings_provider=SameVectorEmbeddings,
+        db_path=tmp_path / "cache.db",
+        literals_provider=lambda question: sorted(CITIES & set(question.lower().split())),
+    )
+
+
+def test_paraphrase_with_same_literals_hits(cache):
+    cache.store("cheapest diesel cars in delhi", "SELECT 1")
+    hit = cache.lookup("which diesel cars in delhi are cheapest")
+    assert hit is not None and hit["sql_query"] == "SELECT 1"
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("cheapest diesel cars in delhi", "cheapest diesel cars in mumbai"),
+    ("cars manufactured in 2018", "cars manufactured in 2019"),
+    ("top 5 most viewed hatchbacks", "top 10 most viewed hatchbacks"),
+])
+def test_different_literals_miss(cache, stored, asked):
+    cache.store(stored, "SELECT 1")
+    assert cache.lookup(asked) is None
+    assert cache.stats()["literal_mismatches"] == 1
+
+
+def test_matching_entry_behind_a_mismatch_is_found(cache):
+    cache.store("cheapest diesel cars in mumbai", "SELECT mumbai")
+    cache.store("cheapest diesel cars in delhi", "SELECT delhi")
+    assert cache.lookup("diesel cars in delhi cheapest first")["sql_query"] == "SELECT delhi"
+
+
+class WordVectorEmbeddings:
+    """Questions sharing more words embed closer together."""
+
+    WORDS = ["cheapest", "diesel", "cars", "delhi", "first", "listings"]
+
+    def embed_query(self, text):
+        words = text.lower().split()
+        return np.array([1.0 + words.count(word) for word in self.WORDS], dtype=np.float32)
+
+
+def test_expired_best_match_does_not_hide_a_valid_one(tmp_path):
+    cache = SemanticSQLCache(embeddings_provider=WordVectorEmbeddings, db_path=tmp_path / "cache.db",
+                             threshold=0.9, ttl_seconds=60)
+    cache.store("cheapest diesel cars delhi first", "SELECT stale")
+    cache.store("cheapest diesel cars listings", "SELECT valid")
+    cache._entries["cheapest diesel cars delhi first"]["created_at"] -= 120
+
+    hit = cache.lookup("delhi first cheapest diesel cars please")
+
+    assert hit is not None and hit["sql_query"] == "SELECT valid"
+    assert cache.stats()["evictions"] == 1
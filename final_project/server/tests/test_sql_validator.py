@@ -0,0 +1,61 @@
+"""SQLValidator against the bundled used_cars.db. From final_project/server:
+    python -m pytest tests
+"""
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app.core.result_summary import bound_select
+from app.core.sql_validator import SQLValidator, is_read_query
+
+DB_PATH = Path(__file__).resolve().parents[1] / "app" / "db" / "used_cars.db"
+
+
+def schema_tables():
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    try:
+        tables = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        return {table: [column[1] for column in conn.execute(f'PRAGMA table_info("{table}")')] for table in tables}
+    finally:
+        conn.close()
+
+
+@pytest.fixture(scope="module")
+def validator():
+    return SQLValidator(DB_PATH, schema_tables, max_rows=200, allow_writes=False)
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT * FROM used_cars",
+    "  with cheap AS (SELECT * FROM used_cars WHERE sale_price < 300000) SELECT COUNT(*) FROM cheap",
+    "WITH x AS (SELECT replace(city, 'a', 'b') AS c FROM used_cars) SELECT c FROM x",
+    "EXPLAIN QUERY PLAN SELECT * FROM used_cars",
+])
+def test_reads(validator, sql_query):
+    assert is_read_query(sql_query)
+    assert validator.validate(sql_query)["status"] == "ok"
+
+
+@pytest.mark.parametrize("sql_query", [
+    "DELETE FROM used_cars",
+    "WITH old AS (SELECT id FROM used_cars WHERE yr_mfr < 2000) DELETE FROM used_cars WHERE id IN old",
+    "WITH x AS (SELECT 1) REPLACE INTO used_cars (id) VALUES (1)",
+])
+def test_writes_are_rejected(validator, sql_query):
+    assert not is_read_query(sql_query)
+    assert validator.validate(sql_query)["status"] == "rejected"
+
+
+def test_repair_leaves_string_literals_alone(validator):
+    report = validator.validate("SELECT car_nam FROM used_cars WHERE variant = 'car_nam' LIMIT 5")
+    assert report["status"] == "ok"
+    assert report["sql_query"] == "SELECT car_name FROM used_cars WHERE variant = 'car_nam' LIMIT 5"
+
+
+def test_forced_limit_note_matches_the_sql(validator):
+    report = validator.validate("SELECT car_name FROM used_cars")
+    assert report["sql_query"] == bound_select("SELECT car_name FROM used_cars", 200)
+    assert report["repairs"] == ["forced LIMIT 201"]
+    assert report["sql_query"].endswith("LIMIT 201")
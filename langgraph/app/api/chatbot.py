@@ -1,18 +1,26 @@
+import asyncio
+
 from fastapi import Form, HTTPException, APIRouter
 from fastapi.responses import JSONResponse
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph
 
 # Importing KnowledgeBase
-from app.core.query import RAGQueryEngine
+from app.core.engine_registry import engine_registry
 
 # Router
 router = APIRouter()
 
 def knowledge_base_agent(state):
-    engine = RAGQueryEngine()
+    engine = engine_registry.get("knowledge_base")
     result = engine.ask(state["query"])
     return {"answer": result}
 
+async def aknowledge_base_agent(state):
+    engine = await asyncio.to_thread(engine_registry.get, "knowledge_base")
+    result = await engine.aask(state["query"])
+    return {"answer": result}
+
 # --- Database Agent Node ---
 def database_agent(state):
     return
@@ -30,7 +38,7 @@ def router_agent(state):
 
 # --- Build LangGraph ---
 graph = StateGraph()
-graph.add_node("knowledge_base", knowledge_base_agent)
+graph.add_node("knowledge_base", RunnableLambda(knowledge_base_agent, afunc=aknowledge_base_agent))
 graph.add_node("database", database_agent)
 
 graph.add_conditional_edges(
@@ -58,9 +66,9 @@ async def query_vectorstore(query: str = Form(...)):
             )
 
         # # Set up QA chain
-        # engine = RAGQueryEngine()
+        # engine = engine_registry.get("knowledge_base")
         # answer = engine.ask(query) 
-        answer = app_graph.invoke({"query": query})
+        answer = await app_graph.ainvoke({"query": query})
 
         return JSONResponse(content={
             "results": answer,
@@ -40,14 +40,15 @@ async def upload_file(file: UploadFile = File(...)):
         with open(file_path, "wb") as f:
             f.write(await file.read())
 
+        # Only the uploaded file is parsed, and only its new or changed chunks are embedded
         build_instance = BuildRag()
-        texts = build_instance.load_documents(upload_directory)
-        build_instance.embedding_vector_store(texts)    
+        stats = build_instance.ingest_file(file_path)
 
         return JSONResponse(content={
             "message": "✅ File uploaded and ingested in vector store successfully.",
             "filename": file.filename,
             "path": file_path,
+            "ingestion": stats,
             "status_code": 200
         })    
 
@@ -3,10 +3,39 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 # from langchain_community.vectorstores import FAISS
 from langchain.vectorstores import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
-from uuid import uuid4
+from pathlib import Path
+import threading
+
+from app.core.ingest_manifest import IngestManifest, hash_file, chunk_ids
+from app.core.lexical_index import LEXICAL_FILE, LexicalIndex
+from app.core.embedding_cache import CachedEmbeddings
+
+# Serialises manifest read-modify-write across concurrent uploads
+_ingest_lock = threading.RLock()
+
 
 class BuildRag:
 
+    def __init__(self, persist_directory="./chroma_store"):
+        self.persist_directory = persist_directory  # Local folder for persistence
+        self.manifest_path = Path(persist_directory) / "ingest_manifest.json"
+        # BM25 index of the same chunks, updated together with Chroma
+        self.lexical = LexicalIndex(Path(persist_directory) / LEXICAL_FILE)
+
+    def _splitter(self):
+        return RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+
+    def _vector_store(self):
+        # Chunks embedded before (same text) are served from the embedding cache
+        embedding_model = CachedEmbeddings(
+            HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        )
+        return Chroma(
+            collection_name="my_docs",
+            embedding_function=embedding_model,
+            persist_directory=self.persist_directory
+        )
+
     def load_documents(self, path):
         try:
             # Loading documents
@@ -14,36 +43,122 @@ class BuildRag:
             docs = loader.load()
 
             # Splitting text
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-            texts = text_splitter.split_documents(docs)
+            texts = self._splitter().split_documents(docs)
             return texts
         except Exception as e:
             print(f"❌ Error while loading documents: {e}")
-            raise e        
+            raise e
+
+    def load_file(self, file_path):
+        try:
+            docs = PyPDFLoader(str(file_path)).load()
+            return self._splitter().split_documents(docs)
+        except Exception as e:
+            print(f"❌ Error while loading {file_path}: {e}")
+            raise e
 
-    def embedding_vector_store(self, texts):
+    def embedding_vector_store(self, texts, ids=None, vector_store=None):
         try:
-            embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-            # vectorstore = FAISS.from_documents(texts, embedding_model)
-            # vectorstore.save_local("faiss_index")
-            persist_directory = "./chroma_store"  # Local folder for persistence
-
-            vector_store = Chroma(
-                collection_name="my_docs",
-                embedding_function=embedding_model,
-                persist_directory=persist_directory
-            )
-            ids = [str(uuid4()) for _ in range(len(texts))]
-            vector_store.add_documents(documents=texts, ids=ids)
-            vector_store.persist()
-
-            print(f"✅ {len(texts)} documents stored in Chroma.")
+            if vector_store is None:
+                vector_store = self._vector_store()
+            if ids is None:
+                ids = self._content_ids(texts)
+
+            # Skip chunks whose content hash is already stored
+            existing = set(vector_store.get(ids=ids, include=[])["ids"]) if ids else set()
+            new = [(chunk_id, doc) for chunk_id, doc in zip(ids, texts) if chunk_id not in existing]
+            if new:
+                vector_store.add_documents(
+                    documents=[doc for _, doc in new],
+                    ids=[chunk_id for chunk_id, _ in new]
+                )
+                vector_store.persist()
+                self.lexical.add([chunk_id for chunk_id, _ in new], [doc for _, doc in new])
+
+            print(f"✅ {len(new)} documents stored in Chroma, {len(texts) - len(new)} unchanged skipped.")
+            return len(new)
 
         except Exception as e:
             print(f"❌ Error while creating embeddings and vector store {e}")
             raise e
-        
+
+    def _content_ids(self, texts):
+        by_source = {}
+        for index, doc in enumerate(texts):
+            source = Path(doc.metadata.get("source", "")).name
+            by_source.setdefault(source, []).append(index)
+        ids = [None] * len(texts)
+        for source, indexes in by_source.items():
+            for index, chunk_id in zip(indexes, chunk_ids(source, [texts[i] for i in indexes])):
+                ids[index] = chunk_id
+        return ids
+
+    def ingest_file(self, file_path, vector_store=None, manifest=None):
+        """
+        Embed only what changed in one PDF: unchanged files are skipped by file hash,
+        unchanged chunks by chunk hash, and chunks no longer in the file are deleted.
+        """
+        file_path = Path(file_path)
+        name = file_path.name
+        stats = {"file": name, "skipped": False, "chunks_added": 0, "chunks_unchanged": 0, "chunks_deleted": 0}
+
+        with _ingest_lock:
+            own_manifest = manifest is None
+            if own_manifest:
+                manifest = IngestManifest(self.manifest_path)
+            file_hash = hash_file(file_path)
+            if manifest.file_hash(name) == file_hash:
+                stats["skipped"] = True
+                print(f"⏭️ {name} unchanged, skipping ingestion.")
+                return stats
+
+            if vector_store is None:
+                vector_store = self._vector_store()
+            texts = self.load_file(file_path)
+            ids = chunk_ids(name, texts)
+            previous = set(manifest.chunk_ids(name))
+
+            stale = list(previous - set(ids))
+            if stale:
+                vector_store.delete(ids=stale)
+                self.lexical.delete(stale)
+
+            new = [(chunk_id, doc) for chunk_id, doc in zip(ids, texts) if chunk_id not in previous]
+            if new:
+                stats["chunks_added"] = self.embedding_vector_store(
+                    [doc for _, doc in new], ids=[chunk_id for chunk_id, _ in new], vector_store=vector_store
+                )
+
+            stats["chunks_unchanged"] = len(texts) - len(new)
+            stats["chunks_deleted"] = len(stale)
+            manifest.record(name, file_hash, ids)
+            if own_manifest:
+                manifest.save()
+            return stats
+
+    def ingest_directory(self, path):
+        """Sync the vector store with every PDF in `path`, removing vectors of deleted files."""
+        with _ingest_lock:
+            manifest = IngestManifest(self.manifest_path)
+            vector_store = self._vector_store()
+            present = set()
+            results = []
+            for file_path in sorted(Path(path).glob("*.pdf")):
+                present.add(file_path.name)
+                results.append(self.ingest_file(file_path, vector_store=vector_store, manifest=manifest))
+                manifest.save()
+
+            for name in list(manifest.files):
+                if name not in present:
+                    stale = manifest.chunk_ids(name)
+                    if stale:
+                        vector_store.delete(ids=stale)
+                        self.lexical.delete(stale)
+                    manifest.forget(name)
+                    results.append({"file": name, "removed": True, "chunks_deleted": len(stale)})
+            manifest.save()
+            return results
+
 if __name__ == '__main__':
     build_instance = BuildRag()
-    texts = build_instance.load_documents('./documents')
-    build_instance.embedding_vector_store(texts)
+    print(build_instance.ingest_directory('./documents'))
@@ -0,0 +1,174 @@
+import math
+import os
+import re
+
+WORD_RE = re.compile(r"\w+")
+SENTENCE_END_RE = re.compile(r"[.!?](?=\s)")
+
+# Header of the RetrievalQA "stuff" chat prompt, kept so answers read the same
+SYSTEM_TEMPLATE = (
+    "Use the following pieces of context to answer the user's question. \n"
+    "If you don't know the answer, just say that you don't know, don't try to make up an answer.\n"
+    "----------------\n{context}"
+)
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English BPE vocabularies, no tokenizer dependency
+    return math.ceil(len(text) / 4)
+
+
+def _shingles(text, size=3):
+    words = WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _overlap(left, right, min_overlap):
+    """Length of the longest suffix of `left` that is a prefix of `right`, 0 below min_overlap."""
+    for size in range(min(len(left), len(right)) - 1, min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+class Passage:
+    """One or more stitched chunks of the same page, ranked by its best chunk."""
+
+    def __init__(self, rank, doc):
+        self.rank = rank
+        self.key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        self.text = doc.page_content.strip()
+        self.chunks = 1
+        # Span of the best ranked chunk, truncation keeps it
+        self.anchor = (0, len(self.text))
+
+    def stitch(self, other, min_overlap):
+        """Joins another passage onto either end when the two overlap, returns False otherwise."""
+        size = _overlap(self.text, other.text, min_overlap)
+        if size:
+            text = self.text + other.text[size:]
+            own_offset, other_offset = 0, len(self.text) - size
+        else:
+            size = _overlap(other.text, self.text, min_overlap)
+            if not size:
+                return False
+            text = other.text + self.text[size:]
+            own_offset, other_offset = len(other.text) - size, 0
+
+        if other.rank < self.rank:
+            self.rank = other.rank
+            self.anchor = (other.anchor[0] + other_offset, other.anchor[1] + other_offset)
+        else:
+            self.anchor = (self.anchor[0] + own_offset, self.anchor[1] + own_offset)
+        self.text = text
+        self.chunks += other.chunks
+        return True
+
+
+class ContextPacker:
+    """
+    Context assembly for the QA prompt. The retriever over-fetches candidates, then:
+    near-duplicate chunks are dropped (word shingle containment), chunks of the same
+    page that overlap (the splitter's chunk_overlap) are stitched back into one passage,
+    and passages are packed in relevance order into a fixed token budget.
+      RAG_FETCH_K           candidates fetched from the vector store
+      RAG_CONTEXT_TOKENS    token budget of the packed context
+      RAG_DEDUP_THRESHOLD   shingle containment above which a chunk is a duplicate (default 0.8)
+    """
+
+    def __init__(self, fetch_k=8, token_budget=600, dedup_threshold=0.8, min_overlap=20, min_tail_tokens=48):
+        self.fetch_k = fetch_k
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.min_overlap = min_overlap
+        self.min_tail_tokens = min_tail_tokens
+
+    @classmethod
+    def from_env(cls, fetch_k=8, token_budget=600):
+        """Packer with the RAG_* environment overrides on top of the engine's defaults."""
+        return cls(
+            fetch_k=int(os.getenv("RAG_FETCH_K", fetch_k)),
+            token_budget=int(os.getenv("RAG_CONTEXT_TOKENS", token_budget)),
+            dedup_threshold=float(os.getenv("RAG_DEDUP_THRESHOLD", "0.8")),
+        )
+
+    def _deduplicate(self, docs):
+        kept, seen = [], []
+        for doc in docs:
+            shingles = _shingles(doc.page_content)
+            if not shingles:
+                continue
+            duplicate = any(
+                len(shingles & other) / min(len(shingles), len(other)) >= self.dedup_threshold
+                for other in seen
+            )
+            if not duplicate:
+                kept.append(doc)
+                seen.append(shingles)
+        return kept
+
+    def _stitch(self, docs):
+        passages = []
+        for rank, doc in enumerate(docs):
+            candidate = Passage(rank, doc)
+            target = next(
+                (passage for passage in passages
+                 if passage.key == candidate.key and passage.stitch(candidate, self.min_overlap)),
+                None
+            )
+            if target is None:
+                passages.append(candidate)
+                continue
+            # The new chunk may bridge two passages that were separate so far
+            for other in passages:
+                if other is not target and other.key == target.key and target.stitch(other, self.min_overlap):
+                    passages.remove(other)
+                    break
+        return sorted(passages, key=lambda passage: passage.rank)
+
+    def _truncate(self, passage, tokens):
+        # Window starting at the best chunk, moved back when it runs past the end
+        size = tokens * 4
+        start = max(0, min(passage.anchor[0], len(passage.text) - size))
+        cut = passage.text[start:start + size]
+        if start > 0:
+            cut = cut.split(" ", 1)[-1]
+        # Prefer ending on a sentence, then on a word
+        ends = list(SENTENCE_END_RE.finditer(cut))
+        if ends and ends[-1].end() > len(cut) // 2:
+            return cut[:ends[-1].end()]
+        return cut.rsplit(" ", 1)[0]
+
+    def pack(self, docs):
+        """(context text, stats) for the retrieved documents, best first."""
+        unique = self._deduplicate(docs)
+        passages = self._stitch(unique)
+
+        parts, used, truncated = [], 0, False
+        for passage in passages:
+            # Documents are joined with a blank line, like the stuff chain does
+            cost = estimate_tokens(passage.text) + (1 if parts else 0)
+            if used + cost <= self.token_budget:
+                parts.append(passage.text)
+                used += cost
+                continue
+            remaining = self.token_budget - used
+            if remaining >= self.min_tail_tokens:
+                parts.append(self._truncate(passage, remaining - 1))
+                truncated = True
+                break
+            # Too little room to be worth a cut, a shorter passage further down may still fit
+
+        context = "\n\n".join(parts)
+        stats = {
+            "candidates": len(docs),
+            "duplicates": len(docs) - len(unique),
+            "passages": len(parts),
+            "stitched_chunks": sum(passage.chunks - 1 for passage in passages),
+            "truncated": truncated,
+            "tokens": estimate_tokens(context),
+            "token_budget": self.token_budget,
+        }
+        return context, stats
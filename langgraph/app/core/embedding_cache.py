@@ -0,0 +1,198 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[2] / "embedding_cache.db"
+
+# OrderedDict slot, key string and array header, counted on top of the vector bytes
+ENTRY_OVERHEAD = 200
+# sqlite bound-parameter limit is 999 on older builds
+LOOKUP_BATCH = 500
+
+
+def normalize_query(text):
+    # all-MiniLM-L6-v2 is uncased and its tokenizer ignores whitespace runs, so these
+    # variants of a question embed to the same vector
+    return " ".join(text.lower().split())
+
+
+def cache_key(namespace, kind, text):
+    return hashlib.sha256(f"{namespace}\x00{kind}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of embedding vectors: an in-memory LRU bounded by bytes in front of an
+    optional sqlite file, so repeated questions and already embedded chunks skip the model,
+    across restarts too. Vectors are kept as float32 arrays (1.5 KB for MiniLM's 384 dims,
+    a list of Python floats takes ~12 KB) and stored on disk as raw float32 blobs.
+      EMBEDDING_CACHE_MEMORY_MB  size of the memory tier (default 32)
+      EMBEDDING_CACHE_DISK_MB    size of the sqlite tier (default 256)
+      EMBEDDING_CACHE_PATH       sqlite file, empty string disables the disk tier
+    """
+
+    def __init__(self, path=None, memory_bytes=None, disk_bytes=None):
+        path = os.getenv("EMBEDDING_CACHE_PATH", str(DEFAULT_CACHE_PATH)) if path is None else path
+        self.memory_bytes = memory_bytes or int(float(os.getenv("EMBEDDING_CACHE_MEMORY_MB", "32")) * 1024 * 1024)
+        self.disk_bytes = disk_bytes or int(float(os.getenv("EMBEDDING_CACHE_DISK_MB", "256")) * 1024 * 1024)
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._stats = {}
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                " key TEXT PRIMARY KEY, kind TEXT, vector BLOB, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache(last_used)")
+            self._conn.commit()
+
+    def _count(self, kind, field, n=1):
+        counts = self._stats.setdefault(kind, {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0})
+        counts[field] += n
+
+    def _remember(self, key, vector):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_used -= previous.nbytes + ENTRY_OVERHEAD
+        self._memory[key] = vector
+        self._memory_used += vector.nbytes + ENTRY_OVERHEAD
+        while self._memory_used > self.memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= evicted.nbytes + ENTRY_OVERHEAD
+
+    def get_many(self, keys, kind):
+        """Cached float32 vectors of `keys`, None where there is none."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            memory_hits = len(found)
+
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            if missing and self._conn is not None:
+                disk_hits = []
+                for start in range(0, len(missing), LOOKUP_BATCH):
+                    batch = missing[start:start + LOOKUP_BATCH]
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embedding_cache WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(key, vector)
+                        found[key] = vector
+                        disk_hits.append(key)
+                if disk_hits:
+                    now = time.time()
+                    self._conn.executemany("UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                                           [(now, key) for key in disk_hits])
+                    self._conn.commit()
+                self._count(kind, "disk_hits", len(disk_hits))
+
+            self._count(kind, "memory_hits", memory_hits)
+            self._count(kind, "misses", len(keys) - sum(1 for key in keys if key in found))
+        return [found.get(key) for key in keys]
+
+    def put_many(self, keys, vectors, kind):
+        vectors = [np.asarray(vector, dtype=np.float32) for vector in vectors]
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+            self._count(kind, "stores", len(keys))
+            if self._conn is None:
+                return
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache VALUES (?, ?, ?, ?)",
+                [(key, kind, vector.tobytes(), now) for key, vector in zip(keys, vectors)]
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embedding_cache").fetchone()[0]
+            # Evict least recently used rows until the disk tier fits its budget again
+            while total > self.disk_bytes:
+                rows = self._conn.execute(
+                    "SELECT key, LENGTH(vector) FROM embedding_cache ORDER BY last_used LIMIT 256"
+                ).fetchall()
+                if not rows:
+                    break
+                for key, size in rows:
+                    self._conn.execute("DELETE FROM embedding_cache WHERE key = ?", (key,))
+                    total -= size
+                    if total <= self.disk_bytes:
+                        break
+            self._conn.commit()
+
+    def embed_documents(self, namespace, texts, embed):
+        """
+        Vectors of `texts` keyed by the hash of the chunk text, only the misses (each
+        distinct text once) are passed to `embed(texts)`. Returns float32 arrays.
+        """
+        keys = [cache_key(namespace, "document", text) for text in texts]
+        vectors = self.get_many(keys, "document")
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        if missing:
+            fresh = dict(zip(missing, np.asarray(embed(list(missing.values())), dtype=np.float32)))
+            self.put_many(list(fresh), list(fresh.values()), "document")
+            vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM embedding_cache")
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            per_kind = {kind: dict(counts) for kind, counts in self._stats.items()}
+            memory = {"entries": len(self._memory), "bytes": self._memory_used, "budget_bytes": self.memory_bytes}
+        for counts in per_kind.values():
+            lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+            counts["hit_rate"] = round((counts["memory_hits"] + counts["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return {"memory": memory, "disk": self._conn is not None, "kinds": per_kind}
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain embeddings backed by the embedding cache, like CacheBackedEmbeddings:
+    documents are keyed by the hash of the chunk text, so a chunk embedded once (by any
+    ingestion) is never embedded again, and queries by their normalized text.
+    `namespace` (the model name by default) keeps vectors of different models apart.
+    """
+
+    def __init__(self, embeddings, namespace=None, cache=None):
+        self.embeddings = embeddings
+        self.namespace = namespace or embeddings.model_name
+        self.cache = cache or embedding_cache
+
+    def embed_documents(self, texts):
+        return [vector.tolist() for vector in self.cache.embed_documents(self.namespace, texts, self.embeddings.embed_documents)]
+
+    def embed_query(self, text):
+        key = cache_key(self.namespace, "query", normalize_query(text))
+        vector = self.cache.get_many([key], "query")[0]
+        if vector is None:
+            vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+            self.cache.put_many([key], [vector], "query")
+        return vector.tolist()
+
+
+embedding_cache = EmbeddingCache()
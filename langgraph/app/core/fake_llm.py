@@ -0,0 +1,91 @@
+import asyncio
+import os
+import re
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+QUESTION_RE = re.compile(r"(?:Original Question|Question):\s*(.+)", re.IGNORECASE)
+
+
+def _question(messages):
+    for message in reversed(messages):
+        match = QUESTION_RE.search(str(message.content))
+        if match:
+            return match.group(1).strip()
+    return str(messages[-1].content).strip() if messages else ""
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic local chat model for offline benchmarks, selected with LLM_BACKEND=fake.
+    No network, no keys. Latency is simulated:
+      LLM_FAKE_LATENCY_MS       delay before the first token (default 50)
+      LLM_FAKE_TOKEN_MS         delay per streamed token (default 0)
+      LLM_FAKE_ANSWER_WORDS     length of free-text answers (default 40)
+    """
+
+    latency_ms: float = 50.0
+    token_ms: float = 0.0
+    answer_words: int = 40
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(
+            latency_ms=float(os.getenv("LLM_FAKE_LATENCY_MS", "50")),
+            token_ms=float(os.getenv("LLM_FAKE_TOKEN_MS", "0")),
+            answer_words=int(os.getenv("LLM_FAKE_ANSWER_WORDS", "40")),
+            **kwargs
+        )
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _content(self, messages):
+        question = _question(messages)
+        # Free text: the question followed by words of the prompt, so answers differ per input
+        words = " ".join(str(m.content) for m in messages).split()
+        filler = " ".join(words[-self.answer_words:])
+        return f"Offline answer to: {question}. {filler}"
+
+    @staticmethod
+    def _usage(messages, content):
+        # Rough word-based estimate so token accounting has something to report
+        prompt_tokens = sum(len(str(m.content).split()) for m in messages)
+        completion_tokens = len(content.split())
+        return {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _result(self, messages):
+        content = self._content(messages)
+        message = AIMessage(content=content, usage_metadata=self._usage(messages, content))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep((self.latency_ms + self.token_ms * self.answer_words) / 1000)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep((self.latency_ms + self.token_ms * self.answer_words) / 1000)
+        return self._result(messages)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency_ms / 1000)
+        for word in self._content(messages).split(" "):
+            time.sleep(self.token_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency_ms / 1000)
+        for word in self._content(messages).split(" "):
+            await asyncio.sleep(self.token_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
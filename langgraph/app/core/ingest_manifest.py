@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+def hash_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids(source, texts):
+    """
+    Deterministic ids for the chunks of one file: sha256 of the file name and chunk text.
+    Identical chunks inside the same file get an occurrence suffix so ids stay unique.
+    """
+    ids = []
+    seen = {}
+    for doc in texts:
+        content = doc.page_content if hasattr(doc, "page_content") else str(doc)
+        base = hashlib.sha256(f"{source}\x00{content}".encode("utf-8")).hexdigest()
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+        ids.append(base if occurrence == 0 else f"{base}-{occurrence}")
+    return ids
+
+
+class IngestManifest:
+    """
+    JSON manifest kept next to the vector store:
+    {"files": {"<file name>": {"sha256": "...", "chunk_ids": [...]}}}
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.files = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    def file_hash(self, name):
+        return self.files.get(name, {}).get("sha256")
+
+    def chunk_ids(self, name):
+        return list(self.files.get(name, {}).get("chunk_ids", []))
+
+    def record(self, name, file_hash, ids):
+        self.files[name] = {"sha256": file_hash, "chunk_ids": list(ids)}
+
+    def forget(self, name):
+        return self.files.pop(name, None)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f)
+        # Atomic replace so a crash mid-write never leaves a truncated manifest
+        os.replace(tmp_path, self.path)
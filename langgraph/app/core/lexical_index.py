@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+LEXICAL_FILE = "lexical_index.sqlite"
+TOKEN_RE = re.compile(r"\w+")
+
+# Matched by nearly every chunk, they only lengthen the posting lists BM25 has to walk
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or so that the this to "
+    "was what when where which who why will with you your".split()
+)
+
+
+def content_key(doc):
+    # Chroma hits carry no id, chunks are matched across rankings by their text
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+
+def rrf_fuse(rankings, k=60):
+    """
+    Reciprocal rank fusion: every ranking adds 1 / (k + rank) to a chunk's score, so
+    chunks found by both searches rise to the top without comparing their raw scores.
+    The first copy of a chunk seen is kept.
+    """
+    scores, docs = {}, {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = content_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class LexicalIndex:
+    """
+    BM25 keyword index of the chunks, kept next to the vector store and updated by the
+    same ingestion calls. Catches exact terms (model names, acronyms, numbers) that the
+    MiniLM embeddings blur. sqlite FTS5 with the porter stemmer, chunk rows live in a
+    plain table so deletes by chunk id don't scan the full-text index.
+      HYBRID_SEARCH   1 (default) runs the lexical search next to the dense one, 0 disables it
+      LEXICAL_K       chunks taken from the lexical search (default: the dense fetch k)
+      RRF_K           rank offset of reciprocal rank fusion (default 60)
+    """
+
+    def __init__(self, path, k=None, rrf_k=None):
+        self.path = Path(path)
+        self.k = k or int(os.getenv("LEXICAL_K", "0")) or 8
+        self.rrf_k = rrf_k or int(os.getenv("RRF_K", "60"))
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls, directory, k=None):
+        """Returns the index stored in `directory`, or None when HYBRID_SEARCH=0."""
+        if os.getenv("HYBRID_SEARCH", "1") == "0":
+            return None
+        return cls(Path(directory) / LEXICAL_FILE, k=int(os.getenv("LEXICAL_K", "0")) or k)
+
+    def _conn(self):
+        # One connection per thread, ingestion writes from the embedding pipeline's writer thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " rowid INTEGER PRIMARY KEY, chunk_id TEXT UNIQUE, content TEXT, metadata TEXT);"
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+                " content, content='chunks', content_rowid='rowid', tokenize='porter unicode61');"
+                "CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN"
+                " INSERT INTO chunks_fts(rowid, content) VALUES (new.rowid, new.content); END;"
+                "CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN"
+                " INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content); END;"
+            )
+            self._local.conn = conn
+        return conn
+
+    def add(self, ids, docs):
+        """Indexes new chunks, ids are content hashes so chunks already present are left alone."""
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO chunks (chunk_id, content, metadata) VALUES (?, ?, ?)",
+                [(chunk_id, doc.page_content, json.dumps(doc.metadata)) for chunk_id, doc in zip(ids, docs)]
+            )
+
+    def delete(self, ids):
+        with self._conn() as conn:
+            conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in ids])
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    @staticmethod
+    def match_expression(query):
+        """FTS5 query matching any query term, each quoted so user text can't inject operators."""
+        terms = [term for term in TOKEN_RE.findall(query.lower()) if term not in STOPWORDS]
+        return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+    def search(self, query, k=None):
+        """Best `k` chunks by BM25, as Documents with their chunk id."""
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        rows = self._conn().execute(
+            "SELECT chunks.chunk_id, chunks.content, chunks.metadata FROM chunks_fts"
+            " JOIN chunks ON chunks.rowid = chunks_fts.rowid"
+            " WHERE chunks_fts MATCH ? ORDER BY rank LIMIT ?",
+            (expression, k or self.k)
+        ).fetchall()
+        return [Document(id=chunk_id, page_content=content, metadata=json.loads(metadata))
+                for chunk_id, content, metadata in rows]
@@ -0,0 +1,19 @@
+import os
+
+from langchain_groq import ChatGroq
+
+from app.core.llm_cache import cache_for
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+
+
+def get_chat_model(call_site, model=DEFAULT_MODEL, temperature=0.0):
+    """ChatGroq for one call site, deterministic calls share the tiered response cache."""
+    if os.getenv("LLM_BACKEND", "groq").lower() == "fake":
+        # Offline benchmarks: deterministic local model, never cached so latency stays simulated
+        from app.core.fake_llm import FakeChatModel
+        return FakeChatModel.from_env()
+
+    # Sampling above temperature 0 is meant to vary, so those calls are never cached
+    cache = cache_for(call_site) if temperature == 0 else None
+    return ChatGroq(model=model, temperature=temperature, cache=cache)
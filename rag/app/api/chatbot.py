@@ -1,8 +1,10 @@
+import asyncio
+
 from fastapi import Form, HTTPException, APIRouter
 from fastapi.responses import JSONResponse
 
 # Importing classes
-from app.core.query import RAGQueryEngine
+from app.core.engine_registry import engine_registry
 
 # Router
 router = APIRouter()
@@ -16,9 +18,9 @@ async def query_vectorstore(query: str = Form(...)):
                 status_code=400, detail="Missing 'query' in request body"
             )
 
-        # Set up QA chain
-        engine = RAGQueryEngine()
-        answer = engine.ask(query) 
+        # Shared QA chain, built once per process
+        engine = await asyncio.to_thread(engine_registry.get, "knowledge_base")
+        answer = await engine.aask(query)
 
         return JSONResponse(content={
             "results": answer,
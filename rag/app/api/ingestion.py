@@ -1,9 +1,11 @@
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, APIRouter
 from fastapi.responses import JSONResponse
+import asyncio
 import os
 
 # Importing classes
 from app.core.build_index import BuildRag
+from app.core.engine_registry import engine_registry
 
 router = APIRouter()
 
@@ -43,14 +45,19 @@ async def upload_file(file: UploadFile = File(...)):
         with open(file_path, "wb") as f:
             f.write(await file.read())
 
+        # Unchanged files are skipped by hash, so syncing the folder only parses the new upload
+        # (and rebuilds once if the index predates the ingest manifest)
         build_instance = BuildRag()
-        texts = build_instance.load_documents(upload_directory)
-        build_instance.embedding_vector_store(texts)    
+        stats = build_instance.ingest_directory(upload_directory)
+        # The served engine holds the FAISS generation it loaded, swap in the new one now
+        # instead of waiting for its next reload check
+        await asyncio.to_thread(engine_registry.refresh, "knowledge_base")
 
         return JSONResponse(content={
             "message": "✅ File uploaded and ingested in vector store successfully.",
             "filename": file.filename,
             "path": file_path,
+            "ingestion": stats,
             "status_code": 200
         })    
 
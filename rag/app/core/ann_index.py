@@ -0,0 +1,144 @@
+import math
+import os
+
+import faiss
+import numpy as np
+
+# Short names for the supported layouts, anything else is passed to faiss.index_factory as is
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq", "sq8", "ivfsq8", "hnswsq8")
+
+# faiss wants ~39 training points per centroid, PQ codebooks have 256 centroids
+POINTS_PER_CENTROID = 39
+PQ_CENTROIDS = 256
+
+
+class ANNIndexFactory:
+    """
+    Builds the FAISS index behind the rag vector store. A new store starts exact (Flat),
+    and is converted to the configured layout at save time once there are enough
+    vectors to train it. Training uses a random sample of the stored vectors.
+      FAISS_INDEX_TYPE        flat (default), ivf, hnsw, ivfpq, sq8, ivfsq8, hnswsq8,
+                              or a faiss index_factory string
+      FAISS_NLIST             IVF lists (default 4 * sqrt(n))
+      FAISS_PQ_M              PQ sub-quantizers, must divide the dimension (default 48)
+      FAISS_HNSW_M            HNSW neighbours per node (default 32)
+      FAISS_EF_CONSTRUCTION   HNSW build-time beam (default 80)
+      FAISS_TRAIN_SAMPLE      vectors used for training (default 50000)
+      FAISS_NPROBE            IVF lists visited per query (default 16)
+      FAISS_EF_SEARCH         HNSW query-time beam (default 64)
+    """
+
+    def __init__(self, index_type=None, nlist=None, pq_m=None, hnsw_m=None, ef_construction=None,
+                 train_sample=None, nprobe=None, ef_search=None):
+        self.index_type = (index_type or os.getenv("FAISS_INDEX_TYPE", "flat")).strip()
+        self.nlist = nlist or int(os.getenv("FAISS_NLIST", "0"))
+        self.pq_m = pq_m or int(os.getenv("FAISS_PQ_M", "48"))
+        self.hnsw_m = hnsw_m or int(os.getenv("FAISS_HNSW_M", "32"))
+        self.ef_construction = ef_construction or int(os.getenv("FAISS_EF_CONSTRUCTION", "80"))
+        self.train_sample = train_sample or int(os.getenv("FAISS_TRAIN_SAMPLE", "50000"))
+        self.nprobe = nprobe or int(os.getenv("FAISS_NPROBE", "16"))
+        self.ef_search = ef_search or int(os.getenv("FAISS_EF_SEARCH", "64"))
+
+    # --- Layout ---
+    def _nlist(self, n):
+        nlist = self.nlist or int(4 * math.sqrt(n))
+        return max(1, min(nlist, n // POINTS_PER_CENTROID))
+
+    def factory_string(self, dim, n):
+        """faiss index_factory string for `n` vectors, Flat while there are too few to train."""
+        kind = self.index_type.lower()
+        if kind not in INDEX_TYPES:
+            return self.index_type
+        nlist = self._nlist(n)
+        if kind in ("ivf", "ivfpq", "ivfsq8") and nlist < 2:
+            return "Flat"
+        if kind == "ivfpq" and n < PQ_CENTROIDS * POINTS_PER_CENTROID:
+            return "Flat"
+        return {
+            "flat": "Flat",
+            "ivf": f"IVF{nlist},Flat",
+            "hnsw": f"HNSW{self.hnsw_m},Flat",
+            "ivfpq": f"IVF{nlist},PQ{self.pq_m}x8",
+            "sq8": "SQ8",
+            "ivfsq8": f"IVF{nlist},SQ8",
+            "hnswsq8": f"HNSW{self.hnsw_m}_SQ8",
+        }[kind]
+
+    def build(self, vectors, factory_string=None):
+        """New index over `vectors` (float32, n x dim), trained on a sample when needed."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n, dim = vectors.shape
+        factory_string = factory_string or self.factory_string(dim, n)
+        index = faiss.index_factory(dim, factory_string)
+        hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+        if hnsw is not None:
+            hnsw.efConstruction = self.ef_construction
+        if not index.is_trained:
+            rng = np.random.default_rng(0)
+            sample = vectors if n <= self.train_sample else vectors[rng.choice(n, self.train_sample, replace=False)]
+            index.train(sample)
+        index.add(vectors)
+        self.tune(index)
+        return index
+
+    def tune(self, index):
+        """Applies the query-time knobs (nprobe, efSearch) to a loaded index."""
+        index = getattr(index, "inner", index)  # TombstoneFilter view of a reader
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = min(self.nprobe, ivf.nlist)
+        hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+        if hnsw is not None:
+            hnsw.efSearch = self.ef_search
+        return index
+
+    @staticmethod
+    def describe(index):
+        index = faiss.downcast_index(index)
+        return {"type": type(index).__name__, "vectors": index.ntotal, "dim": index.d}
+
+    # --- Vector store maintenance ---
+    def upgrade(self, vectorstore):
+        """
+        Replaces an exact Flat index with the configured layout once it can be trained.
+        Returns True when the index was rebuilt. Other layouts are left alone, their
+        vectors can't be recovered exactly, re-ingest to change them.
+        """
+        index = vectorstore.index
+        if not isinstance(faiss.downcast_index(index), faiss.IndexFlat):
+            return False
+        target = self.factory_string(index.d, index.ntotal)
+        if target == "Flat":
+            return False
+        vectors = index.reconstruct_n(0, index.ntotal)
+        vectorstore.index = self.build(vectors, target)
+        print(f"✅ FAISS index rebuilt as {target} over {index.ntotal} vectors.")
+        return True
+
+    def compact(self, vectorstore):
+        """
+        Drops tombstoned positions from the index and renumbers the id map. Flat-code
+        layouts (Flat, SQ, PQ) shift positions on remove_ids, IVF keeps its labels and
+        HNSW can't remove at all, so those are refilled with the live vectors, keeping
+        the trained quantizers. Returns the number of vectors dropped.
+        """
+        tombstones = getattr(vectorstore, "tombstones", set())
+        if not tombstones:
+            return 0
+        kept = [(position, doc_id) for position, doc_id in sorted(vectorstore.index_to_docstore_id.items())
+                if position not in tombstones]
+        index = vectorstore.index
+        if isinstance(faiss.downcast_index(index), faiss.IndexFlatCodes):
+            index.remove_ids(np.array(sorted(tombstones), dtype=np.int64))
+        else:
+            ivf = faiss.try_extract_index_ivf(index)
+            if ivf is not None:
+                ivf.make_direct_map()
+            vectors = index.reconstruct_n(0, index.ntotal)[[position for position, _ in kept]]
+            refilled = faiss.clone_index(index)
+            refilled.reset()
+            refilled.add(vectors)
+            vectorstore.index = self.tune(refilled)
+        vectorstore.index_to_docstore_id = {i: doc_id for i, (_, doc_id) in enumerate(kept)}
+        vectorstore.tombstones = set()
+        return len(tombstones)
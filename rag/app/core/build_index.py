@@ -2,8 +2,62 @@ from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_huggingface import HuggingFaceEmbeddings
+from pathlib import Path
+import os
+import threading
+
+from app.core.ingest_manifest import IngestManifest, hash_file, chunk_ids
+from app.core.faiss_store import SqliteDocstore, index_exists, live_ids, load_index, save_index, writer_lock
+from app.core.ann_index import ANNIndexFactory
+from app.core.lexical_index import LEXICAL_FILE, LexicalIndex
+from app.core.embedding_cache import CachedEmbeddings
+
 
 class BuildRag:
+    """
+    Incremental FAISS ingestion. Deleted chunks are tombstoned (their index positions
+    are hidden from readers) and dropped by a background compaction once they make up
+    too much of the index. Every save is a new generation swapped in atomically.
+    Index and manifest read-modify-write runs under the index directory's writer lock,
+    shared by every BuildRag of the process and across processes.
+      FAISS_COMPACT_RATIO   tombstoned share of the index that triggers compaction (default 0.2)
+    """
+
+    def __init__(self, index_path=None):
+        self.index_path = index_path or os.getenv("FAISS_INDEX_PATH", "faiss_index")
+        self.manifest_path = Path(self.index_path) / "ingest_manifest.json"
+        self.embedding_model = None
+        self.vectorstore = None
+        self.ann = ANNIndexFactory()
+        self.compact_ratio = float(os.getenv("FAISS_COMPACT_RATIO", "0.2"))
+        # BM25 index of the same chunks, updated together with FAISS
+        self.lexical = LexicalIndex(Path(self.index_path) / LEXICAL_FILE)
+        self._lock = writer_lock(self.index_path)
+
+    def _splitter(self):
+        return RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+
+    def _embeddings(self):
+        if self.embedding_model is None:
+            # Chunks embedded before (same text) are served from the embedding cache
+            self.embedding_model = CachedEmbeddings(
+                HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+            )
+        return self.embedding_model
+
+    def _load_index(self):
+        vectorstore = self.vectorstore
+        if (vectorstore is not None and isinstance(vectorstore.docstore, SqliteDocstore)
+                and vectorstore.docstore.generation() != vectorstore.generation):
+            # Another BuildRag (a concurrent upload, another worker) saved since, continue from its generation
+            print(f"🔄 FAISS index generation {vectorstore.generation} is stale, reloading.")
+            vectorstore.docstore.close()
+            self.vectorstore = None
+        if self.vectorstore is None and self.manifest_path.exists() and index_exists(self.index_path):
+            # Indexes written before the manifest existed use random ids and are rebuilt instead
+            self.vectorstore = load_index(self.index_path, self._embeddings(), writable=True)
+            self.ann.tune(self.vectorstore.index)
+        return self.vectorstore
 
     def load_documents(self, path):
         try:
@@ -12,25 +66,151 @@ class BuildRag:
             docs = loader.load()
 
             # Splitting text
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-            texts = text_splitter.split_documents(docs)
+            texts = self._splitter().split_documents(docs)
             return texts
         except Exception as e:
             print(f"❌ Error while loading documents: {e}")
-            raise e        
+            raise e
 
-    def embedding_vector_store(self, texts):
+    def load_file(self, file_path):
         try:
-            embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-            vectorstore = FAISS.from_documents(texts, embedding_model)
-            vectorstore.save_local("faiss_index")
-            print("✅ FAISS index saved.")
+            docs = PyPDFLoader(str(file_path)).load()
+            return self._splitter().split_documents(docs)
+        except Exception as e:
+            print(f"❌ Error while loading {file_path}: {e}")
+            raise e
+
+    def embedding_vector_store(self, texts, ids=None, save=True):
+        try:
+            if ids is None:
+                ids = self._content_ids(texts)
+            vectorstore = self._load_index()
+
+            # Skip chunks whose content hash is already in the index
+            existing = live_ids(vectorstore) if vectorstore is not None else set()
+            new = [(chunk_id, doc) for chunk_id, doc in zip(ids, texts) if chunk_id not in existing]
+            if new:
+                documents = [doc for _, doc in new]
+                new_ids = [chunk_id for chunk_id, _ in new]
+                if vectorstore is None:
+                    self.vectorstore = FAISS.from_documents(documents, self._embeddings(), ids=new_ids)
+                    self.vectorstore.tombstones = set()
+                else:
+                    vectorstore.add_documents(documents, ids=new_ids)
+                self.lexical.add(new_ids, documents)
+
+            if save and self.vectorstore is not None:
+                self._save()
+            print(f"✅ FAISS index saved, {len(new)} chunks embedded, {len(texts) - len(new)} unchanged skipped.")
+            return len(new)
 
         except Exception as e:
             print(f"❌ Error while creating embeddings and vector store {e}")
             raise e
-        
+
+    def _content_ids(self, texts):
+        by_source = {}
+        for index, doc in enumerate(texts):
+            source = Path(doc.metadata.get("source", "")).name
+            by_source.setdefault(source, []).append(index)
+        ids = [None] * len(texts)
+        for source, indexes in by_source.items():
+            for index, chunk_id in zip(indexes, chunk_ids(source, [texts[i] for i in indexes])):
+                ids[index] = chunk_id
+        return ids
+
+    def _delete(self, ids):
+        vectorstore = self._load_index()
+        if vectorstore is None or not ids:
+            return
+        # Tombstone the positions, the vectors stay until the next compaction
+        self.lexical.delete(ids)
+        ids = set(ids)
+        vectorstore.tombstones.update(
+            position for position, chunk_id in vectorstore.index_to_docstore_id.items() if chunk_id in ids
+        )
+
+    def _save(self):
+        # New stores start as Flat, switch to the configured ANN layout once it can be trained
+        self.ann.upgrade(self.vectorstore)
+        save_index(self.vectorstore, self.index_path)
+        total = self.vectorstore.index.ntotal
+        if total and len(self.vectorstore.tombstones) / total > self.compact_ratio:
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Drops tombstoned vectors and saves the result as a new generation."""
+        with self._lock:
+            # Reloaded when another writer saved since this instance last did
+            vectorstore = self._load_index()
+            if vectorstore is None or not vectorstore.tombstones:
+                return 0
+            dropped = self.ann.compact(vectorstore)
+            save_index(vectorstore, self.index_path)
+            print(f"✅ FAISS index compacted, {dropped} tombstoned vectors dropped.")
+            return dropped
+
+    def ingest_file(self, file_path, manifest=None):
+        """
+        Embed only what changed in one PDF: unchanged files are skipped by file hash,
+        unchanged chunks by chunk hash, and chunks no longer in the file are deleted.
+        """
+        file_path = Path(file_path)
+        name = file_path.name
+        stats = {"file": name, "skipped": False, "chunks_added": 0, "chunks_unchanged": 0, "chunks_deleted": 0}
+
+        with self._lock:
+            own_manifest = manifest is None
+            if own_manifest:
+                manifest = IngestManifest(self.manifest_path)
+            file_hash = hash_file(file_path)
+            if manifest.file_hash(name) == file_hash:
+                stats["skipped"] = True
+                print(f"⏭️ {name} unchanged, skipping ingestion.")
+                return stats
+
+            texts = self.load_file(file_path)
+            ids = chunk_ids(name, texts)
+            previous = set(manifest.chunk_ids(name))
+
+            stale = list(previous - set(ids))
+            self._delete(stale)
+
+            new = [(chunk_id, doc) for chunk_id, doc in zip(ids, texts) if chunk_id not in previous]
+            stats["chunks_added"] = self.embedding_vector_store(
+                [doc for _, doc in new], ids=[chunk_id for chunk_id, _ in new], save=own_manifest
+            )
+
+            stats["chunks_unchanged"] = len(texts) - len(new)
+            stats["chunks_deleted"] = len(stale)
+            manifest.record(name, file_hash, ids)
+            if own_manifest:
+                manifest.save()
+            return stats
+
+    def ingest_directory(self, path):
+        """Sync the index with every PDF in `path`, removing vectors of deleted files."""
+        with self._lock:
+            manifest = IngestManifest(self.manifest_path)
+            present = set()
+            results = []
+            for file_path in sorted(Path(path).glob("*.pdf")):
+                present.add(file_path.name)
+                results.append(self.ingest_file(file_path, manifest=manifest))
+
+            for name in list(manifest.files):
+                if name not in present:
+                    stale = manifest.chunk_ids(name)
+                    self._delete(stale)
+                    manifest.forget(name)
+                    results.append({"file": name, "removed": True, "chunks_deleted": len(stale)})
+
+            if self.vectorstore is not None:
+                self._save()
+            manifest.save()
+            return results
+
 if __name__ == '__main__':
     build_instance = BuildRag()
-    texts = build_instance.load_documents('./documents')
-    build_instance.embedding_vector_store(texts)
+    print(build_instance.ingest_directory('./documents'))
+    build_instance.compact()
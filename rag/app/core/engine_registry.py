@@ -0,0 +1,89 @@
+import threading
+import time
+
+from app.core.query import RAGQueryEngine
+
+
+class EngineRegistry:
+    """
+    Process-wide registry of heavy engines (embedding model, vector store, QA chain).
+    Each engine is built once, either at startup through `warm_up` or lazily on the
+    first `get`, and the same instance is shared by every request afterwards.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._engines = {}
+        self._status = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name, factory):
+        with self._registry_lock:
+            self._factories[name] = factory
+            self._locks[name] = threading.Lock()
+            self._status[name] = {"state": "pending", "load_time_seconds": None, "error": None}
+
+    def get(self, name):
+        engine = self._engines.get(name)
+        if engine is not None:
+            return engine
+
+        if name not in self._factories:
+            raise KeyError(f"Unknown engine: {name}")
+
+        # Only one thread builds an engine, the others wait for it and reuse it
+        with self._locks[name]:
+            engine = self._engines.get(name)
+            if engine is None:
+                engine = self._build(name)
+        return engine
+
+    def _build(self, name):
+        self._status[name] = {"state": "loading", "load_time_seconds": None, "error": None}
+        started = time.perf_counter()
+        try:
+            engine = self._factories[name]()
+        except Exception as e:
+            self._status[name] = {"state": "failed", "load_time_seconds": None, "error": str(e)}
+            print(f"❌ Failed to build engine '{name}': {e}")
+            raise
+
+        load_time = round(time.perf_counter() - started, 3)
+        self._engines[name] = engine
+        self._status[name] = {"state": "ready", "load_time_seconds": load_time, "error": None}
+        print(f"✅ Engine '{name}' ready in {load_time}s.")
+        return engine
+
+    def warm_up(self):
+        for name in list(self._factories):
+            try:
+                self.get(name)
+            except Exception:
+                # Status already records the failure, a later request retries the build
+                continue
+
+    def reset(self, name):
+        with self._locks[name]:
+            self._engines.pop(name, None)
+            self._status[name] = {"state": "pending", "load_time_seconds": None, "error": None}
+
+    def refresh(self, name):
+        """After the data behind an engine changed: reloaded in place when it can, else rebuilt on the next `get`."""
+        engine = self._engines.get(name)
+        if engine is None:
+            return  # not built yet, the first `get` loads the current data
+        if hasattr(engine, "refresh"):
+            engine.refresh()
+        else:
+            self.reset(name)
+
+    def status(self):
+        return {name: dict(status) for name, status in self._status.items()}
+
+    def is_ready(self):
+        return all(status["state"] == "ready" for status in self._status.values())
+
+
+engine_registry = EngineRegistry()
+engine_registry.register("knowledge_base", RAGQueryEngine)
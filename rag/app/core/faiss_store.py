@@ -0,0 +1,352 @@
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows, writers are only serialised within the process
+    fcntl = None
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+DOCSTORE_FILE = "docstore.sqlite"
+LEGACY_INDEX_FILE = "index.faiss"
+LEGACY_PICKLE_FILE = "index.pkl"
+WRITER_LOCK_FILE = "writer.lock"
+# Generations whose map and files are kept, readers further behind must reload before searching
+RETAINED_GENERATIONS = 2
+
+_writer_locks = {}
+_writer_locks_guard = threading.Lock()
+
+
+def index_file(index_path, generation):
+    return Path(index_path) / f"index-{generation}.faiss"
+
+
+class WriterLock:
+    """
+    Re-entrant lock held by whoever modifies an index directory, from loading the
+    writable store to saving its generation. Threads of a process share an RLock,
+    processes (uvicorn workers, the CLI) an flock on writer.lock.
+    """
+
+    def __init__(self, index_path):
+        self.path = Path(index_path) / WRITER_LOCK_FILE
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._handle = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._handle = open(self.path, "a+")
+            fcntl.flock(self._handle, fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and self._handle is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+        self._thread_lock.release()
+
+
+def writer_lock(index_path):
+    """The process-wide WriterLock of `index_path`."""
+    key = str(Path(index_path).resolve())
+    with _writer_locks_guard:
+        if key not in _writer_locks:
+            _writer_locks[key] = WriterLock(index_path)
+        return _writer_locks[key]
+
+
+class SqliteDocstore(Docstore, AddableMixin):
+    """
+    Chunk text and metadata in sqlite instead of the pickled InMemoryDocstore, plus the
+    FAISS position -> chunk id map of every saved generation.
+
+    Readers get one read-only connection per thread and only load the rows they hit.
+    Writes go through a single connection and stay in an open transaction until
+    `save_index` commits them together with the new index generation, so readers never
+    see chunks of an index they haven't loaded. Deleted chunks are tombstoned by index
+    position and purged once compaction dropped them from every retained generation.
+    """
+
+    def __init__(self, path, readonly=True):
+        self.path = str(path)
+        self.readonly = readonly
+        self._local = threading.local()
+        self._writer = None
+        if not readonly:
+            self._writer = sqlite3.connect(self.path, check_same_thread=False)
+            self._writer.execute("PRAGMA journal_mode=WAL")
+            self._writer.executescript(
+                "CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, page_content TEXT, metadata TEXT);"
+                "CREATE TABLE IF NOT EXISTS index_map ("
+                " generation INTEGER, position INTEGER, doc_id TEXT, PRIMARY KEY (generation, position));"
+                "CREATE TABLE IF NOT EXISTS tombstones ("
+                " generation INTEGER, position INTEGER, PRIMARY KEY (generation, position));"
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            )
+            self._writer.commit()
+
+    def _conn(self):
+        if self._writer is not None:
+            return self._writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def generation(self):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    # --- Docstore interface used by langchain's FAISS ---
+    def search(self, search):
+        row = self._conn().execute("SELECT page_content, metadata FROM docs WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def add(self, texts):
+        self._writer.executemany(
+            "INSERT OR REPLACE INTO docs VALUES (?, ?, ?)",
+            [(doc_id, doc.page_content, json.dumps(doc.metadata)) for doc_id, doc in texts.items()]
+        )
+
+    def delete(self, ids):
+        # Rows are purged by save_index once no retained generation points at them
+        pass
+
+    # --- Generations ---
+    def index_map(self, generation):
+        return IndexMap(self, generation)
+
+    def tombstones(self, generation):
+        rows = self._conn().execute("SELECT position FROM tombstones WHERE generation = ?", (generation,))
+        return {position for (position,) in rows}
+
+    def commit_generation(self, generation, index_to_docstore_id, tombstones=(), keep=RETAINED_GENERATIONS):
+        """Stores the map and tombstones of a new generation, drops older ones and unreferenced chunks."""
+        conn = self._writer
+        conn.executemany(
+            "INSERT INTO index_map VALUES (?, ?, ?)",
+            ((generation, int(position), doc_id) for position, doc_id in index_to_docstore_id.items())
+        )
+        conn.executemany(
+            "INSERT INTO tombstones VALUES (?, ?)", ((generation, int(position)) for position in tombstones)
+        )
+        conn.execute("DELETE FROM index_map WHERE generation <= ?", (generation - keep,))
+        conn.execute("DELETE FROM tombstones WHERE generation <= ?", (generation - keep,))
+        conn.execute("DELETE FROM docs WHERE id NOT IN (SELECT doc_id FROM index_map)")
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (str(generation),))
+        conn.commit()
+
+    def rollback(self):
+        if self._writer is not None:
+            self._writer.rollback()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.rollback()
+            self._writer.close()
+            self._writer = None
+
+
+class IndexMap(Mapping):
+    """Read-only FAISS position -> chunk id map of one generation, looked up in sqlite on demand."""
+
+    def __init__(self, docstore, generation):
+        self.docstore = docstore
+        self.generation = generation
+        self._len = None
+
+    def __getitem__(self, position):
+        row = self.docstore._conn().execute(
+            "SELECT doc_id FROM index_map WHERE generation = ? AND position = ?",
+            (self.generation, int(position))
+        ).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __len__(self):
+        if self._len is None:
+            self._len = self.docstore._conn().execute(
+                "SELECT COUNT(*) FROM index_map WHERE generation = ?", (self.generation,)
+            ).fetchone()[0]
+        return self._len
+
+    def __iter__(self):
+        return (position for position, _ in self.items())
+
+    def items(self):
+        return self.docstore._conn().execute(
+            "SELECT position, doc_id FROM index_map WHERE generation = ? ORDER BY position", (self.generation,)
+        ).fetchall()
+
+    def values(self):
+        return [doc_id for _, doc_id in self.items()]
+
+
+class TombstoneFilter:
+    """
+    Read-only view of a FAISS index that hides tombstoned positions. Searches over-fetch
+    by the number of tombstones, hidden hits are dropped and rows padded with -1, which
+    langchain's FAISS already skips. Compaction keeps the tombstone count small.
+    """
+
+    def __init__(self, inner, tombstones):
+        self.inner = inner
+        self.tombstones = tombstones
+        self._hidden = np.array(sorted(tombstones), dtype=np.int64)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def search(self, vectors, k, *args, **kwargs):
+        fetch = min(k + len(self._hidden), self.inner.ntotal) or k
+        scores, indices = self.inner.search(vectors, fetch, *args, **kwargs)
+        live = ~np.isin(indices, self._hidden)
+        out_scores = np.full((len(indices), k), np.inf, dtype=scores.dtype)
+        out_indices = np.full((len(indices), k), -1, dtype=indices.dtype)
+        for row in range(len(indices)):
+            kept = np.flatnonzero(live[row])[:k]
+            out_scores[row, :len(kept)] = scores[row, kept]
+            out_indices[row, :len(kept)] = indices[row, kept]
+        return out_scores, out_indices
+
+
+def live_ids(vectorstore):
+    """Chunk ids of the positions that aren't tombstoned."""
+    tombstones = getattr(vectorstore, "tombstones", set())
+    return {doc_id for position, doc_id in vectorstore.index_to_docstore_id.items() if position not in tombstones}
+
+
+def index_exists(index_path):
+    path = Path(index_path)
+    return (path / DOCSTORE_FILE).exists() or (path / LEGACY_PICKLE_FILE).exists()
+
+
+def _read_index(path, mmap):
+    if mmap:
+        # IO_FLAG_MMAP_IFC maps flat vectors too (faiss >= 1.9), IO_FLAG_MMAP only inverted lists
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        try:
+            return faiss.read_index(str(path), flags)
+        except RuntimeError as e:
+            print(f"⚠️ Could not memory-map {path.name}, reading it into memory: {e}")
+    return faiss.read_index(str(path))
+
+
+def save_index(vectorstore, index_path):
+    """
+    Writes a new generation: the vectors to index-<generation>.faiss, then the map and
+    any new chunks to the sqlite docstore in one commit. Files of older generations are
+    removed once they can no longer be loaded. Runs under the writer lock, a store loaded
+    from a generation that another writer has replaced since is refused.
+    """
+    path = Path(index_path)
+    path.mkdir(parents=True, exist_ok=True)
+    with writer_lock(path):
+        return _save_generation(vectorstore, path)
+
+
+def _save_generation(vectorstore, path):
+    docstore = vectorstore.docstore
+    if not isinstance(docstore, SqliteDocstore) or docstore.readonly:
+        # Built in memory (FAISS.from_documents) or migrated, copy the chunks over
+        sqlite_store = SqliteDocstore(path / DOCSTORE_FILE, readonly=False)
+        sqlite_store.add({doc_id: docstore.search(doc_id) for doc_id in vectorstore.index_to_docstore_id.values()})
+        vectorstore.docstore = docstore = sqlite_store
+
+    generation = docstore.generation() + 1
+    loaded = getattr(vectorstore, "generation", None)
+    if loaded is not None and loaded != generation - 1:
+        docstore.rollback()
+        raise RuntimeError(
+            f"FAISS index in {path} is at generation {generation - 1}, this store was loaded from {loaded}, "
+            f"reload it before saving"
+        )
+    target = index_file(path, generation)
+    temporary = target.with_suffix(".tmp")
+    # Written next to the target and renamed, a reader never opens a partial file
+    faiss.write_index(getattr(vectorstore.index, "inner", vectorstore.index), str(temporary))
+    os.replace(temporary, target)
+    try:
+        docstore.commit_generation(generation, vectorstore.index_to_docstore_id, getattr(vectorstore, "tombstones", ()))
+    except Exception:
+        docstore.rollback()
+        target.unlink(missing_ok=True)
+        raise
+    vectorstore.generation = generation
+
+    for old in path.glob("index-*.faiss"):
+        if old.stem.split("-")[-1].isdigit() and int(old.stem.split("-")[-1]) <= generation - RETAINED_GENERATIONS:
+            # Processes that already mapped the file keep their mapping
+            old.unlink(missing_ok=True)
+    return generation
+
+
+def _migrate_legacy(index_path, embeddings):
+    """One-time conversion of a save_local() index (index.faiss + pickled docstore)."""
+    print(f"🔄 Migrating the pickled FAISS index in {index_path} to the sqlite docstore...")
+    # The pickle was written by this service, it is unpickled this once and never again
+    legacy = FAISS.load_local(str(index_path), embeddings, allow_dangerous_deserialization=True)
+    generation = save_index(legacy, index_path)
+    print(f"✅ Migrated {len(legacy.index_to_docstore_id)} chunks, {LEGACY_PICKLE_FILE} is no longer read.")
+    return generation
+
+
+def load_index(index_path, embeddings, writable=False, mmap=None):
+    """
+    FAISS vector store from `index_path`. Readers memory-map the vectors (pages are
+    shared between processes) and fetch chunks and ids from sqlite on demand, so load
+    time doesn't grow with the index. Writers get an in-memory index and a plain dict map.
+      FAISS_MMAP   1 (default) memory-maps the index for readers, 0 reads it into memory
+    """
+    path = Path(index_path)
+    if mmap is None:
+        mmap = os.getenv("FAISS_MMAP", "1") != "0"
+
+    docstore_path = path / DOCSTORE_FILE
+    if not docstore_path.exists():
+        if not (path / LEGACY_PICKLE_FILE).exists():
+            raise FileNotFoundError(f"No FAISS index in {index_path}")
+        _migrate_legacy(path, embeddings)
+
+    docstore = SqliteDocstore(docstore_path, readonly=not writable)
+    for _ in range(3):
+        generation = docstore.generation()
+        try:
+            index = _read_index(index_file(path, generation), mmap and not writable)
+            break
+        except RuntimeError:
+            # A writer replaced the generation between the two reads, try the new one
+            continue
+    else:
+        raise RuntimeError(f"Could not load a consistent FAISS generation from {index_path}")
+
+    index_map = docstore.index_map(generation)
+    tombstones = docstore.tombstones(generation)
+    if writable:
+        index_map = dict(index_map.items())
+    elif tombstones:
+        index = TombstoneFilter(index, tombstones)
+    vectorstore = FAISS(embeddings, index, docstore, index_map)
+    vectorstore.generation = generation
+    vectorstore.tombstones = tombstones
+    return vectorstore
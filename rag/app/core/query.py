@@ -1,60 +1,224 @@
-from langchain_community.vectorstores import FAISS
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
-from langchain.chains import RetrievalQA
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from app.core.llm import get_chat_model
+from app.core.faiss_store import RETAINED_GENERATIONS, live_ids, load_index
+from app.core.ann_index import ANNIndexFactory
+from app.core.context_packer import ContextPacker, SYSTEM_TEMPLATE
+from app.core.reranker import CrossEncoderReranker
+from app.core.lexical_index import LexicalIndex, rrf_fuse
+from app.core.embedding_cache import CachedEmbeddings
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
+import threading
+import time
 from dotenv import load_dotenv
 from pathlib import Path
 
 
+def _ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
 class RAGQueryEngine:
-    def __init__(self, index_path="faiss_index"):
+    """
+    QA over the FAISS index. New index generations written by ingestion are picked up
+    without a restart: the engine checks the docstore every FAISS_RELOAD_INTERVAL seconds
+    (default 5) and swaps in the new generation, loaded in the background. A generation
+    the writer no longer retains can't be searched, that reload happens before answering.
+    Retrieval is hybrid: the dense search and a BM25 search of the lexical index (see
+    LexicalIndex) run in parallel and are fused with RRF before the optional re-ranker
+    and the context packer. Every answer reports per-stage timings.
+    """
+
+    def __init__(self, index_path=None):
+        index_path = index_path or os.getenv("FAISS_INDEX_PATH", "faiss_index")
+        self.index_path = index_path
+        self.reload_interval = float(os.getenv("FAISS_RELOAD_INTERVAL", "5"))
+        self._last_reload_check = time.time()
+        self._reloading = threading.Lock()
+        self._reloading_now = threading.Lock()
         try:
             # Load .env variables
             env_path = Path(__file__).resolve().parent.parent.parent / '.env'
             load_dotenv(dotenv_path=env_path)
 
-            os.environ["HUGGINGFACEHUB_API_TOKEN"] = os.getenv("HUGGINGFACEHUB_API_TOKEN")
-            os.environ["GROQ_API_KEY"] = os.getenv("grok_api_key")
+            # Keys are optional, offline benchmarks (LLM_BACKEND=fake) run without them
+            if os.getenv("HUGGINGFACEHUB_API_TOKEN"):
+                os.environ["HUGGINGFACEHUB_API_TOKEN"] = os.getenv("HUGGINGFACEHUB_API_TOKEN")
+            if os.getenv("grok_api_key"):
+                os.environ["GROQ_API_KEY"] = os.getenv("grok_api_key")
 
-            # Load embedding model
-            self.embedding_model = HuggingFaceEmbeddings(
+            # Load embedding model, repeated questions are answered from the embedding cache
+            self.embedding_model = CachedEmbeddings(HuggingFaceEmbeddings(
                 model_name="sentence-transformers/all-MiniLM-L6-v2"
-            )
+            ))
 
-            # Load FAISS vectorstore
-            self.vectorstore = FAISS.load_local(
-                index_path,
-                self.embedding_model,
-                allow_dangerous_deserialization=True
-            )
-            print("✅ FAISS index loaded.")
+            # Over-fetch candidates, the optional re-ranker and the packer trim them
+            self.packer = ContextPacker.from_env(fetch_k=12, token_budget=500)
+            self.reranker = CrossEncoderReranker.from_env()
+            self.fetch_k = max(self.packer.fetch_k, self.reranker.top_n) if self.reranker else self.packer.fetch_k
+            self._load_vectorstore()
 
-            # Create retriever
-            self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 5})
+            # BM25 index written by BuildRag next to the FAISS files
+            self.lexical = LexicalIndex.from_env(index_path, k=self.fetch_k)
+            if self.lexical:
+                self._backfill_lexical()
+                self._lexical_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="lexical")
 
             # Initialize LLM
-            self.llm = ChatGroq(
-                temperature=0,
-                model_name="llama3-70b-8192"
-            )
+            self.llm = get_chat_model("knowledge_base", model="llama3-70b-8192", temperature=0)
 
-            # Build the QA chain
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                retriever=self.retriever,
-                chain_type="stuff"
-            )
+            # Build the QA chain, the context is packed before it is filled in
+            prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_TEMPLATE), ("human", "{question}")])
+            self.qa_chain = prompt | self.llm | StrOutputParser()
             print("✅ RAG Query Engine initialized.\n")
 
         except Exception as e:
             print(f"❌ Initialization error: {e}")
             raise
 
+    def _load_vectorstore(self):
+        # Memory-mapped vectors and a sqlite docstore, no pickle and no full read at start-up
+        vectorstore = load_index(self.index_path, self.embedding_model)
+        # Query-time recall/speed trade-off of IVF (nprobe) and HNSW (efSearch) indexes
+        ANNIndexFactory().tune(vectorstore.index)
+        # Swapped together, requests already running keep the generation they started with
+        self.vectorstore, self.retriever = vectorstore, vectorstore.as_retriever(search_kwargs={"k": self.fetch_k})
+        print(f"✅ FAISS index generation {vectorstore.generation} loaded.")
+
+    def _reload(self):
+        try:
+            self._load_vectorstore()
+        except Exception as e:
+            print(f"❌ Could not reload the FAISS index, still serving generation {self.vectorstore.generation}: {e}")
+        finally:
+            self._reloading.release()
+
+    def refresh(self):
+        """Loads the newest generation now, after an upload the next question searches it."""
+        with self._reloading_now:
+            if self.vectorstore.docstore.generation() > self.vectorstore.generation:
+                self._load_vectorstore()
+
+    def _retained(self, generation):
+        return self.vectorstore.docstore.generation() - generation < RETAINED_GENERATIONS
+
+    def maybe_reload(self, force=False):
+        now = time.time()
+        if not force and now - self._last_reload_check < self.reload_interval:
+            return
+        self._last_reload_check = now
+        generation = self.vectorstore.generation
+        if self.vectorstore.docstore.generation() <= generation:
+            return
+        if not self._retained(generation):
+            # Its id map and chunks are gone, block until the current generation is loaded
+            with self._reloading_now:
+                if not self._retained(self.vectorstore.generation):
+                    self._load_vectorstore()
+        elif self._reloading.acquire(blocking=False):
+            threading.Thread(target=self._reload, daemon=True).start()
+
+    def _backfill_lexical(self):
+        # Indexes ingested before the lexical index existed, chunks already indexed are ignored
+        stored = len(self.vectorstore.index_to_docstore_id) - len(self.vectorstore.tombstones)
+        if stored and self.lexical.count() < stored:
+            ids = sorted(live_ids(self.vectorstore))
+            self.lexical.add(ids, [self.vectorstore.docstore.search(chunk_id) for chunk_id in ids])
+            print(f"✅ Lexical index backfilled with {len(ids)} chunks.")
+
+    def _lexical_search(self, query):
+        started = time.perf_counter()
+        return self.lexical.search(query), _ms(started)
+
+    def _dense_search(self, retriever, query):
+        started = time.perf_counter()
+        return retriever.invoke(query), _ms(started)
+
+    async def _adense_search(self, retriever, query):
+        started = time.perf_counter()
+        return await retriever.ainvoke(query), _ms(started)
+
+    def _rerank(self, query, docs):
+        return self.reranker.rerank(query, docs) if self.reranker else docs
+
+    def _fuse_and_rerank(self, query, dense, lexical, timings):
+        (dense_docs, timings["dense_ms"]), (lexical_docs, timings["lexical_ms"]) = dense, lexical
+        started = time.perf_counter()
+        docs = rrf_fuse([dense_docs, lexical_docs], k=self.lexical.rrf_k)[:self.fetch_k] if lexical_docs else dense_docs
+        timings["fusion_ms"] = _ms(started)
+        started = time.perf_counter()
+        docs = self._rerank(query, docs)
+        timings["rerank_ms"] = _ms(started)
+        return docs
+
+    def _inputs(self, query, docs, timings):
+        started = time.perf_counter()
+        context, stats = self.packer.pack(docs)
+        timings["pack_ms"] = _ms(started)
+        print(f"Context packed: {stats}, timings: {timings}")
+        return {"context": context, "question": query}, stats
+
+    def retrieve(self, query, timings=None):
+        """Fused, re-ranked candidates for `query`, stage timings are recorded in `timings`."""
+        timings = {} if timings is None else timings
+        # The retriever is read once, a reload swapping it mid-request doesn't matter
+        retriever = self.retriever
+        if self.lexical:
+            lexical = self._lexical_pool.submit(self._lexical_search, query)
+            dense = self._dense_search(retriever, query)
+            return self._fuse_and_rerank(query, dense, lexical.result(), timings)
+        return self._fuse_and_rerank(query, self._dense_search(retriever, query), ([], 0.0), timings)
+
+    async def aretrieve(self, query, timings=None):
+        timings = {} if timings is None else timings
+        retriever = self.retriever
+        if self.lexical:
+            dense, lexical = await asyncio.gather(
+                self._adense_search(retriever, query), asyncio.to_thread(self._lexical_search, query)
+            )
+        else:
+            dense, lexical = await self._adense_search(retriever, query), ([], 0.0)
+        # Cross-encoder scoring is CPU bound, keep it off the event loop
+        return await asyncio.to_thread(self._fuse_and_rerank, query, dense, lexical, timings)
+
     def ask(self, query: str):
         try:
-            response = self.qa_chain.invoke(query)
-            return response
+            self.maybe_reload()
+            timings = {}
+            try:
+                docs = self.retrieve(query, timings)
+            except (KeyError, ValueError):
+                # The writer dropped this generation between two reload checks
+                self.maybe_reload(force=True)
+                docs = self.retrieve(query, timings)
+            inputs, stats = self._inputs(query, docs, timings)
+            started = time.perf_counter()
+            result = self.qa_chain.invoke(inputs)
+            timings["llm_ms"] = _ms(started)
+            # Same keys as the RetrievalQA output, plus the packing stats and stage timings
+            return {"query": query, "result": result, "context": stats, "timings": timings}
+        except Exception as e:
+            print(f"❌ Error during query: {e}")
+            return None
+
+    async def aask(self, query: str):
+        try:
+            self.maybe_reload()
+            timings = {}
+            try:
+                docs = await self.aretrieve(query, timings)
+            except (KeyError, ValueError):
+                # The writer dropped this generation between two reload checks
+                await asyncio.to_thread(self.maybe_reload, True)
+                docs = await self.aretrieve(query, timings)
+            inputs, stats = self._inputs(query, docs, timings)
+            started = time.perf_counter()
+            result = await self.qa_chain.ainvoke(inputs)
+            timings["llm_ms"] = _ms(started)
+            return {"query": query, "result": result, "context": stats, "timings": timings}
         except Exception as e:
             print(f"❌ Error during query: {e}")
             return None
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+# Warm-up pair shaped like real traffic, a question against a full 500 character chunk,
+# cross-encoder cost grows with the token count
+WARMUP_QUERY = "How does retrieval augmented generation decide which documents to use?"
+WARMUP_CHUNK = (
+    "Retrieved passages are split into overlapping chunks of text, embedded and ranked by "
+    "similarity before the language model reads them as context for its answer. "
+) * 3
+
+
+def chunk_key(doc):
+    """Stable id of a retrieved chunk, the store id when there is one, else a content hash."""
+    doc_id = getattr(doc, "id", None)
+    if doc_id:
+        return doc_id
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """
+    Optional second retrieval stage: the vector store returns top-N candidates, a small
+    CPU cross-encoder scores (query, chunk) pairs in batches and the best top-k are kept.
+    Scores are cached per (query, chunk id). The model loads in the background, until it
+    is ready, and whenever re-ranking would blow the latency budget or too many requests
+    are already re-ranking, candidates pass through in vector-store order.
+      RERANK_MODEL            cross-encoder name, unset or empty disables re-ranking
+      RERANK_TOP_N            candidates fetched for re-ranking (default 20)
+      RERANK_TOP_K            candidates kept (default 6)
+      RERANK_BATCH_SIZE       pairs per model call (default 16)
+      RERANK_BUDGET_MS        estimated scoring time above which re-ranking is skipped (default 200)
+      RERANK_ESTIMATE_DECAY   factor the cost estimate shrinks by on every budget skip (default 0.9),
+                              so one slow batch doesn't switch re-ranking off for good
+      RERANK_MAX_CONCURRENT   re-rankings in flight before new ones are skipped (default 2)
+      RERANK_CACHE_ENTRIES    cached (query, chunk) scores (default 20000)
+    """
+
+    def __init__(self, model_name=DEFAULT_RERANK_MODEL, top_n=None, top_k=None, batch_size=None,
+                 budget_ms=None, max_concurrent=None, cache_entries=None, estimate_decay=None,
+                 background_load=True):
+        self.model_name = model_name
+        self.top_n = top_n or int(os.getenv("RERANK_TOP_N", "20"))
+        self.top_k = top_k or int(os.getenv("RERANK_TOP_K", "6"))
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH_SIZE", "16"))
+        self.budget_ms = budget_ms or float(os.getenv("RERANK_BUDGET_MS", "200"))
+        self.cache_entries = cache_entries or int(os.getenv("RERANK_CACHE_ENTRIES", "20000"))
+        self.estimate_decay = estimate_decay or float(os.getenv("RERANK_ESTIMATE_DECAY", "0.9"))
+        max_concurrent = max_concurrent or int(os.getenv("RERANK_MAX_CONCURRENT", "2"))
+
+        self._model = None
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        # Moving average of scoring cost, seeded once the model is loaded
+        self._ms_per_pair = None
+        self._stats = {"reranked": 0, "cache_hits": 0, "scored_pairs": 0, "skipped_loading": 0,
+                       "skipped_budget": 0, "skipped_load": 0, "load_time_seconds": None, "error": None}
+
+        if background_load:
+            threading.Thread(target=self.load, daemon=True).start()
+        else:
+            self.load()
+
+    @classmethod
+    def from_env(cls):
+        """Returns a re-ranker, or None when RERANK_MODEL is not set."""
+        model_name = os.getenv("RERANK_MODEL", "").strip()
+        if not model_name:
+            return None
+        return cls(model_name=model_name)
+
+    def load(self):
+        started = time.perf_counter()
+        try:
+            from sentence_transformers import CrossEncoder
+
+            model = CrossEncoder(self.model_name, device="cpu")
+            # Warm-up call, also gives the first cost estimate for the latency budget
+            warm_started = time.perf_counter()
+            model.predict([(WARMUP_QUERY, WARMUP_CHUNK)] * self.batch_size, batch_size=self.batch_size)
+            self._ms_per_pair = (time.perf_counter() - warm_started) * 1000 / self.batch_size
+            self._model = model
+            self._stats["load_time_seconds"] = round(time.perf_counter() - started, 3)
+            print(f"✅ Re-ranker {self.model_name} loaded in {self._stats['load_time_seconds']}s.")
+        except Exception as e:
+            self._stats["error"] = str(e)
+            print(f"❌ Re-ranker unavailable, candidates keep vector-store order: {e}")
+
+    # --- Score cache ---
+    def _cached(self, query, keys):
+        with self._cache_lock:
+            scores = {}
+            for key in keys:
+                score = self._cache.get((query, key))
+                if score is not None:
+                    self._cache.move_to_end((query, key))
+                    scores[key] = score
+            return scores
+
+    def _remember(self, query, scores):
+        with self._cache_lock:
+            for key, score in scores.items():
+                self._cache[(query, key)] = score
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    # --- Re-ranking ---
+    def _score(self, query, docs):
+        started = time.perf_counter()
+        pairs = [(query, doc.page_content) for doc in docs]
+        scores = self._model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        ms_per_pair = (time.perf_counter() - started) * 1000 / len(pairs)
+        self._ms_per_pair = 0.8 * self._ms_per_pair + 0.2 * ms_per_pair
+        self._stats["scored_pairs"] += len(pairs)
+        return [float(score) for score in scores]
+
+    def rerank(self, query, docs):
+        """Best `top_k` of the candidates, in vector-store order when re-ranking is skipped."""
+        if self._model is None:
+            self._stats["skipped_loading"] += 1
+            return docs[:self.top_k]
+
+        query = " ".join(query.lower().split())
+        keys = [chunk_key(doc) for doc in docs]
+        scores = self._cached(query, keys)
+        self._stats["cache_hits"] += len(scores)
+        missing = [(key, doc) for key, doc in zip(keys, docs) if key not in scores]
+
+        if missing:
+            if len(missing) * self._ms_per_pair > self.budget_ms:
+                # Only scoring updates the estimate, without the decay a skip would be final
+                self._ms_per_pair *= self.estimate_decay
+                self._stats["skipped_budget"] += 1
+                return docs[:self.top_k]
+            if not self._slots.acquire(blocking=False):
+                self._stats["skipped_load"] += 1
+                return docs[:self.top_k]
+            try:
+                fresh = dict(zip((key for key, _ in missing), self._score(query, [doc for _, doc in missing])))
+            finally:
+                self._slots.release()
+            self._remember(query, fresh)
+            scores.update(fresh)
+
+        self._stats["reranked"] += 1
+        ranked = sorted(zip(keys, docs), key=lambda pair: scores[pair[0]], reverse=True)
+        return [doc for _, doc in ranked[:self.top_k]]
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "ready": self._model is not None,
+            "ms_per_pair": round(self._ms_per_pair, 3) if self._ms_per_pair else None,
+            "cached_scores": len(self._cache),
+            **self._stats,
+        }
@@ -0,0 +1,105 @@
+"""
+Recall, speed and memory of the FAISS index layouts offered by ANNIndexFactory.
+
+Synthetic corpus shaped like sentence embeddings (clustered, unit length, 384 dims as
+all-MiniLM-L6-v2). Queries are perturbed corpus vectors, ground truth comes from an exact
+Flat search. For every layout and query-time setting it reports recall@k against Flat,
+single-query QPS, build time and bytes per vector. From rag/:
+    python -m benchmarks.ann_benchmark --vectors 100000 --queries 500 --k 10
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from app.core.ann_index import ANNIndexFactory
+from benchmarks.stats import print_table
+
+# (layout, query-time settings to sweep)
+LAYOUTS = [
+    ("flat", [{}]),
+    ("ivf", [{"nprobe": 4}, {"nprobe": 16}, {"nprobe": 64}]),
+    ("hnsw", [{"ef_search": 16}, {"ef_search": 64}, {"ef_search": 256}]),
+    ("ivfpq", [{"nprobe": 16}, {"nprobe": 64}]),
+    ("sq8", [{}]),
+    ("ivfsq8", [{"nprobe": 16}]),
+]
+
+
+def synthetic_corpus(n, dim, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def make_queries(vectors, count, seed):
+    rng = np.random.default_rng(seed + 1)
+    queries = vectors[rng.choice(len(vectors), count, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def search_one_by_one(index, queries, k):
+    # The service embeds and searches one question at a time
+    results = np.empty((len(queries), k), dtype=np.int64)
+    started = time.perf_counter()
+    for i, query in enumerate(queries):
+        _, results[i] = index.search(query[None, :], k)
+    return results, time.perf_counter() - started
+
+
+def recall(found, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def main(args):
+    faiss.omp_set_num_threads(args.threads)
+    vectors = synthetic_corpus(args.vectors, args.dim, args.clusters, args.seed)
+    queries = make_queries(vectors, args.queries, args.seed)
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}.")
+
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    rows = []
+    for layout, settings in LAYOUTS:
+        if args.only and layout not in args.only:
+            continue
+        factory = ANNIndexFactory(index_type=layout)
+        started = time.perf_counter()
+        index = factory.build(vectors)
+        build_seconds = time.perf_counter() - started
+        bytes_per_vector = len(faiss.serialize_index(index)) / index.ntotal
+        for setting in settings:
+            ANNIndexFactory(index_type=layout, **setting).tune(index)
+            found, elapsed = search_one_by_one(index, queries, args.k)
+            rows.append({
+                "index": factory.factory_string(args.dim, args.vectors),
+                "setting": ",".join(f"{key}={value}" for key, value in setting.items()) or "-",
+                f"recall@{args.k}": round(recall(found, truth), 4),
+                "qps": round(len(queries) / elapsed, 1),
+                "build_s": round(build_seconds, 2),
+                "bytes/vector": round(bytes_per_vector, 1),
+            })
+            print(rows[-1])
+
+    print()
+    print_table(rows, ["index", "setting", f"recall@{args.k}", "qps", "build_s", "bytes/vector"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=1, help="faiss OpenMP threads")
+    parser.add_argument("--only", nargs="*", help="layouts to run, e.g. --only flat ivf")
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
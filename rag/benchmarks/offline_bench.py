@@ -0,0 +1,113 @@
+"""
+Offline benchmark of the FAISS RAG service, no Groq key and no network LLM needed.
+
+LLM calls go to the deterministic FakeChatModel (LLM_BACKEND=fake) and the fixture corpus
+is ingested into a temporary FAISS index. From rag/:
+    python -m benchmarks.offline_bench --copies 5 --repeat 50 --concurrency 1 8 32
+
+Reports throughput and p50/p95/p99 for ingestion (per file), retrieval and end-to-end
+POST /chatbot served in-process.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+def configure_environment(workdir, latency_ms):
+    # Must run before any app module is imported, they read their settings at import time
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_MS"] = str(latency_ms)
+    os.environ["FAISS_INDEX_PATH"] = str(workdir / "faiss_index")
+    os.environ["LLM_CACHE_PATH"] = ""
+
+
+def timed_calls(func, items):
+    latencies = []
+    started = time.perf_counter()
+    for item in items:
+        call_started = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - call_started)
+    return latencies, time.perf_counter() - started
+
+
+async def run_level(client, url, concurrency, total, questions):
+    from benchmarks.stats import summarize
+
+    latencies = []
+    errors = 0
+    pending = asyncio.Queue()
+    for i in range(total):
+        pending.put_nowait(questions[i % len(questions)])
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                question = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.post(url, data={"query": question})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors += 1
+                print(f"⚠️ Request failed: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run(args, workdir):
+    from benchmarks.fixtures import KB_QUESTIONS, write_corpus
+    from benchmarks.stats import summarize, print_table
+    from app.core.build_index import BuildRag
+    from app.core.engine_registry import engine_registry
+
+    rows = []
+
+    # --- Ingestion ---
+    paths = write_corpus(workdir / "corpus", copies=args.copies)
+    builder = BuildRag()
+    latencies, elapsed = timed_calls(builder.ingest_file, paths)
+    rows.append({"stage": "ingestion (file)", **summarize(latencies, elapsed)})
+
+    # --- Retrieval ---
+    engine = engine_registry.get("knowledge_base")
+    questions = [KB_QUESTIONS[i % len(KB_QUESTIONS)] for i in range(args.repeat)]
+    latencies, elapsed = timed_calls(engine.retrieve, questions)
+    rows.append({"stage": "retrieval", **summarize(latencies, elapsed)})
+
+    # --- End to end, served in-process ---
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://offline", timeout=120) as client:
+        for concurrency in args.concurrency:
+            result = await run_level(client, "/chatbot", concurrency, args.repeat, KB_QUESTIONS)
+            rows.append({"stage": f"/chatbot c={concurrency}", **result})
+
+    print()
+    print(f"Fake LLM latency {args.llm_latency_ms} ms per call, {len(paths)} fixture PDFs.")
+    print_table(rows, ["stage", "requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=5, help="copies of the fixture corpus to ingest")
+    parser.add_argument("--repeat", type=int, default=50, help="requests per stage")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="offline_bench_") as tmp:
+        workdir = Path(tmp)
+        configure_environment(workdir, args.llm_latency_ms)
+        asyncio.run(run(args, workdir))